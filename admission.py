@@ -0,0 +1,184 @@
+"""
+Admission control for heavy backend work.
+Each resource ('ocr' for scanned uploads, 'parse' for text/PDF uploads, 'render' for finalize) has a fixed
+number of concurrent slots and a bounded wait queue. Requests come in two priority classes: interactive
+requests are always granted ahead of queued bulk ones, and `interactive_reserve` slots are never given to
+bulk work, so a burst of large batch uploads can't starve someone clicking through a review.
+
+A request that finds the queue full, or waits longer than `queue_timeout`, is rejected with
+`AdmissionRejected`; the backend turns that into `429 Too Many Requests` with a `Retry-After` estimated
+from the recent slot hold time and the queue length, instead of letting the request pile up and time out.
+
+Configuration (environment): ROSY_ADMIT_OCR, ROSY_ADMIT_PARSE, ROSY_ADMIT_RENDER (slots per resource),
+ROSY_ADMIT_QUEUE (waiters per resource and class), ROSY_ADMIT_WAIT (seconds a request may queue).
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}
+
+DEFAULT_QUEUE = 16
+DEFAULT_WAIT_SECONDS = 10.0
+MAX_RETRY_AFTER = 300
+
+
+class AdmissionRejected(Exception):
+    """No slot could be granted; retry after `retry_after` seconds."""
+
+    def __init__(self, resource: str, priority: str, reason: str, retry_after: int):
+        super().__init__(f'{resource} is at capacity ({reason}); retry after {retry_after}s')
+        self.resource = resource
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A granted slot; release it exactly once (extra calls are ignored)."""
+
+    def __init__(self, resource: 'Resource', priority: str):
+        self.resource = resource
+        self.priority = priority
+        self.start = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.resource._release(self)
+
+
+class Resource:
+    """Counting semaphore with priority-ordered, bounded waiting."""
+
+    def __init__(self, name: str, capacity: int, *, max_queue: int = DEFAULT_QUEUE,
+                 queue_timeout: float = DEFAULT_WAIT_SECONDS, interactive_reserve: Optional[int] = None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        if interactive_reserve is None:
+            interactive_reserve = 1 if self.capacity > 1 else 0
+        self.interactive_reserve = min(interactive_reserve, self.capacity - 1)
+        self._cond = threading.Condition()
+        self._active = {INTERACTIVE: 0, BULK: 0}
+        self._waiting: List[Tuple[int, int]] = []
+        self._queued = {INTERACTIVE: 0, BULK: 0}
+        self._seq = itertools.count()
+        # exponentially weighted average of how long a slot is held, for Retry-After
+        self._avg_hold = 1.0
+
+    def _slot_free(self, priority: str) -> bool:
+        busy = self._active[INTERACTIVE] + self._active[BULK]
+        if priority == BULK:
+            return busy < self.capacity - self.interactive_reserve
+        return busy < self.capacity
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead, drained at the average hold time."""
+        with self._cond:
+            backlog = len(self._waiting) + 1
+            return max(1, min(MAX_RETRY_AFTER, math.ceil(self._avg_hold * backlog / self.capacity)))
+
+    def _reject(self, priority: str, reason: str) -> AdmissionRejected:
+        metrics.ADMISSION.inc(resource=self.name, priority=priority, outcome=reason)
+        return AdmissionRejected(self.name, priority, reason, self.retry_after())
+
+    def acquire(self, priority: str = INTERACTIVE, timeout: Optional[float] = None) -> Slot:
+        if priority not in PRIORITIES:
+            raise ValueError(f'unknown priority class: {priority}')
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._cond:
+            if not self._waiting and self._slot_free(priority):
+                self._active[priority] += 1
+                metrics.ADMISSION.inc(resource=self.name, priority=priority, outcome='admitted')
+                return Slot(self, priority)
+            if self._queued[priority] >= self.max_queue:
+                raise self._reject(priority, 'queue_full')
+            ticket = (PRIORITIES[priority], next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._queued[priority] += 1
+            try:
+                # strict priority order: only the head of the queue may take a slot
+                while not (self._waiting[0] == ticket and self._slot_free(priority)):
+                    remaining = start + timeout - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(priority, 'timeout')
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiting)
+                self._active[priority] += 1
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                raise
+            finally:
+                self._queued[priority] -= 1
+                # the next waiter may be runnable now (or the head changed)
+                self._cond.notify_all()
+        metrics.ADMISSION.inc(resource=self.name, priority=priority, outcome='admitted')
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, resource=self.name, priority=priority)
+        return Slot(self, priority)
+
+    def _release(self, slot: Slot) -> None:
+        held = time.monotonic() - slot.start
+        with self._cond:
+            self._active[slot.priority] -= 1
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {'capacity': self.capacity, 'interactive_reserve': self.interactive_reserve,
+                    'active': dict(self._active), 'queued': dict(self._queued), 'max_queue': self.max_queue,
+                    'avg_hold_seconds': round(self._avg_hold, 3)}
+
+
+class AdmissionController:
+    """The set of admission-controlled resources of one process."""
+
+    def __init__(self, resources: Dict[str, Resource]):
+        self.resources = resources
+
+    def acquire(self, resource: str, priority: str = INTERACTIVE, timeout: Optional[float] = None) -> Slot:
+        return self.resources[resource].acquire(priority, timeout)
+
+    @contextmanager
+    def admit(self, resource: str, priority: str = INTERACTIVE) -> Iterator[Slot]:
+        slot = self.acquire(resource, priority)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: r.stats() for name, r in self.resources.items()}
+
+
+def controller_from_env() -> AdmissionController:
+    cpus = os.cpu_count() or 1
+    queue = int(os.environ.get('ROSY_ADMIT_QUEUE', str(DEFAULT_QUEUE)))
+    wait = float(os.environ.get('ROSY_ADMIT_WAIT', str(DEFAULT_WAIT_SECONDS)))
+    defaults = {
+        # OCR is CPU bound: one slot per core
+        'ocr': cpus,
+        # text/PDF parsing is light; allow more requests in flight
+        'parse': 4 * cpus,
+        'render': 2 * cpus,
+    }
+    return AdmissionController({
+        name: Resource(name, int(os.environ.get(f'ROSY_ADMIT_{name.upper()}', str(n))), max_queue=queue,
+                       queue_timeout=wait)
+        for name, n in defaults.items()
+    })
@@ -0,0 +1,234 @@
+"""
+Appearance streams for filled AcroForm text fields.
+Instead of clearing each widget's /AP and asking every viewer to rebuild it (NeedAppearances), the filler
+writes a small /Tx form XObject per field: background and border from /MK, the value clipped to the
+field, positioned with the field's font, size, colour and quadding from /DA and /Q. Font size 0 (auto)
+fits the text to the box. Widths come from the font's /Widths or, for the standard 14 fonts, reportlab's
+AFM tables; they are cached per template and font so a batch measures each font once.
+
+`flatten_widgets` optionally paints every widget's appearance into its page content and removes the
+form, so the output renders identically everywhere without any field handling.
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from pdfrw import PdfArray, PdfDict, PdfName, PdfString
+
+# Helvetica, the usual /DA font, as the fallback when a font carries no metrics at all
+_DEFAULT_WIDTH = 556
+_DEFAULT_ASCENT = 718
+_DEFAULT_DESCENT = -207
+_MULTILINE = 1 << 12
+_HIDDEN = 1 << 1
+_DA_FONT_RE = re.compile(r'/([^\s/]+)\s+([\d.]+)\s+Tf')
+
+_METRICS: Dict[Tuple[str, str], 'FontMetrics'] = {}
+_METRICS_LOCK = threading.Lock()
+
+
+class FontMetrics:
+    """Glyph widths (1/1000 em, indexed by cp1252 code) and vertical extent of one font resource."""
+
+    __slots__ = ('widths', 'ascent', 'descent')
+
+    def __init__(self, widths: List[int], ascent: float = _DEFAULT_ASCENT, descent: float = _DEFAULT_DESCENT):
+        self.widths = widths
+        self.ascent = ascent
+        self.descent = descent
+
+    def width(self, data: bytes, size: float) -> float:
+        widths = self.widths
+        return sum(widths[b] for b in data) * size / 1000.0
+
+
+def _load_metrics(font: PdfDict) -> FontMetrics:
+    widths = [_DEFAULT_WIDTH] * 256
+    ascent, descent = _DEFAULT_ASCENT, _DEFAULT_DESCENT
+    descriptor = font.FontDescriptor
+    if descriptor is not None:
+        ascent = float(descriptor.Ascent or ascent)
+        descent = float(descriptor.Descent or descent)
+    if font.Widths is not None:
+        first = int(font.FirstChar or 0)
+        for i, w in enumerate(font.Widths):
+            if 0 <= first + i < 256:
+                widths[first + i] = int(float(w))
+        return FontMetrics(widths, ascent, descent)
+    base = str(font.BaseFont or '').lstrip('/')
+    try:
+        from reportlab.pdfbase.pdfmetrics import getFont
+        face = getFont(base)
+        return FontMetrics([int(w) for w in face.widths], face.face.ascent, face.face.descent)
+    except Exception:
+        return FontMetrics(widths, ascent, descent)
+
+
+def font_metrics(template_key: str, name: str, font: Optional[PdfDict]) -> FontMetrics:
+    """Metrics of font resource `name` in a template, loaded once per (template, font)."""
+    key = (template_key, name)
+    with _METRICS_LOCK:
+        cached = _METRICS.get(key)
+    if cached is None:
+        cached = _load_metrics(font) if font is not None else FontMetrics([_DEFAULT_WIDTH] * 256)
+        with _METRICS_LOCK:
+            _METRICS[key] = cached
+    return cached
+
+
+def _text(value) -> str:
+    if isinstance(value, PdfString):
+        return value.to_unicode()
+    return '' if value is None else str(value)
+
+
+def _encode(text: str) -> Tuple[bytes, bool]:
+    """cp1252 bytes for a value, and whether every character could be encoded."""
+    data = text.encode('cp1252', errors='replace')
+    return data, data.decode('cp1252', errors='replace') == text
+
+
+def _literal(data: bytes) -> str:
+    out = []
+    for b in data:
+        c = chr(b)
+        if c in '\\()':
+            out.append('\\' + c)
+        elif 32 <= b < 127:
+            out.append(c)
+        else:
+            out.append(f'\\{b:03o}')
+    return '(' + ''.join(out) + ')'
+
+
+def _num(x: float) -> str:
+    return f'{x:.2f}'.rstrip('0').rstrip('.') or '0'
+
+
+def _colour(values, stroke: bool) -> str:
+    values = [str(v) for v in values or []]
+    op = {1: 'g', 3: 'rg', 4: 'k'}.get(len(values))
+    if op is None:
+        return ''
+    return ' '.join(values) + ' ' + (op.upper() if stroke else op)
+
+
+def _wrap(data: bytes, metrics: FontMetrics, size: float, width: float) -> List[bytes]:
+    lines: List[bytes] = []
+    for paragraph in data.split(b'\n'):
+        line = b''
+        for word in paragraph.split(b' '):
+            candidate = word if not line else line + b' ' + word
+            if line and metrics.width(candidate, size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def text_appearance(annot: PdfDict, value: str, acroform: Optional[PdfDict], template_key: str) -> Tuple[PdfDict, bool]:
+    """Normal appearance stream for a text widget showing `value`, and whether it renders exactly.
+    Fonts and the default /DA come from the document's AcroForm resources.
+    """
+    acroform = acroform or PdfDict()
+    fonts = (acroform.DR or PdfDict()).Font
+    x1, y1, x2, y2 = (float(v) for v in annot.Rect)
+    w, h = abs(x2 - x1), abs(y2 - y1)
+    da = _text(annot.inheritable.DA) or _text(acroform.DA)
+    m = _DA_FONT_RE.search(da)
+    font_name, size = (m.group(1), float(m.group(2))) if m else ('Helv', 0.0)
+    colour = _DA_FONT_RE.sub('', da).strip()
+    font = fonts[PdfName(font_name)] if fonts is not None else None
+    metrics = font_metrics(template_key, font_name, font)
+    data, exact = _encode(value)
+
+    mk = annot.MK or PdfDict()
+    bs = annot.BS or PdfDict()
+    border = float(bs.W or 1) if mk.BC else 0.0
+    pad = 2.0 + border
+    inner_w = max(1.0, w - 2 * pad)
+    extent = (metrics.ascent - metrics.descent) / 1000.0
+    multiline = int(annot.inheritable.Ff or 0) & _MULTILINE
+    if size <= 0:
+        # auto size: fill the height (capped at 12pt), then shrink until one line fits the width
+        size = min(12.0, max(1.0, h - 2 * pad) / extent)
+        if not multiline:
+            text_w = metrics.width(data, size)
+            if text_w > inner_w:
+                size = max(4.0, size * inner_w / text_w)
+
+    ops = ['/Tx BMC', 'q']
+    if mk.BG:
+        ops.append(f'{_colour(mk.BG, False)} 0 0 {_num(w)} {_num(h)} re f')
+    if border and bs.S == PdfName.U:
+        ops.append(f'{_colour(mk.BC, True)} {_num(border)} w 0 {_num(border / 2)} m {_num(w)} {_num(border / 2)} l S')
+    elif border:
+        ops.append(f'{_colour(mk.BC, True)} {_num(border)} w {_num(border / 2)} {_num(border / 2)} '
+                   f'{_num(w - border)} {_num(h - border)} re S')
+    ops.append(f'{_num(border)} {_num(border)} {_num(w - 2 * border)} {_num(h - 2 * border)} re W n')
+    ops.append('BT')
+    ops.append(f'/{font_name} {_num(size)} Tf {colour}'.strip())
+    quadding = int(annot.inheritable.Q or 0)
+    if multiline:
+        leading = size * 1.15
+        lines = _wrap(data, metrics, size, inner_w)
+        y = h - pad - size * metrics.ascent / 1000.0
+    else:
+        lines = [data]
+        y = (h - size * extent) / 2 - size * metrics.descent / 1000.0
+    prev_x, prev_y = 0.0, 0.0
+    for line in lines:
+        line_w = metrics.width(line, size)
+        x = pad if quadding == 0 else (w - line_w) / 2 if quadding == 1 else w - pad - line_w
+        ops.append(f'{_num(x - prev_x)} {_num(y - prev_y)} Td {_literal(line)} Tj')
+        prev_x, prev_y = x, y
+        if multiline:
+            y -= leading
+    ops += ['ET', 'Q', 'EMC']
+
+    xobj = PdfDict(Type=PdfName.XObject, Subtype=PdfName.Form, BBox=PdfArray([0, 0, round(w, 2), round(h, 2)]))
+    if font is not None:
+        xobj.Resources = PdfDict(Font=PdfDict(**{font_name: font}))
+    xobj.stream = '\n'.join(ops)
+    return xobj, exact
+
+
+def flatten_widgets(pdf) -> int:
+    """Paint every visible widget's normal appearance into its page and drop the form. Returns widgets painted."""
+    painted = 0
+    for page in pdf.pages:
+        annots = page.Annots
+        if not annots:
+            continue
+        keep = PdfArray()
+        draws = []
+        resources = page.inheritable.Resources or PdfDict()
+        xobjects = resources.XObject or PdfDict()
+        for annot in annots:
+            if annot.Subtype != PdfName.Widget:
+                keep.append(annot)
+                continue
+            ap = annot.AP.N if annot.AP is not None else None
+            if ap is None or ap.BBox is None or int(annot.F or 0) & _HIDDEN:
+                continue
+            x1, y1, x2, y2 = (float(v) for v in annot.Rect)
+            bx1, by1, bx2, by2 = (float(v) for v in ap.BBox)
+            sx = (x2 - x1) / ((bx2 - bx1) or 1)
+            sy = (y2 - y1) / ((by2 - by1) or 1)
+            name = f'Fld{painted}'
+            xobjects[PdfName(name)] = ap
+            draws.append(f'q {_num(sx)} 0 0 {_num(sy)} {_num(x1 - bx1 * sx)} {_num(y1 - by1 * sy)} cm /{name} Do Q')
+            painted += 1
+        if draws:
+            resources.XObject = xobjects
+            page.Resources = resources
+            contents = page.Contents
+            old = list(contents) if isinstance(contents, PdfArray) else [contents] if contents is not None else []
+            # isolate the original content's graphics state from the painted fields
+            page.Contents = PdfArray([PdfDict(stream='q')] + old + [PdfDict(stream='Q\n' + '\n'.join(draws))])
+        page.Annots = keep or None
+    if pdf.Root.AcroForm is not None:
+        pdf.Root.AcroForm = None
+    return painted
@@ -0,0 +1,258 @@
+"""
+Artifact store: owns every working directory and generated file the backend creates.
+Uploads and finalizes get a workspace under the store's root; generated drafts inside a workspace are
+registered under opaque IDs and downloaded via `/download/<artifact_id>`, so the server only ever serves
+files it created itself. Workspaces expire after a time-to-live and, when the total-bytes quota is
+exceeded, the least-recently-used ones are evicted by a background sweeper.
+
+Several server processes may share one root. Each workspace records its owner (host and pid) in a marker
+file, and the sweeper only removes directories it doesn't track when their owner process is gone.
+"""
+import mimetypes
+import os
+import secrets
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+DEFAULT_SWEEP_INTERVAL = 60.0
+# written into every workspace: '<host> <pid>' of the process that created it
+OWNER_FILE = '.rosy_owner'
+_HOST = socket.gethostname()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _dirs, files in os.walk(path):
+        for name in files:
+            if name == OWNER_FILE:
+                continue
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # no signal-0 probe on Windows; treat the owner as alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+def _orphaned(path: str) -> bool:
+    """True for a workspace whose owner process on this host has exited. Directories without the marker
+    (not created by a store) and workspaces owned by other hosts are never orphans."""
+    try:
+        with open(os.path.join(path, OWNER_FILE), 'r', encoding='ascii') as f:
+            host, pid = f.read().split()
+        pid = int(pid)
+    except (OSError, ValueError):
+        return False
+    if host != _HOST:
+        return False
+    return not _pid_alive(pid)
+
+
+class Artifact:
+    def __init__(self, artifact_id: str, path: str, download_name: str, mimetype: str, workspace_id: Optional[str]):
+        self.id = artifact_id
+        self.path = path
+        self.download_name = download_name
+        self.mimetype = mimetype
+        self.workspace_id = workspace_id
+
+
+class Workspace:
+    """A directory owned by the store. Pinned workspaces (in use by a request) are never evicted."""
+
+    def __init__(self, workspace_id: str, path: str):
+        self.id = workspace_id
+        self.path = path
+        self.size = 0
+        self.pins = 1
+        self.last_access = time.monotonic()
+
+
+class ArtifactStore:
+    """Thread-safe owner of workspaces and artifacts with TTL and total-bytes quota enforcement."""
+
+    def __init__(self, root: Optional[str] = None, *, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        self.root = os.path.abspath(root or os.path.join(tempfile.gettempdir(), 'rosy_artifacts'))
+        os.makedirs(self.root, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # least-recently-used first
+        self._workspaces: 'OrderedDict[str, Workspace]' = OrderedDict()
+        self._artifacts: Dict[str, Artifact] = {}
+        self._bytes = 0
+        self._evicted = 0
+        self._expired = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    # workspaces
+
+    def create_workspace(self, prefix: str = 'rosy_') -> Workspace:
+        """Create a pinned workspace directory; call `release` once the request is done with it."""
+        path = tempfile.mkdtemp(prefix=prefix, dir=self.root)
+        with open(os.path.join(path, OWNER_FILE), 'w', encoding='ascii') as f:
+            f.write(f'{_HOST} {os.getpid()}')
+        ws = Workspace(os.path.basename(path), path)
+        with self._lock:
+            self._workspaces[ws.id] = ws
+        return ws
+
+    def release(self, ws: Workspace) -> None:
+        """Unpin a workspace and account for its size on disk; enforces the quota right away."""
+        size = _dir_size(ws.path)
+        with self._lock:
+            if ws.id not in self._workspaces:
+                return
+            ws.pins = max(0, ws.pins - 1)
+            self._bytes += size - ws.size
+            ws.size = size
+            ws.last_access = time.monotonic()
+            self._workspaces.move_to_end(ws.id)
+            over_quota = self._bytes > self.max_bytes
+        if over_quota:
+            self.sweep()
+
+    def discard(self, ws: Workspace) -> None:
+        """Remove a workspace and all its artifacts immediately."""
+        with self._lock:
+            self._drop(ws.id)
+        shutil.rmtree(ws.path, ignore_errors=True)
+
+    def _drop(self, workspace_id: str) -> Optional[Workspace]:
+        # caller holds the lock and removes the directory afterwards
+        ws = self._workspaces.pop(workspace_id, None)
+        if ws is None:
+            return None
+        self._bytes -= ws.size
+        for aid in [aid for aid, a in self._artifacts.items() if a.workspace_id == workspace_id]:
+            del self._artifacts[aid]
+        return ws
+
+    # artifacts
+
+    def register(self, path: str, download_name: Optional[str] = None, workspace: Optional[Workspace] = None) -> str:
+        path = os.path.abspath(path)
+        name = download_name or os.path.basename(path)
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        artifact_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._artifacts[artifact_id] = Artifact(artifact_id, path, name, mimetype,
+                                                    workspace.id if workspace else None)
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        """Look up an artifact, marking its workspace as recently used."""
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is not None and artifact.workspace_id in self._workspaces:
+                self._workspaces[artifact.workspace_id].last_access = time.monotonic()
+                self._workspaces.move_to_end(artifact.workspace_id)
+        if artifact is None or not os.path.exists(artifact.path):
+            return None
+        return artifact
+
+    def remove(self, artifact_id: str) -> None:
+        with self._lock:
+            self._artifacts.pop(artifact_id, None)
+
+    # eviction
+
+    def sweep(self) -> int:
+        """Evict expired workspaces, then least-recently-used ones until under quota.
+        Also removes workspaces left under the root by processes that have exited, once they are older than
+        the TTL; live workspaces of other processes sharing the root are left alone.
+        Returns the number of workspaces removed.
+        """
+        now = time.monotonic()
+        victims = []
+        with self._lock:
+            for ws in list(self._workspaces.values()):
+                if ws.pins == 0 and now - ws.last_access >= self.ttl_seconds:
+                    victims.append(self._drop(ws.id))
+                    self._expired += 1
+            for ws in list(self._workspaces.values()):
+                if self._bytes <= self.max_bytes:
+                    break
+                if ws.pins == 0:
+                    victims.append(self._drop(ws.id))
+                    self._evicted += 1
+            known = set(self._workspaces)
+        for ws in victims:
+            shutil.rmtree(ws.path, ignore_errors=True)
+        removed = len(victims)
+        # orphans from a previous run of the server (or one that crashed)
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            entries = os.listdir(self.root)
+        except OSError:
+            entries = []
+        for name in entries:
+            path = os.path.join(self.root, name)
+            if name in known or not os.path.isdir(path):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff and _orphaned(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def start_sweeper(self) -> None:
+        """Run `sweep` periodically on a daemon thread."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(self.sweep_interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    pass
+
+        self._sweeper = threading.Thread(target=_loop, name='artifact-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self.root,
+                'workspaces': len(self._workspaces),
+                'pinned_workspaces': sum(1 for ws in self._workspaces.values() if ws.pins),
+                'artifacts': len(self._artifacts),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'expired_total': self._expired,
+                'evicted_total': self._evicted,
+            }
@@ -1,75 +1,209 @@
 """
 Simple Flask backend with an upload endpoint that runs the pipeline.
-POST /upload expects 'files' in form-data (multiple allowed). Returns JSON with pipeline result.
+POST /upload expects 'files' in form-data (multiple allowed). Returns JSON with pipeline result,
+or newline-delimited JSON events as each file finishes when called with ?stream=1.
 """
+import json
 import os
-import tempfile
-from flask import Flask, request, jsonify, send_file
-from pipeline import run_pipeline_on_paths
+import time
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+from pipeline import run_pipeline_on_paths, iter_pipeline_on_paths, aggregate_per_file
+from admission import BULK, INTERACTIVE, AdmissionRejected, controller_from_env
+from ingestion import IMAGE_EXTENSIONS
 from security import sanitize_filename, allowed_file, mask_pii_in_result, MAX_UPLOAD_BYTES
 from taxcalc import compute_tax_estimate
 from forms import generate_1040_draft
+from sessions import SessionStore
+from artifacts import ArtifactStore
+from static_assets import StaticAssetCache, choose_encoding
+import metrics
+import profiling
 
 app = Flask(__name__)
 
-# Serve frontend
+# let a fronting web server (nginx X-Accel/Apache X-Sendfile) transmit artifact files itself
+app.config['USE_X_SENDFILE'] = os.environ.get('ROSY_X_SENDFILE') == '1'
+
+# owns every upload/finalize working directory; drafts are downloadable by opaque ID via
+# /download/<artifact_id>. Idle workspaces expire after the TTL and LRU ones are evicted over the quota.
+ARTIFACTS = ArtifactStore(
+    os.environ.get('ROSY_ARTIFACT_DIR'),
+    ttl_seconds=float(os.environ.get('ROSY_ARTIFACT_TTL', 60 * 60)),
+    max_bytes=int(os.environ.get('ROSY_ARTIFACT_MAX_BYTES', 1024 * 1024 * 1024)),
+)
+ARTIFACTS.start_sweeper()
+
+# parsed per-file state of each upload, kept for review edits and finalize
+SESSIONS = SessionStore()
+
+# bounded concurrency per heavy resource (see admission.py); over capacity a request gets 429 + Retry-After
+ADMISSION = controller_from_env()
+# uploads with more files or bytes than this are bulk work; clients can also ask for bulk with X-Rosy-Priority
+BULK_MIN_FILES = int(os.environ.get('ROSY_BULK_MIN_FILES', '5'))
+BULK_MIN_BYTES = int(os.environ.get('ROSY_BULK_MIN_BYTES', str(4 * 1024 * 1024)))
+# parsing time budgets (seconds): a file that overruns is cancelled and reported with status 'timeout', and
+# once the request budget is spent the remaining files are skipped; 0 disables (see timebudget.py)
+FILE_TIMEOUT = float(os.environ.get('ROSY_FILE_TIMEOUT', '60'))
+REQUEST_TIMEOUT = float(os.environ.get('ROSY_REQUEST_TIMEOUT', '300'))
+# uploads are copied to the workspace in chunks of this size
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                     endpoint=endpoint, status=response.status_code)
+        if response.status_code >= 500:
+            metrics.ERRORS.inc(component='http')
+    return response
+
+
+@app.errorhandler(AdmissionRejected)
+def _busy(e):
+    resp = jsonify({'error': 'server busy, retry later', 'resource': e.resource, 'retry_after': e.retry_after})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(e.retry_after)
+    return resp
+
+
+def _priority(n_files: int = 1) -> str:
+    # a client may always downgrade itself to bulk; large requests are bulk whatever they ask for
+    if request.headers.get('X-Rosy-Priority', '').lower() == BULK:
+        return BULK
+    if n_files > BULK_MIN_FILES or (request.content_length or 0) > BULK_MIN_BYTES:
+        return BULK
+    return INTERACTIVE
+
+
+@app.route('/admission/stats')
+def admission_stats():
+    return jsonify(ADMISSION.stats())
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text exposition format
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+# Serve frontend from memory: assets are loaded and precompressed at startup (reloaded on change when
+# ROSY_DEV=1) and served with strong ETags so repeat loads get a 304 without touching the filesystem.
+ASSETS = StaticAssetCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend'),
+    {
+        'index.html': 'text/html; charset=utf-8',
+        'app.js': 'application/javascript; charset=utf-8',
+        'static.css': 'text/css; charset=utf-8',
+    },
+    reload=os.environ.get('ROSY_DEV') == '1',
+)
+
+
+def _asset_response(name: str):
+    asset = ASSETS.get(name)
+    if asset is None:
+        return 'Not found', 404
+    encoding = choose_encoding(asset, request.accept_encodings)
+    etag = asset.etag_for(encoding)
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    not_modified = request.if_none_match.contains_weak(etag)
+    metrics.record_cache('static_etag', not_modified)
+    if not_modified:
+        return '', 304, headers
+    headers['Content-Type'] = asset.content_type
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return asset.encodings[encoding], 200, headers
+
+
 @app.route('/')
 def index():
-    root = os.path.join(os.path.dirname(__file__), 'frontend')
-    with open(os.path.join(root, 'index.html'), 'r', encoding='utf-8') as f:
-        return f.read()
+    return _asset_response('index.html')
 
 
 @app.route('/app.js')
 def app_js():
-    root = os.path.join(os.path.dirname(__file__), 'frontend')
-    with open(os.path.join(root, 'app.js'), 'r', encoding='utf-8') as f:
-        return f.read(), 200, {'Content-Type': 'application/javascript'}
+    return _asset_response('app.js')
 
 
 @app.route('/static.css')
 def static_css():
-    root = os.path.join(os.path.dirname(__file__), 'frontend')
-    with open(os.path.join(root, 'static.css'), 'r', encoding='utf-8') as f:
-        return f.read(), 200, {'Content-Type': 'text/css'}
+    return _asset_response('static.css')
 
 
-@app.route('/download')
-def download():
-    # This is a simple helper for the demo: it reads the file path provided and returns bytes.
-    # WARNING: Do NOT use this approach in production (path traversal risk). It's for local demo only.
-    path = request.args.get('path')
-    if not path or not os.path.exists(path):
+@app.route('/download/<artifact_id>')
+def download(artifact_id):
+    # Serve a registered artifact by its opaque ID. send_file streams the file through the server's
+    # wsgi.file_wrapper (sendfile where supported) and handles Range/If-None-Match/If-Modified-Since.
+    artifact = ARTIFACTS.get(artifact_id)
+    if artifact is None:
         return 'Not found', 404
-    # only allow files under temp dirs we create
-    # quick check: ensure path contains 'rosy_upload_'
-    if 'rosy_upload_' not in path:
-        return 'Not allowed', 403
-    with open(path, 'rb') as f:
-        data = f.read()
-    return data, 200, {'Content-Type': 'application/pdf'}
+    return _send_artifact(artifact, as_attachment=request.args.get('attachment') == '1')
+
+
+def _send_artifact(artifact, as_attachment: bool = False):
+    return send_file(artifact.path, mimetype=artifact.mimetype, as_attachment=as_attachment,
+                     download_name=artifact.download_name, conditional=True, etag=True)
+
 
 @app.route('/upload', methods=['POST'])
 def upload():
     files = request.files.getlist('files')
     if not files:
         return jsonify({'error': 'no files uploaded'}), 400
-    tmpdir = tempfile.mkdtemp(prefix='rosy_upload_')
+    # scanned images need OCR, the scarcest resource; admit before anything is written to disk
+    needs_ocr = any(os.path.splitext(f.filename or '')[1].lower() in IMAGE_EXTENSIONS for f in files)
+    slot = ADMISSION.acquire('ocr' if needs_ocr else 'parse', _priority(len(files)))
+    try:
+        return _upload(files, slot)
+    except BaseException:
+        slot.release()
+        raise
+
+
+def _save_upload(f, dest: str) -> bool:
+    """Copy an uploaded file to `dest` in chunks, stopping as soon as it exceeds MAX_UPLOAD_BYTES (False).
+    The upload is never held in memory whole."""
+    size = 0
+    with open(dest, 'wb') as out:
+        for chunk in iter(lambda: f.stream.read(UPLOAD_CHUNK_BYTES), b''):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                return False
+            out.write(chunk)
+    return True
+
+
+def _upload(files, slot):
+    # Runs with an admission slot held; the slot is released when the response is complete (for NDJSON,
+    # when the stream ends).
+    ws = ARTIFACTS.create_workspace('rosy_upload_')
     paths = []
     for f in files:
         filename = sanitize_filename(f.filename or 'uploaded')
-        dest = os.path.join(tmpdir, filename)
-        # basic size check if provided by stream
-        content = f.read()
-        if len(content) > MAX_UPLOAD_BYTES:
+        dest = os.path.join(ws.path, filename)
+        if not _save_upload(f, dest):
+            ARTIFACTS.discard(ws)
+            slot.release()
             return jsonify({'error': 'file too large'}), 400
-        f.stream.seek(0)
-        f.save(dest)
         # validate extension
         if not allowed_file(dest):
+            ARTIFACTS.discard(ws)
+            slot.release()
             return jsonify({'error': f'disallowed file type: {filename}'}), 400
         paths.append(dest)
-    out_dir = os.path.join(tmpdir, 'out')
+    out_dir = os.path.join(ws.path, 'out')
     os.makedirs(out_dir, exist_ok=True)
     # optional form fields for taxpayer info
     filing_status = request.form.get('filing_status', 'single')
@@ -79,69 +213,170 @@ def upload():
     except Exception:
         withholding_val = 0.0
 
+    # NDJSON mode: emit each file's result as soon as it is parsed (?stream=1 or Accept: application/x-ndjson)
+    if request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        cleanup = _StreamCleanup(ws, paths, slot)
+        events = _stream_upload(ws, paths, out_dir, filing_status, withholding_val, cleanup)
+        resp = Response(stream_with_context(events), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        # the generator cleans up when it ends; a client that disconnects before the first chunk never
+        # starts it, so the response's close does the same cleanup
+        resp.call_on_close(cleanup)
+        return resp
+
+    # profiled only when ROSY_PROFILE=1 or the request carries the profiling token; otherwise a plain call
+    run = profiling.wrap(run_pipeline_on_paths, request.headers, label='upload')
+    # a profiled run parses in-process, where the profiler can see it
+    file_timeout, request_timeout = (0, 0) if run is not run_pipeline_on_paths else (FILE_TIMEOUT, REQUEST_TIMEOUT)
     try:
-        res = run_pipeline_on_paths(paths, out_dir, filing_status=filing_status, withholding=withholding_val)
+        res = run(paths, out_dir, filing_status=filing_status, withholding=withholding_val,
+                  file_timeout=file_timeout, request_timeout=request_timeout)
     except Exception as e:
+        ARTIFACTS.discard(ws)
         return jsonify({'error': str(e)}), 500
-    # mask PII in returned result
-    safe = mask_pii_in_result(res)
-
-    # cleanup uploaded files
+    finally:
+        slot.release()
     try:
+        # expose the draft by artifact ID rather than by its filesystem path
+        draft_id = ARTIFACTS.register(res.pop('draft_form'), workspace=ws)
+        res['draft_id'] = draft_id
+        res['download_url'] = f'/download/{draft_id}'
+        # keep the unmasked parsed state server-side so review edits only send deltas
+        res['session_id'] = SESSIONS.create(res['per_file'], filing_status, withholding_val)
+        # mask PII in returned result
+        safe = mask_pii_in_result(res)
+    finally:
+        # cleanup uploaded files; the workspace (and its draft) is left to the store's TTL/quota
         for p in paths:
-            os.remove(p)
-    except Exception:
-        pass
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        ARTIFACTS.release(ws)
 
-    return jsonify(safe)
+    resp = jsonify(safe)
+    if hasattr(run, 'request_id'):
+        resp.headers['X-Profile-Id'] = run.request_id
+    return resp
+
+
+class _StreamCleanup:
+    """Runs once, from whichever of the stream's end or the response's close comes first: deletes the
+    uploaded files, unpins the workspace and returns the admission slot."""
+
+    def __init__(self, ws, paths, slot):
+        self.ws = ws
+        self.paths = paths
+        self.slot = slot
+        self._done = False
+
+    def __call__(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        for p in self.paths:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        ARTIFACTS.release(self.ws)
+        self.slot.release()
+
+
+def _stream_upload(ws, paths, out_dir, filing_status, withholding_val, cleanup):
+    # Generator behind the NDJSON upload mode: one masked JSON object per line, ending with a 'done'
+    # event that carries the review session ID (or an 'error' event if the pipeline failed).
+    per_file = []
+    try:
+        for event in iter_pipeline_on_paths(paths, out_dir, filing_status=filing_status, withholding=withholding_val,
+                                            file_timeout=FILE_TIMEOUT, request_timeout=REQUEST_TIMEOUT):
+            if event['event'] == 'file':
+                per_file.append(event['result'])
+            elif event['event'] == 'draft':
+                draft_id = ARTIFACTS.register(event.pop('draft_form'), workspace=ws)
+                event['draft_id'] = draft_id
+                event['download_url'] = f'/download/{draft_id}'
+            yield json.dumps(mask_pii_in_result(event)) + '\n'
+        session_id = SESSIONS.create(per_file, filing_status, withholding_val)
+        yield json.dumps({'event': 'done', 'session_id': session_id}) + '\n'
+    except Exception as e:
+        ARTIFACTS.discard(ws)
+        yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+    finally:
+        cleanup()
+
+
+@app.route('/sessions/<session_id>', methods=['PATCH'])
+def update_session(session_id):
+    # Apply edited fields for individual files: {"edits": [{"index": 0, "fields": {...}}], "filing_status": ...}
+    session = SESSIONS.get(session_id)
+    if session is None:
+        return jsonify({'error': 'session not found or expired'}), 404
+    data = request.get_json(silent=True) or {}
+    with session.lock:
+        try:
+            for edit in data.get('edits', []):
+                session.update_fields(int(edit.get('index')), edit.get('fields') or {})
+        except (IndexError, TypeError, ValueError) as e:
+            return jsonify({'error': f'invalid edit: {e}'}), 400
+        if data.get('filing_status'):
+            session.set_filing_status(data['filing_status'])
+        res = {'aggregated_fields': session.aggregated_fields(), 'tax_estimate': session.tax_estimate()}
+    return jsonify(mask_pii_in_result(res))
 
 
 @app.route('/finalize', methods=['POST'])
 def finalize():
-    # Accept edited per-file fields from frontend and regenerate final PDF
+    # Regenerate the final PDF from a review session ({"session_id": ...}) or, for older clients,
+    # from a full list of edited per-file fields ({"per_file": [...]}).
     data = request.get_json() or {}
-    per_file = data.get('per_file', [])
-    filing_status = data.get('filing_status', 'single')
-    # create a temporary dir to render final
-    tmpdir = tempfile.mkdtemp(prefix='rosy_final_')
-    out_dir = os.path.join(tmpdir, 'out')
-    os.makedirs(out_dir, exist_ok=True)
+    session_id = data.get('session_id')
+    if session_id:
+        session = SESSIONS.get(session_id)
+        if session is None:
+            return jsonify({'error': 'session not found or expired'}), 404
+        with session.lock:
+            if data.get('filing_status'):
+                session.set_filing_status(data['filing_status'])
+            agg_fields = session.aggregated_fields()
+            tax = session.tax_estimate()
+    else:
+        per_file = data.get('per_file', [])
+        filing_status = data.get('filing_status', 'single')
+        agg_fields, total_withholding = aggregate_per_file(per_file)
+        tax = compute_tax_estimate(agg_fields, filing_status=filing_status, withholding=total_withholding)
 
-    # aggregate fields from provided per_file entries
-    agg_fields = {}
-    total_wages = 0.0
-    total_withholding = 0.0
-    for r in per_file:
-        f = r.get('fields', {})
+    # render the final draft into a store-owned workspace
+    with ADMISSION.admit('render', _priority()):
+        ws = ARTIFACTS.create_workspace('rosy_final_')
+        out_dir = os.path.join(ws.path, 'out')
+        os.makedirs(out_dir, exist_ok=True)
         try:
-            if 'wages' in f:
-                total_wages += float(str(f['wages']).replace(',', '').replace('$', ''))
-            if 'amount' in f:
-                total_wages += float(str(f['amount']).replace(',', '').replace('$', ''))
+            form_path = generate_1040_draft(agg_fields, tax, out_dir)
         except Exception:
-            pass
-        try:
-            w = f.get('federal_income_tax_withheld') or f.get('federal income tax withheld') or f.get('withholding')
-            if w:
-                total_withholding += float(str(w).replace(',', '').replace('$', ''))
-        except Exception:
-            pass
-
-    if total_wages:
-        agg_fields['wages'] = round(total_wages, 2)
-    if total_withholding:
-        agg_fields['withholding'] = round(total_withholding, 2)
-
-    tax = compute_tax_estimate(agg_fields, filing_status=filing_status, withholding=total_withholding)
-    form_path = generate_1040_draft(agg_fields, tax, out_dir)
-    # Stream the PDF back as an attachment (demo). In production, ensure auth and secure storage.
+            ARTIFACTS.discard(ws)
+            raise
+    ext = os.path.splitext(form_path)[1]
+    draft_id = ARTIFACTS.register(form_path, download_name='draft_1040' + ext, workspace=ws)
+    ARTIFACTS.release(ws)
+    # Stream the draft back as an attachment; it stays downloadable (and resumable) via /download/<id>.
     try:
-        return send_file(form_path, mimetype='application/pdf', as_attachment=True, download_name='draft_1040.pdf')
+        resp = _send_artifact(ARTIFACTS.get(draft_id), as_attachment=True)
+        resp.headers['X-Artifact-Id'] = draft_id
+        return resp
     except Exception:
-        # fallback: return a minimal JSON indicating where the file is (masked)
-        res = {'aggregated_fields': agg_fields, 'tax_estimate': tax, 'draft_form': form_path}
+        # fallback: return a minimal JSON with the artifact reference (masked)
+        res = {'aggregated_fields': agg_fields, 'tax_estimate': tax, 'draft_id': draft_id,
+               'download_url': f'/download/{draft_id}'}
         safe = mask_pii_in_result(res)
         return jsonify(safe)
 
+@app.route('/artifacts/stats')
+def artifact_stats():
+    stats = ARTIFACTS.stats()
+    stats.pop('root', None)
+    return jsonify(stats)
+
+
 if __name__ == '__main__':
     app.run(port=5000)
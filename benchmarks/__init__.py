@@ -0,0 +1 @@
+# benchmarks package: synthetic document corpus and performance/regression harnesses
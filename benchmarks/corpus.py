@@ -0,0 +1,285 @@
+"""
+Deterministic synthetic document corpus for benchmarks.
+Generates W-2 and 1099-NEC text (and long consolidated 1099-B statements) in the layout the parsers expect, and writes it out as plain text,
+text-layer PDFs (reportlab, or PyMuPDF as a fallback), rasterized "scans" (Pillow) and "form" scans that
+place the values in the boxes of the parsing.layouts form layouts.
+The same seed always produces the same documents.
+
+Usage:
+  python -m benchmarks.corpus out_dir [--docs 10] [--pages 1] [--dpi 150] [--seed 0] [--kinds txt,pdf,scan,form]
+"""
+import os
+import random
+from typing import Dict, Any, Iterator, List, Sequence
+
+W2 = 'W-2'
+NEC = '1099'
+
+_COMPANIES = ['ACME Corp', 'Globex LLC', 'Initech Inc', 'Umbrella Co', 'Stark Industries', 'Wayne Enterprises',
+              'Hooli', 'Vandelay Industries', 'Soylent Corp', 'Tyrell Corporation']
+_NAMES = ['Alex Morgan', 'Jordan Lee', 'Sam Rivera', 'Taylor Kim', 'Casey Patel', 'Riley Chen', 'Jamie Singh']
+
+
+def _money(rng: random.Random, low: int, high: int) -> str:
+    return f'{rng.randint(low, high) + rng.randint(0, 99) / 100:,.2f}'
+
+
+def _ein(rng: random.Random) -> str:
+    return f'{rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}'
+
+
+def _ssn(rng: random.Random) -> str:
+    return f'{rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}'
+
+
+def w2_text(rng: random.Random) -> str:
+    wages = _money(rng, 20000, 250000)
+    withheld = _money(rng, 1000, 40000)
+    return '\n'.join([
+        'Form W-2 Wage and Tax Statement',
+        f'Employer: {rng.choice(_COMPANIES)}',
+        f'Employer Identification Number (EIN): {_ein(rng)}',
+        f'Employee: {rng.choice(_NAMES)}',
+        f'Employee SSN: {_ssn(rng)}',
+        f'Box 1: Wages, tips, other compensation ${wages}',
+        f'Box 2: Federal income tax withheld ${withheld}',
+        f'Box 3: Social security wages ${wages}',
+        f'Box 5: Medicare wages and tips ${wages}',
+    ])
+
+
+def nec_1099_text(rng: random.Random) -> str:
+    return '\n'.join([
+        'Form 1099-NEC',
+        f'Payer: {rng.choice(_COMPANIES)}',
+        f"Payer's TIN: {_ein(rng)}",
+        f'Recipient: {rng.choice(_NAMES)}',
+        f"Recipient's TIN: {_ssn(rng)}",
+        f'Box 1: Nonemployee compensation ${_money(rng, 500, 120000)}',
+        'Box 4: Federal income tax withheld $0.00',
+    ])
+
+
+_TICKERS = ['APPLE INC', 'MICROSOFT CORP', 'ALPHABET INC CL A', 'AMAZON COM INC', 'S&P 500 ETF TRUST',
+            'VANGUARD TOTAL STK MKT', 'NVIDIA CORP', 'TESLA INC', 'BERKSHIRE HATHAWAY CL B', 'ISHARES CORE BOND']
+
+
+def _signed(cents: int) -> str:
+    s = f'{abs(cents) / 100:,.2f}'
+    return f'({s})' if cents < 0 else s
+
+
+def b_1099_pages(rows: int, *, seed: int = 0, rows_per_page: int = 50) -> Iterator[str]:
+    """Yield the pages of a consolidated 1099-B statement with `rows` sale lines, one page at a time.
+    Every seventh row prints its description on a line of its own; a few rows were acquired on VARIOUS dates
+    and a few carry a wash sale adjustment.
+    """
+    rng = random.Random(seed)
+    header = ['Form 1099-B Proceeds From Broker and Barter Exchange Transactions',
+              'Description  Quantity  Date acquired  Date sold  Proceeds  Cost basis  Wash sale  Gain/loss']
+    lines = header + ['Short-term transactions for covered tax lots']
+    for i in range(rows):
+        if i == rows // 2:
+            lines.append('Long-term transactions for covered tax lots')
+        proceeds = rng.randint(1000, 5000000)
+        basis = rng.randint(1000, 5000000)
+        wash = rng.randint(1, 50000) if i % 29 == 0 else 0
+        gain = proceeds - basis + wash
+        acquired = 'VARIOUS' if i % 17 == 0 else f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2023'
+        sold = f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024'
+        desc = rng.choice(_TICKERS)
+        amounts = f'{_signed(proceeds):>14} {_signed(basis):>14} {_signed(wash):>10} {_signed(gain):>14}'
+        numbers = f'{rng.randint(1, 500)}.000 {acquired:>10} {sold} {amounts}'
+        if i % 7 == 3:
+            lines.extend([desc, f'    {numbers}'])
+        else:
+            lines.append(f'{desc:<26} {numbers}')
+        if len(lines) >= rows_per_page:
+            yield '\n'.join(lines)
+            lines = []
+    lines.append('Totals reported to the IRS')
+    yield '\n'.join(lines)
+
+
+def write_1099b_text(path: str, rows: int, *, seed: int = 0, rows_per_page: int = 50) -> str:
+    """Write a 1099-B statement as text with form feeds between pages, streaming page by page."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, page in enumerate(b_1099_pages(rows, seed=seed, rows_per_page=rows_per_page)):
+            if i:
+                f.write('\f')
+            f.write(page)
+    return path
+
+
+def generate_documents(count: int, *, seed: int = 0, pages: int = 1) -> List[Dict[str, Any]]:
+    """Return `count` documents as {'kind', 'pages': [text, ...]}, alternating W-2 and 1099-NEC.
+    Multi-page documents are bulk files with one form per page, each with fresh values.
+    """
+    rng = random.Random(seed)
+    docs = []
+    for i in range(count):
+        kind = W2 if i % 2 == 0 else NEC
+        make = w2_text if kind == W2 else nec_1099_text
+        docs.append({'kind': kind, 'pages': [make(rng) for _ in range(pages)]})
+    return docs
+
+
+def write_text(path: str, pages: Sequence[str]) -> str:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\f'.join(pages))
+    return path
+
+
+def write_text_pdf(path: str, pages: Sequence[str]) -> str:
+    """Write a PDF with a real text layer, one page per entry."""
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+    except Exception:
+        canvas = None
+    if canvas is not None:
+        c = canvas.Canvas(path, pagesize=letter, invariant=1)
+        _, height = letter
+        for text in pages:
+            c.setFont('Helvetica', 11)
+            y = height - 72
+            for line in text.splitlines():
+                c.drawString(72, y, line)
+                y -= 16
+            c.showPage()
+        c.save()
+        return path
+    try:
+        import fitz
+    except Exception:
+        raise RuntimeError('reportlab or PyMuPDF is required to write PDFs')
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text, fontsize=11)
+    doc.save(path)
+    return path
+
+
+def render_scan(text: str, *, dpi: int = 150, seed: int = 0, skew_degrees: float = 0.0):
+    """Rasterize text onto a letter-size grayscale page with light deterministic noise. Returns a PIL image."""
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except Exception:
+        raise RuntimeError('Pillow is required to render scans')
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    img = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    size = max(8, int(dpi * 0.15))
+    try:
+        font = ImageFont.load_default(size=size)
+    except TypeError:
+        font = ImageFont.load_default()
+    x, y = dpi, dpi
+    for line in text.splitlines():
+        draw.text((x, y), line, fill=0, font=font)
+        y += int(size * 1.6)
+    rng = random.Random(seed)
+    pixels = img.load()
+    for _ in range(width * height // 400):
+        pixels[rng.randrange(width), rng.randrange(height)] = rng.randint(120, 230)
+    if skew_degrees:
+        img = img.rotate(skew_degrees, expand=False, fillcolor=255)
+    return img
+
+
+def render_form_scan(kind: str, fields: Dict[str, Any], *, dpi: int = 150, seed: int = 0):
+    """Rasterize a form in its standard layout: a frame with one labelled box per layout field holding
+    the field's value, and the form title along the bottom. Returns a PIL image of a letter-size page.
+    """
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except Exception:
+        raise RuntimeError('Pillow is required to render scans')
+    from parsing.layouts import get_layout
+    title = 'Form W-2 Wage and Tax Statement' if kind == W2 else 'Form 1099-NEC Nonemployee Compensation'
+    layout = get_layout(kind, title)
+    img = Image.new('L', (int(8.5 * dpi), int(11 * dpi)), 255)
+    draw = ImageDraw.Draw(img)
+    size = max(8, int(dpi * 0.13))
+    try:
+        font = ImageFont.load_default(size=size)
+    except TypeError:
+        font = ImageFont.load_default()
+    left, top = int(0.25 * dpi), int(0.5 * dpi)
+    width = int(8.0 * dpi)
+    height = int(width / layout.aspect)
+    draw.rectangle((left, top, left + width, top + height), outline=0, width=max(1, dpi // 75))
+    for name, region in layout.fields.items():
+        x0, y0, x1, y1 = region.box
+        box = (left + x0 * width, top + y0 * height, left + x1 * width, top + y1 * height)
+        draw.rectangle(box, outline=0, width=1)
+        draw.text((box[0] + 4, box[1] + 2), name.replace('_', ' '), fill=0, font=font)
+        if name in fields:
+            draw.text((box[0] + 4, box[1] + 4 + size * 1.2), str(fields[name]), fill=0, font=font)
+    draw.text((left + 8, top + height - 2 * size), title, fill=0, font=font)
+    rng = random.Random(seed)
+    pixels = img.load()
+    for _ in range(img.width * img.height // 400):
+        pixels[rng.randrange(img.width), rng.randrange(img.height)] = rng.randint(120, 230)
+    return img
+
+
+def write_scan(path: str, pages: Sequence[str], *, dpi: int = 150, seed: int = 0) -> str:
+    """Write a rasterized scan; multi-page input goes into a multi-frame TIFF (or only the first page for PNG/JPEG)."""
+    images = [render_scan(t, dpi=dpi, seed=seed + i) for i, t in enumerate(pages)]
+    if len(images) > 1 and path.lower().endswith(('.tif', '.tiff')):
+        images[0].save(path, save_all=True, append_images=images[1:], dpi=(dpi, dpi))
+    else:
+        images[0].save(path, dpi=(dpi, dpi))
+    return path
+
+
+def generate_corpus(out_dir: str, *, docs: int = 10, pages: int = 1, dpi: int = 150, seed: int = 0,
+                    kinds: Sequence[str] = ('txt', 'pdf', 'scan')) -> Dict[str, List[str]]:
+    """Write a corpus under `out_dir` and return {kind: [paths]}. Kinds that lack a dependency are skipped."""
+    os.makedirs(out_dir, exist_ok=True)
+    documents = generate_documents(docs, seed=seed, pages=pages)
+    out: Dict[str, List[str]] = {}
+    for kind in kinds:
+        paths = []
+        for i, doc in enumerate(documents):
+            stem = os.path.join(out_dir, f'doc{i:04d}_{doc["kind"].lower().replace("-", "")}')
+            try:
+                if kind == 'txt':
+                    paths.append(write_text(stem + '.txt', doc['pages']))
+                elif kind == 'pdf':
+                    paths.append(write_text_pdf(stem + '.pdf', doc['pages']))
+                elif kind == 'form':
+                    from parsing import extract_fields
+                    fields = extract_fields(doc['pages'][0], doc['kind'])
+                    img = render_form_scan(doc['kind'], fields, dpi=dpi, seed=seed + i)
+                    paths.append(stem + '_form.png')
+                    img.save(paths[-1], dpi=(dpi, dpi))
+                elif kind == 'scan':
+                    ext = '.tiff' if len(doc['pages']) > 1 else '.png'
+                    paths.append(write_scan(stem + ext, doc['pages'], dpi=dpi, seed=seed + i))
+                else:
+                    raise ValueError(f'unknown corpus kind: {kind}')
+            except RuntimeError:
+                paths = []
+                break
+        if paths:
+            out[kind] = paths
+    return out
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='Generate a synthetic W-2/1099 corpus')
+    ap.add_argument('out_dir')
+    ap.add_argument('--docs', type=int, default=10)
+    ap.add_argument('--pages', type=int, default=1)
+    ap.add_argument('--dpi', type=int, default=150)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--kinds', default='txt,pdf,scan')
+    args = ap.parse_args()
+    corpus = generate_corpus(args.out_dir, docs=args.docs, pages=args.pages, dpi=args.dpi, seed=args.seed,
+                             kinds=args.kinds.split(','))
+    for kind, paths in corpus.items():
+        print(f'{kind}: {len(paths)} files')
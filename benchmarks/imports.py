@@ -0,0 +1,93 @@
+"""
+Cold-start import benchmark for the CLI and batch entry points.
+Imports each entry module in a fresh interpreter with `-X importtime`, reports the fastest cumulative import
+time and fails when a module got slower than its baseline (`import_baseline.json`) by more than the threshold,
+or when importing it loads one of the heavy optional libraries (PDF, rendering, OCR, embeddings) that only
+specific code paths need.
+
+Usage:
+  python -m benchmarks.imports [--repeat 5] [--threshold 0.5] [--update-baseline]
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.stages import compare, load_baseline, save_baseline  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, 'import_baseline.json')
+ENTRY_MODULES = ('cli', 'pipeline', 'forms', 'ingestion', 'jobqueue', 'resultstore', 'storage',
+                 'parsing.transactions')
+HEAVY_MODULES = ('fitz', 'pdfminer', 'reportlab', 'pdfrw', 'PIL', 'numpy', 'pytesseract',
+                 'sentence_transformers', 'torch')
+
+_PROBE = ('import sys; import {module}; '
+          'print(",".join(m for m in {heavy!r} if m in sys.modules))')
+
+
+def import_profile(module: str) -> Tuple[float, List[str]]:
+    """(cumulative seconds to import `module` in a fresh interpreter, heavy modules it loaded)."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1]) / 1e6
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+    return cumulative or 0.0, loaded
+
+
+def run_imports(modules=ENTRY_MODULES, repeat: int = 5) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    """Fastest import seconds per module (the least disturbed run), and the heavy modules each one pulled in."""
+    times: Dict[str, float] = {}
+    heavy: Dict[str, List[str]] = {}
+    for module in modules:
+        samples = []
+        for _ in range(repeat):
+            seconds, loaded = import_profile(module)
+            samples.append(seconds)
+        times[module] = min(samples)
+        if loaded:
+            heavy[module] = loaded
+    return times, heavy
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='Benchmark cold-start import time of the entry points')
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--threshold', type=float, default=0.5)
+    ap.add_argument('--baseline', default=BASELINE_PATH)
+    ap.add_argument('--update-baseline', action='store_true')
+    args = ap.parse_args(argv)
+
+    times, heavy = run_imports(repeat=args.repeat)
+    baseline = load_baseline(args.baseline)
+    for module, seconds in sorted(times.items()):
+        base = baseline.get(module)
+        delta = f'  ({seconds / base - 1.0:+.0%} vs baseline)' if base else ''
+        print(f'{module:<28} {seconds * 1000:9.2f}ms{delta}')
+    if args.update_baseline:
+        save_baseline(times, args.baseline, repeat=args.repeat)
+        print('Baseline written to', args.baseline)
+        return 0
+
+    failures = compare(times, baseline, args.threshold)
+    failures += [f'{module}: imports {", ".join(mods)} at module level' for module, mods in sorted(heavy.items())]
+    if failures:
+        print('\nImport regressions:')
+        for f in failures:
+            print('  ' + f)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
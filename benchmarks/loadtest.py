@@ -0,0 +1,321 @@
+"""
+HTTP load test for the backend: drives /upload followed by /finalize with documents from the synthetic corpus.
+Each iteration uploads --files-per-upload documents and finalizes the returned review session.
+
+Targets:
+  --target inprocess   Flask test client in this process (no sockets; measures the app itself)
+  --target local       a threaded HTTP server started in this process on a free port (default)
+  --url URL            an already running server
+
+Load:
+  --concurrency N      N closed-loop workers (each starts its next iteration when the previous one ends)
+  --rate R             open loop: iterations arrive as a Poisson process at R/s, served by N workers; latency
+                       is measured from the scheduled arrival, so queueing behind a saturated server counts
+
+The report (JSON, --out) has throughput, latency percentiles per endpoint, error and 429 rates and a
+per-stage breakdown taken from the difference of /metrics before and after the run.
+
+Usage:
+  python -m benchmarks.loadtest [--iterations 50] [--concurrency 4] [--rate 5] [--kinds txt,pdf]
+                                [--files-per-upload 2] [--target local|inprocess] [--url URL] [--out load.json]
+"""
+import json
+import os
+import platform
+import queue
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+
+_STAGE_RE = re.compile(r'^rosy_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.eE+-]+)$')
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of `samples`, or None when there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _multipart(files: List[Tuple[str, bytes]]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{name}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class HttpClient:
+    """Minimal client for a backend at `base_url` (urllib, one request per call)."""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _call(self, method: str, path: str, body: Optional[bytes] = None,
+              content_type: Optional[str] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read(), dict(resp.headers)
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), dict(e.headers)
+
+    def upload(self, files: List[Tuple[str, bytes]]):
+        body, ctype = _multipart(files)
+        return self._call('POST', '/upload', body, ctype)
+
+    def finalize(self, session_id: str):
+        return self._call('POST', '/finalize', json.dumps({'session_id': session_id}).encode('utf-8'),
+                          'application/json')
+
+    def metrics(self) -> str:
+        return self._call('GET', '/metrics')[1].decode('utf-8')
+
+
+class InProcessClient:
+    """Same interface over the Flask test client (one per thread: test clients aren't shared)."""
+
+    def __init__(self):
+        from backend import app
+        self.app = app
+        self._local = threading.local()
+
+    @property
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def upload(self, files: List[Tuple[str, bytes]]):
+        import io
+        data = {'files': [(io.BytesIO(d), name) for name, d in files]}
+        resp = self._client.post('/upload', data=data, content_type='multipart/form-data')
+        return resp.status_code, resp.get_data(), dict(resp.headers)
+
+    def finalize(self, session_id: str):
+        resp = self._client.post('/finalize', json={'session_id': session_id})
+        return resp.status_code, resp.get_data(), dict(resp.headers)
+
+    def metrics(self) -> str:
+        return self._client.get('/metrics').get_data(as_text=True)
+
+
+def start_local_server():
+    """Serve the backend on 127.0.0.1:<free port> in a daemon thread. Returns (server, base_url)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from backend import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def stage_totals(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """{stage: {'sum': seconds, 'count': n}} from a Prometheus exposition of rosy_stage_duration_seconds."""
+    out: Dict[str, Dict[str, float]] = {}
+    for line in metrics_text.splitlines():
+        m = _STAGE_RE.match(line)
+        if m:
+            out.setdefault(m.group(2), {'sum': 0.0, 'count': 0.0})[m.group(1)] = float(m.group(3))
+    return out
+
+
+def _stage_breakdown(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    out = {}
+    for stage, a in sorted(after.items()):
+        b = before.get(stage, {'sum': 0.0, 'count': 0.0})
+        count = a['count'] - b['count']
+        if count > 0:
+            total = a['sum'] - b['sum']
+            out[stage] = {'count': int(count), 'total_seconds': round(total, 4),
+                          'mean_ms': round(total / count * 1000, 3)}
+    return out
+
+
+def _summary(latencies: List[float], statuses: Dict[int, int]) -> Dict[str, Any]:
+    total = sum(statuses.values())
+    errors = sum(n for code, n in statuses.items() if code >= 400 and code != 429)
+    return {
+        'requests': total,
+        'status_codes': {str(k): v for k, v in sorted(statuses.items())},
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'rejected_rate': round(statuses.get(429, 0) / total, 4) if total else 0.0,
+        'latency_ms': {f'p{q}': round(percentile(latencies, q) * 1000, 2) if latencies else None
+                       for q in (50, 95, 99)},
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def run_load(client, corpus: List[str], *, iterations: int = 50, concurrency: int = 4,
+             rate: Optional[float] = None, files_per_upload: int = 2, seed: int = 0) -> Dict[str, Any]:
+    """Drive `iterations` upload+finalize rounds through `client` and return the report."""
+    rng = random.Random(seed)
+    blobs = []
+    for path in corpus:
+        with open(path, 'rb') as f:
+            blobs.append((os.path.basename(path), f.read()))
+    batches = [[blobs[rng.randrange(len(blobs))] for _ in range(files_per_upload)] for _ in range(iterations)]
+    # arrival offsets: Poisson process at `rate`, or None for closed loop
+    arrivals: List[Optional[float]] = [None] * iterations
+    if rate:
+        t = 0.0
+        for i in range(iterations):
+            t += rng.expovariate(rate)
+            arrivals[i] = t
+
+    results: Dict[str, List[float]] = {'upload': [], 'finalize': [], 'iteration': []}
+    statuses: Dict[str, Dict[int, int]] = {'upload': {}, 'finalize': {}}
+    failures: List[str] = []
+    lock = threading.Lock()
+    work: 'queue.Queue[Optional[int]]' = queue.Queue()
+    for i in range(iterations):
+        work.put(i)
+
+    def record(endpoint: str, status: int, seconds: float) -> None:
+        with lock:
+            statuses[endpoint][status] = statuses[endpoint].get(status, 0) + 1
+            if status < 400:
+                results[endpoint].append(seconds)
+
+    def worker():
+        while True:
+            try:
+                i = work.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            if arrivals[i] is not None:
+                delay = t0 + arrivals[i] - start
+                if delay > 0:
+                    time.sleep(delay)
+                # measured from the scheduled arrival: time spent waiting for a free worker counts
+                start = t0 + arrivals[i]
+            try:
+                status, body, _ = client.upload(batches[i])
+                up_end = time.perf_counter()
+                record('upload', status, up_end - start)
+                if status != 200:
+                    continue
+                session_id = json.loads(body)['session_id']
+                fin_start = time.perf_counter()
+                status, _, _ = client.finalize(session_id)
+                end = time.perf_counter()
+                record('finalize', status, end - fin_start)
+                if status == 200:
+                    with lock:
+                        results['iteration'].append(end - start)
+            except Exception as e:
+                with lock:
+                    failures.append(f'{type(e).__name__}: {e}')
+
+    before = stage_totals(client.metrics())
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    after = stage_totals(client.metrics())
+
+    completed = len(results['iteration'])
+    return {
+        'iterations': iterations,
+        'completed': completed,
+        'failures': len(failures),
+        'failure_samples': failures[:5],
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(completed / elapsed, 3) if elapsed else None,
+        'documents_per_second': round(completed * files_per_upload / elapsed, 3) if elapsed else None,
+        'endpoints': {name: _summary(results[name], statuses[name]) for name in ('upload', 'finalize')},
+        'iteration_latency_ms': {f'p{q}': round(percentile(results['iteration'], q) * 1000, 2)
+                                 if results['iteration'] else None for q in (50, 95, 99)},
+        'stages': _stage_breakdown(before, after),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    import subprocess
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='Load test /upload + /finalize')
+    ap.add_argument('--iterations', type=int, default=50)
+    ap.add_argument('--concurrency', type=int, default=4)
+    ap.add_argument('--rate', type=float, help='open-loop arrivals per second (default: closed loop)')
+    ap.add_argument('--files-per-upload', type=int, default=2)
+    ap.add_argument('--kinds', default='txt,pdf', help='corpus kinds to upload (txt, pdf, scan, form)')
+    ap.add_argument('--docs', type=int, default=20, help='distinct corpus documents per kind')
+    ap.add_argument('--target', choices=('local', 'inprocess'), default='local')
+    ap.add_argument('--url', help='drive an already running server instead')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--out', help='write the JSON report here (default: stdout only)')
+    args = ap.parse_args(argv)
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='rosy_load_') as work_dir:
+        corpus = generate_corpus(work_dir, docs=args.docs, seed=args.seed, kinds=tuple(args.kinds.split(',')))
+        paths = [p for kind_paths in corpus.values() for p in kind_paths]
+        if not paths:
+            print('no corpus documents could be generated for kinds', args.kinds)
+            return 2
+        if args.url:
+            client = HttpClient(args.url)
+        elif args.target == 'inprocess':
+            client = InProcessClient()
+        else:
+            server, url = start_local_server()
+            client = HttpClient(url)
+        try:
+            report = run_load(client, paths, iterations=args.iterations, concurrency=args.concurrency,
+                              rate=args.rate, files_per_upload=args.files_per_upload, seed=args.seed)
+        finally:
+            if server is not None:
+                server.shutdown()
+    report['meta'] = {
+        'target': args.url or args.target, 'kinds': sorted(corpus), 'concurrency': args.concurrency,
+        'rate': args.rate, 'files_per_upload': args.files_per_upload, 'git_revision': _git_revision(),
+        'python': platform.python_version(), 'cpus': os.cpu_count(), 'timestamp': time.time(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Per-stage memory benchmark with budgets.
+Runs each pipeline stage on the largest synthetic inputs (multi-page text and PDF bundles, a long consolidated
+1099-B, a 300 dpi scan for OCR preprocessing, an oversized upload) under tracemalloc and records, per stage:
+
+  peak_bytes      highest traced allocation while the stage ran, above what was live before it
+  retained_bytes  what is still allocated after the stage's result was dropped (leaks, caches)
+  top_sites       the source lines holding the most memory near the peak (sampled while the stage runs)
+
+and fails when a stage's peak exceeds its budget in BUDGETS, printing the top allocation sites.
+tracemalloc sees Python objects and NumPy arrays but not Pillow's pixel buffers, so image stages are measured
+through their NumPy work.
+
+Usage:
+  python -m benchmarks.memory [--docs 20] [--pages 5] [--rows 20000] [--top 10] [--out memory.json]
+"""
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus, render_scan, w2_text, write_1099b_text  # noqa: E402
+
+MB = 1024 * 1024
+TRACE_FRAMES = 8
+# growth below this is not worth a snapshot when looking for the peak's allocation sites
+MIN_SAMPLED_BYTES = 256 * 1024
+# peak traced bytes per stage at the default sizes (--docs 20 --pages 5 --rows 20000), with headroom over
+# today's numbers so only a real change in how much a stage holds at once trips them
+BUDGETS = {
+    'ingest_paths[txt]': 1 * MB,
+    'ingest_paths[pdf]': 2 * MB,
+    'ingest_paths[1099b]': 8 * MB,
+    'parse_documents': 1 * MB,
+    # one 300 dpi letter page is 8 MiB of grayscale pixels; preprocessing may hold about four such planes
+    'ocr_preprocess[scan]': 48 * MB,
+    'generate_1040_draft': 2 * MB,
+    'run_pipeline_on_paths[txt]': 2 * MB,
+    'run_pipeline_on_paths[pdf]': 2 * MB,
+    # an upload over MAX_UPLOAD_BYTES is rejected while streaming it to disk, never read whole
+    'upload[oversize]': 2 * MB,
+}
+_IGNORED_FILES = [tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+                  '<unknown>']
+
+
+class _PeakSampler(threading.Thread):
+    """Polls the traced size while a stage runs and snapshots it each time it reaches a new high, so the
+    allocation sites behind a transient peak can be reported after they were freed."""
+
+    def __init__(self, base: int, interval: float = 0.002):
+        super().__init__(daemon=True)
+        self.base = base
+        self.interval = interval
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self._high = base + MIN_SAMPLED_BYTES
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > self._high:
+                self.snapshot = tracemalloc.take_snapshot()
+                self._high = self.base + (current - self.base) * 1.1
+
+    def stop(self) -> Optional[tracemalloc.Snapshot]:
+        self._done.set()
+        self.join()
+        return self.snapshot
+
+
+def _sites(snapshot: tracemalloc.Snapshot, before: tracemalloc.Snapshot, top: int) -> List[str]:
+    filters = [tracemalloc.Filter(False, name) for name in _IGNORED_FILES]
+    diff = snapshot.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    return [f'{s.traceback[0].filename}:{s.traceback[0].lineno}: {s.size_diff / 1024:.1f} KiB in {s.count_diff} blocks'
+            for s in diff[:top] if s.size_diff > 0]
+
+
+def measure(fn: Callable[[], Any], *, top: int = 10) -> Dict[str, Any]:
+    """Peak and retained traced memory of one call of `fn` (after one untraced warm-up call, so imports and
+    one-time caches are not charged to the stage), plus the top allocation sites near the peak."""
+    fn()
+    gc.collect()
+    tracemalloc.start(TRACE_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        sampler = _PeakSampler(base)
+        sampler.start()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        at_peak = sampler.stop()
+        # the stage's end state when the sampler never saw it grow (fast stages)
+        sites = _sites(at_peak or tracemalloc.take_snapshot(), before, top)
+        del result, at_peak, before, sampler
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak, 'retained_bytes': max(0, retained), 'top_sites': sites}
+
+
+def _oversize_upload(size: int):
+    """A WSGI call that uploads `size` bytes of text; the request body is built up front, outside the trace."""
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+    from backend import app
+
+    body = (b'Form W-2 Wage and Tax Statement\n' * (size // 32 + 1))[:size]
+    environ = EnvironBuilder(method='POST', path='/upload',
+                             data={'files': (io.BytesIO(body), 'big.txt')}).get_environ()
+    payload = environ['wsgi.input'].read()
+    del body
+
+    def upload():
+        environ['wsgi.input'] = io.BytesIO(payload)
+        return run_wsgi_app(app, dict(environ), buffered=True)[1]
+    return upload
+
+
+def run_memory(*, docs: int = 20, pages: int = 5, dpi: int = 150, rows: int = 20000, seed: int = 0,
+               top: int = 10, work_dir: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Measure every stage and return {stage: {'peak_bytes', 'retained_bytes', 'top_sites'}}."""
+    from ingestion import ingest_paths
+    from parsing import detect_document_type, extract_fields, validate_fields
+    from taxcalc import compute_tax_estimate
+    from forms import generate_1040_draft
+    from pipeline import aggregate_per_file, run_pipeline_on_paths
+    from rendercache import RENDER_CACHE
+    from security import MAX_UPLOAD_BYTES
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='rosy_mem_')
+    corpus = generate_corpus(os.path.join(work_dir, 'corpus'), docs=docs, pages=pages, dpi=dpi, seed=seed,
+                             kinds=('txt', 'pdf'))
+    statement = write_1099b_text(os.path.join(work_dir, 'statement.txt'), rows, seed=seed)
+    out_dir = os.path.join(work_dir, 'out')
+    results: Dict[str, Dict[str, Any]] = {}
+
+    for kind, paths in corpus.items():
+        results[f'ingest_paths[{kind}]'] = measure(lambda: ingest_paths(paths), top=top)
+    results['ingest_paths[1099b]'] = measure(lambda: ingest_paths([statement]), top=top)
+
+    texts = [ingest_paths([p]) for p in corpus['txt']]
+
+    def parse():
+        out = []
+        for t in texts:
+            doc_type = detect_document_type(t)[0]
+            fields = extract_fields(t, doc_type)
+            out.append((fields, validate_fields(fields, doc_type)))
+        return out
+    results['parse_documents'] = measure(parse, top=top)
+
+    try:
+        from preprocess import prepare_for_ocr
+        scan = render_scan(w2_text(__import__('random').Random(seed)), dpi=300, seed=seed)
+    except Exception:
+        scan = None
+    if scan is not None:
+        results['ocr_preprocess[scan]'] = measure(lambda: prepare_for_ocr(scan), top=top)
+
+    agg, withheld = aggregate_per_file([{'fields': fields} for fields, _ in parse()])
+    tax = compute_tax_estimate(agg, filing_status='single', withholding=withheld)
+
+    def render():
+        # a cache hit would measure nothing; render for real every time
+        RENDER_CACHE.clear()
+        return generate_1040_draft(agg, tax, out_dir)
+    results['generate_1040_draft'] = measure(render, top=top)
+    RENDER_CACHE.clear()
+
+    for kind, paths in corpus.items():
+        results[f'run_pipeline_on_paths[{kind}]'] = measure(lambda: run_pipeline_on_paths(paths, out_dir), top=top)
+    RENDER_CACHE.clear()
+
+    results['upload[oversize]'] = measure(_oversize_upload(MAX_UPLOAD_BYTES + MB), top=top)
+
+    if own_dir:
+        import shutil
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def check_budgets(results: Dict[str, Dict[str, Any]], budgets: Optional[Dict[str, int]] = None) -> List[str]:
+    """A message (with the stage's top allocation sites) for every stage whose peak is over its budget."""
+    budgets = BUDGETS if budgets is None else budgets
+    failures = []
+    for stage, r in sorted(results.items()):
+        budget = budgets.get(stage)
+        if budget is not None and r['peak_bytes'] > budget:
+            sites = ''.join(f'\n    {s}' for s in r['top_sites'])
+            failures.append(f'{stage}: peak {r["peak_bytes"] / MB:.2f} MiB over budget {budget / MB:.2f} MiB'
+                            f'{sites}')
+    return failures
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='Per-stage peak/retained memory against budgets')
+    ap.add_argument('--docs', type=int, default=20)
+    ap.add_argument('--pages', type=int, default=5)
+    ap.add_argument('--rows', type=int, default=20000)
+    ap.add_argument('--top', type=int, default=10)
+    ap.add_argument('--out', help='write the JSON results here')
+    args = ap.parse_args(argv)
+
+    results = run_memory(docs=args.docs, pages=args.pages, rows=args.rows, top=args.top)
+    for stage, r in sorted(results.items()):
+        budget = BUDGETS.get(stage)
+        limit = f'  (budget {budget / MB:.1f} MiB)' if budget else ''
+        print(f'{stage:<32} peak {r["peak_bytes"] / MB:8.2f} MiB  retained {r["retained_bytes"] / MB:8.2f} MiB{limit}')
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    failures = check_budgets(results)
+    if failures:
+        print('\nOver budget:')
+        for msg in failures:
+            print('  ' + msg)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
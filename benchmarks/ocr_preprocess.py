@@ -0,0 +1,61 @@
+"""
+Benchmark for the in-memory OCR preprocessing stage on oversized "camera" images.
+Times `prepare_for_ocr` alone and, when a Tesseract binary is available, OCR of the raw image versus
+OCR of the preprocessed one.
+
+Usage:
+  python -m benchmarks.ocr_preprocess [--dpi 480] [--skew 2.5] [--repeat 3] [--target-dpi 300]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import render_scan, w2_text  # noqa: E402
+from benchmarks.stages import ocr_available  # noqa: E402
+
+
+def _median_time(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def run(*, dpi: int = 480, skew: float = 2.5, repeat: int = 3, target_dpi: int = 300) -> dict:
+    from preprocess import prepare_for_ocr
+    # a 480 dpi letter page is ~4080x5280, similar to a 20 MP phone photo of a form
+    img = render_scan(w2_text(random.Random(0)), dpi=dpi, seed=0, skew_degrees=skew)
+    report = {'input_size': list(img.size), 'target_dpi': target_dpi}
+    prep_s, prepared = _median_time(lambda: prepare_for_ocr(img, target_dpi=target_dpi), repeat)
+    report['prepared_size'] = list(prepared.size)
+    report['preprocess_seconds'] = round(prep_s, 4)
+    if ocr_available():
+        import pytesseract
+        raw_s, _ = _median_time(lambda: pytesseract.image_to_string(img), 1)
+        ocr_s, _ = _median_time(lambda: pytesseract.image_to_string(prepared), repeat)
+        report['ocr_raw_seconds'] = round(raw_s, 4)
+        report['ocr_preprocessed_seconds'] = round(ocr_s, 4)
+        report['speedup'] = round(raw_s / (prep_s + ocr_s), 2)
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    ap = argparse.ArgumentParser(description='Benchmark OCR preprocessing on oversized images')
+    ap.add_argument('--dpi', type=int, default=480)
+    ap.add_argument('--skew', type=float, default=2.5)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--target-dpi', type=int, default=300)
+    args = ap.parse_args()
+    print(json.dumps(run(dpi=args.dpi, skew=args.skew, repeat=args.repeat, target_dpi=args.target_dpi), indent=2))
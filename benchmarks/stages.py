@@ -0,0 +1,158 @@
+"""
+Per-stage benchmark suite with stored baselines.
+Times each pipeline stage (ingest_paths per input kind, detect_document_type, extract_fields, validate_fields,
+compute_tax_estimate, generate_1040_draft) and the end-to-end run_pipeline_on_paths on a synthetic corpus,
+then compares the medians against `baseline.json` and fails when a stage got slower than the threshold.
+
+Baselines are machine specific: refresh them with --update-baseline on the machine that runs the check.
+
+Usage:
+  python -m benchmarks.stages [--docs 20] [--pages 1] [--repeat 5] [--threshold 0.25] [--update-baseline]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+# stages faster than this are dominated by timer noise and are never reported as regressions
+MIN_COMPARABLE_SECONDS = 0.0005
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    """Median wall time of `fn` over `repeat` runs (after one warm-up run)."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def ocr_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run_benchmarks(*, docs: int = 20, pages: int = 1, dpi: int = 150, repeat: int = 5, seed: int = 0,
+                   kinds=('txt', 'pdf', 'scan', 'form'), work_dir: Optional[str] = None) -> Dict[str, float]:
+    """Run every stage benchmark and return {stage name: median seconds per corpus pass}."""
+    from ingestion import ingest_paths
+    from parsing import detect_document_type, extract_fields, validate_fields
+    from taxcalc import compute_tax_estimate
+    from forms import generate_1040_draft
+    from pipeline import run_pipeline_on_paths, aggregate_per_file
+
+    if not ocr_available():
+        kinds = tuple(k for k in kinds if k not in ('scan', 'form'))
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='rosy_bench_')
+    corpus = generate_corpus(os.path.join(work_dir, 'corpus'), docs=docs, pages=pages, dpi=dpi, seed=seed,
+                             kinds=kinds)
+    out_dir = os.path.join(work_dir, 'out')
+    results: Dict[str, float] = {}
+
+    for kind, paths in corpus.items():
+        results[f'ingest_paths[{kind}]'] = _time(lambda: [ingest_paths([p]) for p in paths], repeat)
+
+    texts = [ingest_paths([p]) for p in corpus.get('txt') or next(iter(corpus.values()))]
+    typed = [(t, detect_document_type(t)[0]) for t in texts]
+    fields = [extract_fields(t, dt) for t, dt in typed]
+    results['detect_document_type'] = _time(lambda: [detect_document_type(t) for t in texts], repeat)
+    results['extract_fields'] = _time(lambda: [extract_fields(t, dt) for t, dt in typed], repeat)
+    results['validate_fields'] = _time(
+        lambda: [validate_fields(f, dt) for f, (_, dt) in zip(fields, typed)], repeat)
+
+    agg, withheld = aggregate_per_file([{'fields': f} for f in fields])
+    results['compute_tax_estimate'] = _time(
+        lambda: compute_tax_estimate(agg, filing_status='single', withholding=withheld), repeat)
+    tax = compute_tax_estimate(agg, filing_status='single', withholding=withheld)
+    results['generate_1040_draft'] = _time(lambda: generate_1040_draft(agg, tax, out_dir), repeat)
+
+    for kind, paths in corpus.items():
+        results[f'run_pipeline_on_paths[{kind}]'] = _time(lambda: run_pipeline_on_paths(paths, out_dir), repeat)
+
+    if own_dir:
+        import shutil
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, float]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('stages', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results: Dict[str, float], path: str = BASELINE_PATH, **meta) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'stages': {k: round(v, 6) for k, v in sorted(results.items())}}, f, indent=2)
+        f.write('\n')
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Return a message for every stage that is more than `threshold` (fraction) slower than its baseline."""
+    regressions = []
+    for stage, seconds in sorted(results.items()):
+        base = baseline.get(stage)
+        if not base or max(base, seconds) < MIN_COMPARABLE_SECONDS:
+            continue
+        change = seconds / base - 1.0
+        if change > threshold:
+            regressions.append(f'{stage}: {seconds * 1000:.2f}ms vs baseline {base * 1000:.2f}ms (+{change:.0%})')
+    return regressions
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='Benchmark pipeline stages against stored baselines')
+    ap.add_argument('--docs', type=int, default=20)
+    ap.add_argument('--pages', type=int, default=1)
+    ap.add_argument('--dpi', type=int, default=150)
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument('--baseline', default=BASELINE_PATH)
+    ap.add_argument('--update-baseline', action='store_true')
+    args = ap.parse_args(argv)
+
+    results = run_benchmarks(docs=args.docs, pages=args.pages, dpi=args.dpi, repeat=args.repeat)
+    baseline = load_baseline(args.baseline)
+    for stage, seconds in sorted(results.items()):
+        base = baseline.get(stage)
+        delta = f'  ({seconds / base - 1.0:+.0%} vs baseline)' if base else ''
+        print(f'{stage:<36} {seconds * 1000:10.2f}ms{delta}')
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline, docs=args.docs, pages=args.pages, dpi=args.dpi, repeat=args.repeat)
+        print('Baseline written to', args.baseline)
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print('\nRegressions beyond threshold:')
+        for r in regressions:
+            print('  ' + r)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Throughput and memory benchmark for streaming 1099-B transaction extraction.
+Writes a synthetic consolidated statement with --rows sale lines, then streams it through
+`ingestion.iter_pages` and `parsing.transactions.iter_transactions`, reporting rows per second and the
+peak traced memory (which should stay flat as --rows grows).
+
+Usage:
+  python -m benchmarks.transactions [--rows 100000] [--rows-per-page 50]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import write_1099b_text  # noqa: E402
+
+
+def run(rows: int = 100000, rows_per_page: int = 50, seed: int = 0) -> dict:
+    from ingestion import iter_pages
+    from parsing.transactions import TransactionTotals, iter_transactions
+
+    fd, path = tempfile.mkstemp(suffix='.txt', prefix='rosy_1099b_')
+    os.close(fd)
+    try:
+        write_1099b_text(path, rows, seed=seed, rows_per_page=rows_per_page)
+        size = os.path.getsize(path)
+        totals = TransactionTotals()
+        start = time.perf_counter()
+        for _ in iter_transactions(iter_pages(path), totals):
+            pass
+        elapsed = time.perf_counter() - start
+
+        # memory is traced in a second pass so tracing overhead doesn't skew the timing
+        tracemalloc.start()
+        for _ in iter_transactions(iter_pages(path), TransactionTotals()):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+    return {
+        'rows': totals.count,
+        'file_bytes': size,
+        'seconds': round(elapsed, 4),
+        'rows_per_second': round(totals.count / elapsed) if elapsed else None,
+        'peak_traced_bytes': peak,
+        'totals': totals.to_dict(),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    ap = argparse.ArgumentParser(description='Benchmark streaming 1099-B extraction')
+    ap.add_argument('--rows', type=int, default=100000)
+    ap.add_argument('--rows-per-page', type=int, default=50)
+    args = ap.parse_args()
+    print(json.dumps(run(args.rows, args.rows_per_page), indent=2))
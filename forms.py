@@ -6,8 +6,10 @@ import os
 from typing import Dict, Any, List
 import io
 
-# local auto-mapper (optional heavy dependency handled inside)
-from utils.auto_mapper import map_fields
+# bump when a change to the fill code alters rendered output, so cached drafts aren't reused
+RENDERER_VERSION = '2'
+# paint filled fields into the page content (no form left) for print/archive pipelines
+FLATTEN_DRAFTS = os.environ.get('ROSY_FLATTEN_DRAFTS') == '1'
 
 
 def format_currency(value) -> str:
@@ -113,19 +115,31 @@ def generate_1040_pdf(fields: Dict[str, Any], tax_result: Dict[str, Any], out_di
     c.save()
     return pdf_path
 
-def fill_fillable_1040(template_path: str, field_values: Dict[str, Any], out_path: str) -> str:
+def fill_fillable_1040(template_path: str, field_values: Dict[str, Any], out_path: str, *, flatten: bool = False) -> str:
     """Fill a fillable PDF template using pdfrw. `field_values` maps template field names to values.
+    Filled text fields get generated appearance streams (see appearances.py), so viewers don't have to
+    rebuild them; with `flatten` every field is painted into the page content and the form is removed.
     Returns the path to the filled PDF. If pdfrw isn't available or the template is missing, raises RuntimeError.
     """
     try:
-        from pdfrw import PdfReader, PdfWriter, PdfDict
+        from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName, PdfObject, PdfString
     except Exception:
         raise RuntimeError('pdfrw is required to fill a fillable PDF')
 
     if not os.path.exists(template_path):
         raise RuntimeError('template not found: ' + template_path)
 
+    from appearances import flatten_widgets, text_appearance
+    from rendercache import template_version
+
+    template_key = template_version(template_path)
     pdf = PdfReader(template_path)
+    if pdf.Root is None:
+        pdf.Root = PdfDict()
+    acroform = pdf.Root.AcroForm
+    # only fields we couldn't draw exactly (non-text fields, characters outside the font's encoding)
+    # still need the viewer to regenerate their appearance
+    need_appearances = False
 
     # AcroForm fields may be found under pdf.Root.AcroForm.Fields
     # We'll iterate annotations and set /V for matching /T names.
@@ -141,108 +155,139 @@ def fill_fillable_1040(template_path: str, field_values: Dict[str, Any], out_pat
                     name = name[1:-1]
                 if name in field_values:
                     val = str(field_values[name])
-                    annot.V = '(%s)' % val
-                    annot.AP = None
+                    annot.V = PdfString.encode(val)
+                    if annot.inheritable.FT == PdfName.Tx and annot.Rect:
+                        appearance, exact = text_appearance(annot, val, acroform, template_key)
+                        annot.AP = PdfDict(N=appearance)
+                        need_appearances = need_appearances or not exact
+                    else:
+                        annot.AP = None
+                        need_appearances = True
 
-    # ensure AcroForm /NeedAppearances is set so PDF viewers regenerate appearances
-    if pdf.Root is None:
-        pdf.Root = PdfDict()
-    if pdf.Root.AcroForm is None:
-        pdf.Root.AcroForm = PdfDict()
-    pdf.Root.AcroForm.update(PdfDict(NeedAppearances=True))
+    if flatten:
+        flatten_widgets(pdf)
+    elif need_appearances:
+        if pdf.Root.AcroForm is None:
+            pdf.Root.AcroForm = PdfDict()
+        # PDF booleans are lowercase; a Python True would be written as an invalid `True`
+        pdf.Root.AcroForm.update(PdfDict(NeedAppearances=PdfObject('true')))
+    elif acroform is not None and acroform.NeedAppearances is not None:
+        acroform.NeedAppearances = None
 
-    PdfWriter().write(out_path, pdf)
+    PdfWriter(compress=True).write(out_path, pdf)
     return out_path
 
 
-def generate_1040_draft(fields: Dict[str, Any], tax_result: Dict[str, Any], out_dir: str) -> str:
-    """Main entry: try PDF generation and return generated path (PDF preferred, fallback to text)."""
-    # Prefer to fill a real fillable 1040 if a template is present
-    here = os.path.dirname(__file__)
-    template_path = os.path.join(here, '..', 'templates', '1040_fillable.pdf')
-    os.makedirs(out_dir, exist_ok=True)
+def _template_field_names(template_path: str) -> List[str]:
+    """AcroForm field names of a template, in order and deduplicated (empty if they can't be read)."""
     try:
-        if os.path.exists(template_path):
-            # Read template field names (AcroForm) and attempt an automatic mapping
-            try:
-                from pdfrw import PdfReader
+        from pdfrw import PdfReader
 
-                def _collect_fields(obj, out: List[str]):
-                    if obj is None:
-                        return
-                    # obj may be a PdfDict with /T or have /Kids
+        def _collect_fields(obj, out: List[str]):
+            if obj is None:
+                return
+            # obj may be a PdfDict with /T or have /Kids
+            try:
+                if getattr(obj, 'T', None):
+                    name = obj.T
                     try:
-                        if getattr(obj, 'T', None):
-                            name = obj.T
-                            try:
-                                name = name.to_unicode()
-                            except Exception:
-                                name = str(name)
-                            if name.startswith('(') and name.endswith(')'):
-                                name = name[1:-1]
-                            out.append(name)
+                        name = name.to_unicode()
                     except Exception:
-                        pass
-                    kids = getattr(obj, 'Kids', None) or getattr(obj, 'Fields', None)
-                    if kids:
-                        for k in kids:
-                            _collect_fields(k, out)
-
-                pdf = PdfReader(template_path)
-                acro = getattr(getattr(pdf, 'Root', None), 'AcroForm', None)
-                names: List[str] = []
-                if acro and getattr(acro, 'Fields', None):
-                    for f in acro.Fields:
-                        _collect_fields(f, names)
-                # dedupe
-                seen = set()
-                uniq = []
-                for n in names:
-                    if n not in seen:
-                        seen.add(n)
-                        uniq.append(n)
-                template_field_names = uniq
-            except Exception:
-                template_field_names = []
-
-            # Use exact field mapping if this is our synthetic template
-            mapping = create_exact_field_map(fields, tax_result)
-            
-            # If mapping is incomplete, try auto-mapper as fallback
-            if len([v for v in mapping.values() if v]) < 5:  # Less than 5 non-empty values
-                # Build a combined parsed dict that includes tax_result values with readable keys
-                parsed_combined: Dict[str, Any] = {}
-                parsed_combined.update(fields)
-                # add common tax_result keys with friendly labels
-                for k, v in tax_result.items():
-                    parsed_combined[k] = v
-
-                # map parsed fields to template field names using the auto-mapper
-                auto_mapping = {}
-                try:
-                    mapped = map_fields(parsed_combined, template_field_names)
-                    # Only include mappings with some minimal confidence
-                    for tname, (val, score) in mapped.items():
-                        if val is None:
-                            continue
-                        # threshold: accept if score >= 0.4 (fallback) or higher for embeddings
-                        if score and score >= 0.4:
-                            auto_mapping[tname] = val
-                except Exception:
-                    auto_mapping = {}
-                
-                # Merge auto-mapping for missing fields
-                for k, v in auto_mapping.items():
-                    if not mapping.get(k):
-                        mapping[k] = v
-
-            out_path = os.path.join(out_dir, 'draft_1040_filled.pdf')
-            try:
-                return fill_fillable_1040(template_path, mapping, out_path)
+                        name = str(name)
+                    if name.startswith('(') and name.endswith(')'):
+                        name = name[1:-1]
+                    out.append(name)
             except Exception:
-                # fall back to reportlab-based draft
-                return generate_1040_pdf(fields, tax_result, out_dir)
-        else:
-            return generate_1040_pdf(fields, tax_result, out_dir)
-    finally:
-        pass
+                pass
+            kids = getattr(obj, 'Kids', None) or getattr(obj, 'Fields', None)
+            if kids:
+                for k in kids:
+                    _collect_fields(k, out)
+
+        pdf = PdfReader(template_path)
+        acro = getattr(getattr(pdf, 'Root', None), 'AcroForm', None)
+        names: List[str] = []
+        if acro and getattr(acro, 'Fields', None):
+            for f in acro.Fields:
+                _collect_fields(f, names)
+        # dedupe
+        seen = set()
+        uniq = []
+        for n in names:
+            if n not in seen:
+                seen.add(n)
+                uniq.append(n)
+        return uniq
+    except Exception:
+        return []
+
+
+def _auto_mapping(fields: Dict[str, Any], tax_result: Dict[str, Any], template_path: str) -> Dict[str, Any]:
+    """Auto-mapper values for the template's fields, keeping only reasonably confident matches."""
+    template_field_names = _template_field_names(template_path)
+    # Build a combined parsed dict that includes tax_result values with readable keys
+    parsed_combined: Dict[str, Any] = {}
+    parsed_combined.update(fields)
+    # add common tax_result keys with friendly labels
+    for k, v in tax_result.items():
+        parsed_combined[k] = v
+
+    # map parsed fields to template field names using the auto-mapper
+    auto_mapping = {}
+    try:
+        # imported here: the auto-mapper may load an embedding model
+        from utils.auto_mapper import map_fields
+        mapped = map_fields(parsed_combined, template_field_names)
+        # Only include mappings with some minimal confidence
+        for tname, (val, score) in mapped.items():
+            if val is None:
+                continue
+            # threshold: accept if score >= 0.4 (fallback) or higher for embeddings
+            if score and score >= 0.4:
+                auto_mapping[tname] = val
+    except Exception:
+        auto_mapping = {}
+    return auto_mapping
+
+
+def generate_1040_draft(fields: Dict[str, Any], tax_result: Dict[str, Any], out_dir: str) -> str:
+    """Main entry: try PDF generation and return generated path (PDF preferred, fallback to text).
+    Filled templates are memoized in rendercache.RENDER_CACHE, so unchanged inputs reuse the rendered bytes.
+    """
+    from rendercache import RENDER_CACHE, render_key, template_version
+
+    # Prefer to fill a real fillable 1040 if a template is present
+    template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', '1040_fillable.pdf')
+    os.makedirs(out_dir, exist_ok=True)
+    if not os.path.exists(template_path):
+        return generate_1040_pdf(fields, tax_result, out_dir)
+
+    # Use exact field mapping if this is our synthetic template
+    mapping = create_exact_field_map(fields, tax_result)
+    # If mapping is incomplete (less than 5 non-empty values), the auto-mapper fills the gaps from every
+    # parsed field, so those become part of the cache key too
+    complete = len([v for v in mapping.values() if v]) >= 5
+    key = render_key(mapping if complete else {'map': mapping, 'fields': fields, 'tax': tax_result},
+                     template_version(template_path), RENDERER_VERSION + ('-flat' if FLATTEN_DRAFTS else ''))
+    out_path = os.path.join(out_dir, 'draft_1040_filled.pdf')
+    cached = RENDER_CACHE.get(key)
+    if cached is not None:
+        out_path = os.path.join(out_dir, cached[0])
+        with open(out_path, 'wb') as f:
+            f.write(cached[1])
+        return out_path
+
+    if not complete:
+        # Merge auto-mapping for missing fields
+        for k, v in _auto_mapping(fields, tax_result, template_path).items():
+            if not mapping.get(k):
+                mapping[k] = v
+
+    try:
+        fill_fillable_1040(template_path, mapping, out_path, flatten=FLATTEN_DRAFTS)
+    except Exception:
+        # fall back to reportlab-based draft
+        return generate_1040_pdf(fields, tax_result, out_dir)
+    with open(out_path, 'rb') as f:
+        RENDER_CACHE.put(key, os.path.basename(out_path), f.read())
+    return out_path
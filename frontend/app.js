@@ -20,14 +20,55 @@ form.addEventListener('submit', async (ev) => {
 
   statusEl.textContent = 'Uploading...';
   try {
-    const resp = await fetch('/upload', { method: 'POST', body: fd });
+    // stream newline-delimited JSON events so each file shows up as soon as it is parsed
+    const resp = await fetch('/upload?stream=1', { method: 'POST', body: fd });
     if (!resp.ok) {
       const err = await resp.json().catch(() => ({ error: 'server error' }));
       statusEl.textContent = 'Upload failed: ' + (err.error || resp.statusText);
       return;
     }
+    const total = filesInput.files.length;
+    const j = { per_file: [] };
+    const progress = document.createElement('ul');
+    resultEl.appendChild(progress);
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let failed = false;
+    const handle = (ev) => {
+      if (ev.event === 'file') {
+        j.per_file[ev.index] = ev.result;
+        const li = document.createElement('li');
+        li.textContent = `${ev.result.path} — ${ev.result.doc_type} (conf ${ev.result.confidence})`;
+        progress.appendChild(li);
+        statusEl.textContent = `Parsed ${j.per_file.filter(Boolean).length} of ${total} file(s)...`;
+      } else if (ev.event === 'aggregate') {
+        j.aggregated_fields = ev.aggregated_fields;
+      } else if (ev.event === 'tax') {
+        j.tax_estimate = ev.tax_estimate;
+      } else if (ev.event === 'draft') {
+        j.draft_id = ev.draft_id;
+        j.download_url = ev.download_url;
+      } else if (ev.event === 'done') {
+        j.session_id = ev.session_id;
+      } else if (ev.event === 'error') {
+        failed = true;
+        statusEl.textContent = 'Processing failed: ' + ev.error;
+      }
+    };
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (value) buffered += decoder.decode(value, { stream: true });
+      let nl;
+      while ((nl = buffered.indexOf('\n')) >= 0) {
+        const line = buffered.slice(0, nl).trim();
+        buffered = buffered.slice(nl + 1);
+        if (line) handle(JSON.parse(line));
+      }
+      if (done) break;
+    }
+    if (failed) return;
     statusEl.textContent = 'Processing complete';
-    const j = await resp.json();
     renderResult(j);
   } catch (e) {
     statusEl.textContent = 'Network error: ' + e.message;
@@ -37,18 +78,27 @@ form.addEventListener('submit', async (ev) => {
 function renderResult(j) {
   resultEl.innerHTML = '';
   const h = document.createElement('div');
-  h.innerHTML = `<h2>Result</h2>
-    <p>Detected: ${j.doc_type} (confidence: ${j.confidence})</p>`;
+  h.innerHTML = '<h2>Result</h2>' + (j.doc_type ? `<p>Detected: ${j.doc_type} (confidence: ${j.confidence})</p>` : '');
   resultEl.appendChild(h);
 
-  const fields = document.createElement('pre');
-  fields.textContent = JSON.stringify(j.fields || {}, null, 2);
-  resultEl.appendChild(fields);
+  if (j.fields) {
+    const fields = document.createElement('pre');
+    fields.textContent = JSON.stringify(j.fields, null, 2);
+    resultEl.appendChild(fields);
+  }
 
   const tax = document.createElement('pre');
   tax.textContent = JSON.stringify(j.tax_estimate || {}, null, 2);
   resultEl.appendChild(tax);
 
+  if (j.download_url) {
+    const draft = document.createElement('a');
+    draft.href = j.download_url;
+    draft.textContent = 'Download draft';
+    draft.target = '_blank';
+    resultEl.appendChild(draft);
+  }
+
   // If server returned per-file parsing results, show review UI
   if (j.per_file) {
     const review = document.createElement('div');
@@ -78,10 +128,23 @@ function renderResult(j) {
       const saveBtn = document.createElement('button');
       saveBtn.type = 'button';
       saveBtn.textContent = 'Save changes';
-      saveBtn.addEventListener('click', (ev) => {
-        // collect fields from form and update displayed aggregated fields
-        const els = form.querySelectorAll('input');
-        els.forEach(e => { pf.fields[e.name] = e.value; });
+      saveBtn.addEventListener('click', async (ev) => {
+        // collect only the fields the user changed and send them to the review session
+        const changed = {};
+        form.querySelectorAll('input').forEach(e => {
+          if (e.value !== e.defaultValue) changed[e.name] = e.value;
+        });
+        if (!Object.keys(changed).length) { statusEl.textContent = 'No changes for ' + pf.path; return; }
+        Object.assign(pf.fields, changed);
+        if (j.session_id) {
+          const body = { edits: [{ index: idx, fields: changed }], filing_status: document.getElementById('filing_status').value };
+          const resp = await fetch('/sessions/' + encodeURIComponent(j.session_id), { method: 'PATCH', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body) });
+          if (!resp.ok) { statusEl.textContent = 'Saving changes failed'; return; }
+          const upd = await resp.json();
+          j.aggregated_fields = upd.aggregated_fields;
+          j.tax_estimate = upd.tax_estimate;
+        }
+        form.querySelectorAll('input').forEach(e => { e.defaultValue = e.value; });
         statusEl.textContent = 'Updated fields for ' + pf.path;
         renderAggregated(j);
       });
@@ -106,8 +169,9 @@ function renderResult(j) {
     finalize.textContent = 'Finalize & Download PDF';
     finalize.addEventListener('click', async () => {
       statusEl.textContent = 'Generating final PDF...';
-      // send finalize request to backend with edited per-file fields
-      const payload = { per_file: j.per_file, filing_status: document.getElementById('filing_status').value };
+      // edits already live in the server-side session; older responses fall back to sending per-file fields
+      const filing_status = document.getElementById('filing_status').value;
+      const payload = j.session_id ? { session_id: j.session_id, filing_status } : { per_file: j.per_file, filing_status };
       const resp = await fetch('/finalize', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
       if (!resp.ok) { statusEl.textContent = 'Finalize failed'; return; }
       // expect PDF bytes back; convert to blob and offer download
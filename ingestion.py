@@ -1,9 +1,16 @@
 """
 Ingestion helpers: read input image(s) or text files and return text to be processed.
 This module uses pytesseract if available to OCR images; otherwise it treats files ending with .txt as OCR output.
+Images are read word by word with confidences (ocr_words), re-reading only their low-confidence lines.
 """
+import io
 import os
-from typing import List
+import time
+from typing import Iterator, List, Optional
+
+import metrics
+from ocr_words import OcrPage, adaptive_ocr
+from preprocess import prepare_for_ocr
 
 
 def read_text_file(path: str) -> str:
@@ -11,77 +18,142 @@ def read_text_file(path: str) -> str:
         return f.read()
 
 
-def ingest_paths(paths: List[str]) -> str:
-    """Given a list of file paths (images or text), return combined OCR/text content.
-    - PDF files: attempts text extraction first
-    - Text files (.txt): read directly
-    - Image files: requires Pillow + pytesseract for OCR
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif']
+
+
+# in-memory OCR preprocessing (orientation, DPI resampling, contrast, binarization, deskew); ROSY_OCR_PREPROCESS=0 disables
+OCR_PREPROCESS = os.environ.get('ROSY_OCR_PREPROCESS', '1') != '0'
+
+
+def ocr_image(img, psm: Optional[int] = None) -> str:
+    """OCR an in-memory PIL image. Uses tesserocr (Tesseract's C API, no temp files) when installed,
+    otherwise pytesseract. `psm` selects Tesseract's page segmentation mode (7 = single text line).
+    """
+    start = time.perf_counter()
+    try:
+        import tesserocr
+    except Exception:
+        tesserocr = None
+    if tesserocr is not None:
+        text = tesserocr.image_to_text(img, psm=psm) if psm is not None else tesserocr.image_to_text(img)
+        metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='tesserocr')
+        return text
+    import pytesseract
+    text = pytesseract.image_to_string(img, config=f'--psm {psm}' if psm is not None else '')
+    metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='tesseract')
+    return text
+
+
+def ingest_image_pages(path: str, data: Optional[bytes] = None) -> List[OcrPage]:
+    """OCR every frame of an image file (multi-page TIFF: one entry per frame) into words with confidences.
+    Low-confidence lines are re-read (see ocr_words.adaptive_ocr). Requires Pillow + pytesseract (or tesserocr).
     """
-    texts = []
     # lazy imports
-    has_pil = False
-    has_tesseract = False
-    has_pdf_tools = False
-    
     try:
-        from PIL import Image
-        has_pil = True
+        from PIL import Image, ImageSequence
     except Exception:
         Image = None
     try:
         import pytesseract
-        has_tesseract = True
     except Exception:
         pytesseract = None
     try:
-        from pdf_reader import extract_text_from_pdf
-        has_pdf_tools = True
+        import tesserocr  # in-memory alternative, preferred by ocr_words
     except Exception:
-        extract_text_from_pdf = None
-
-    for p in paths:
-        p = os.path.abspath(p)
-        ext = os.path.splitext(p)[1].lower()
-        
-        if ext == '.txt':
-            texts.append(read_text_file(p))
-        elif ext == '.pdf':
-            if has_pdf_tools:
-                try:
-                    pdf_text = extract_text_from_pdf(p)
-                    texts.append(pdf_text)
-                except Exception as e:
-                    raise RuntimeError(f'Failed to extract text from PDF {p}: {e}')
-            else:
-                raise RuntimeError('PDF processing requires pdf_reader module')
-        elif ext in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif']:
-            if has_pil and has_tesseract:
-                try:
-                    img = Image.open(p)
-                    txt = pytesseract.image_to_string(img)
-                    texts.append(txt)
-                except Exception as e:
-                    if 'tesseract is not installed' in str(e).lower():
-                        raise RuntimeError(
-                            'Tesseract OCR is not installed. Please install it:\n'
-                            '1. Download from: https://github.com/UB-Mannheim/tesseract/wiki\n'
-                            '2. Add to PATH or install via: pip install pytesseract\n'
-                            '3. For Windows: Also install Tesseract executable\n'
-                            'Alternative: Use PDF files with embedded text instead of images'
-                        )
-                    else:
-                        raise RuntimeError(f'OCR failed for {p}: {e}')
-            else:
-                missing = []
-                if not has_pil:
-                    missing.append('Pillow (pip install Pillow)')
-                if not has_tesseract:
-                    missing.append('pytesseract (pip install pytesseract)')
-                raise RuntimeError(
-                    f'OCR for images requires: {", ".join(missing)}\n'
-                    'Alternative: Use PDF files or convert images to text first'
-                )
-        else:
-            raise RuntimeError(f'Unsupported file type: {ext}. Supported: .txt, .pdf, .png, .jpg, .jpeg, .tiff, .bmp, .gif')
-    
-    return "\n".join(texts)
+        tesserocr = None
+    if Image is None or (pytesseract is None and tesserocr is None):
+        missing = []
+        if Image is None:
+            missing.append('Pillow (pip install Pillow)')
+        if pytesseract is None and tesserocr is None:
+            missing.append('pytesseract (pip install pytesseract)')
+        raise RuntimeError(
+            f'OCR for images requires: {", ".join(missing)}\n'
+            'Alternative: Use PDF files or convert images to text first'
+        )
+    try:
+        with Image.open(path if data is None else io.BytesIO(data)) as img:
+            pages = []
+            for frame in ImageSequence.Iterator(img):
+                if OCR_PREPROCESS:
+                    with metrics.stage('ocr_preprocess'):
+                        frame = prepare_for_ocr(frame)
+                pages.append(adaptive_ocr(frame))
+        return pages
+    except Exception as e:
+        metrics.ERRORS.inc(component='tesseract')
+        if 'tesseract is not installed' in str(e).lower():
+            raise RuntimeError(
+                'Tesseract OCR is not installed. Please install it:\n'
+                '1. Download from: https://github.com/UB-Mannheim/tesseract/wiki\n'
+                '2. Add to PATH or install via: pip install pytesseract\n'
+                '3. For Windows: Also install Tesseract executable\n'
+                'Alternative: Use PDF files with embedded text instead of images'
+            )
+        raise RuntimeError(f'OCR failed for {path}: {e}')
+
+
+def ingest_pages(path: str, data: Optional[bytes] = None) -> List[str]:
+    """Return the text of each page of a single input file.
+    - PDF files: one entry per PDF page (text extraction)
+    - Text files (.txt): pages separated by form feeds
+    - Image files: one entry per frame (multi-page TIFF), OCR requires Pillow + pytesseract
+    With `data` (the file's bytes, e.g. fetched from storage) nothing is read from disk and `path` only
+    names the document.
+    """
+    p = os.path.abspath(path) if data is None else path
+    ext = os.path.splitext(p)[1].lower()
+
+    if ext == '.txt':
+        with metrics.INGEST_SECONDS.time(backend='text'):
+            text = read_text_file(p) if data is None else bytes(data).decode('utf-8')
+            return text.split('\f')
+    if ext == '.pdf':
+        try:
+            from pdf_reader import extract_pages_from_pdf
+        except Exception:
+            raise RuntimeError('PDF processing requires pdf_reader module')
+        try:
+            return extract_pages_from_pdf(p if data is None else data)
+        except Exception as e:
+            raise RuntimeError(f'Failed to extract text from PDF {p}: {e}')
+    if ext in IMAGE_EXTENSIONS:
+        return [page.text for page in ingest_image_pages(p, data)]
+    raise RuntimeError(f'Unsupported file type: {ext}. Supported: .txt, .pdf, .png, .jpg, .jpeg, .tiff, .bmp, .gif')
+
+
+def iter_pages(path: str, chunk_size: int = 1 << 20) -> Iterator[str]:
+    """Like `ingest_pages`, but yields pages one at a time so very long statements never sit in memory whole.
+    Text files are read in chunks and split on form feeds; PDFs are extracted page by page.
+    """
+    p = os.path.abspath(path)
+    ext = os.path.splitext(p)[1].lower()
+    if ext == '.txt':
+        with open(p, 'r', encoding='utf-8') as f:
+            buf = ''
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                buf += chunk
+                *done, buf = buf.split('\f')
+                yield from done
+            yield buf
+    elif ext == '.pdf':
+        from pdf_reader import iter_pages_from_pdf
+        yield from iter_pages_from_pdf(p)
+    else:
+        yield from ingest_pages(p)
+
+
+def join_pages(path: str, pages: List[str]) -> str:
+    """Inverse of `ingest_pages` for a single file: the file's full text."""
+    # text files keep their original form feeds
+    sep = '\f' if path.lower().endswith('.txt') else '\n'
+    return sep.join(pages)
+
+
+def ingest_paths(paths: List[str]) -> str:
+    """Given a list of file paths (images or text), return combined OCR/text content.
+    - PDF files: attempts text extraction first
+    - Text files (.txt): read directly
+    - Image files: requires Pillow + pytesseract for OCR
+    """
+    return "\n".join(join_pages(p, ingest_pages(p)) for p in paths)
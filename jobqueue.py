@@ -0,0 +1,366 @@
+"""
+Durable job queue on a SQLite file, so any number of worker processes can drain one backlog of document
+bundles.
+
+- A worker claims a job with a time-limited lease and extends it with heartbeats while it runs.
+- A crashed worker stops heartbeating; once its lease expires the job returns to the queue. A worker that
+  finds its lease lost sets `job.lost`; handlers run with `pass_job=True` can check it and stop early.
+- Failed jobs are retried with exponential backoff; after `max_attempts` they move to the dead letters.
+
+Every state change is a single transaction (BEGIN IMMEDIATE), so two workers never claim the same job.
+The default WAL journal needs shared memory, so it only works for processes on one host. Several hosts
+can share the database file on storage with working file locks by setting ROSY_QUEUE_JOURNAL=DELETE
+(or `journal_mode='DELETE'`).
+
+Usage:
+  python jobqueue.py enqueue jobs.db out_dir file1 [file2 ...] [--filing-status single] [--withholding 0]
+  python jobqueue.py work jobs.db [--max-jobs N] [--idle-exit]
+  python jobqueue.py stats jobs.db
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 5.0
+BACKOFF_MAX_SECONDS = 15 * 60.0
+# SQLite journal mode: WAL for workers on one host, DELETE for a database file shared between hosts
+JOURNAL_MODE = os.environ.get('ROSY_QUEUE_JOURNAL', 'WAL').upper()
+_JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_token TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, priority, available_at);
+CREATE INDEX IF NOT EXISTS jobs_leases ON jobs (status, lease_expires);
+"""
+
+
+def backoff_seconds(attempts: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Delay before retry number `attempts` (1-based): base, 2*base, 4*base, ... capped at `cap`."""
+    return min(cap, base * (2 ** max(0, attempts - 1)))
+
+
+class Job:
+    """A claimed job. `token` identifies this lease; a worker whose lease expired can no longer ack the job.
+    `lost` is set once a heartbeat finds the lease gone."""
+
+    __slots__ = ('id', 'queue', 'payload', 'attempts', 'max_attempts', 'token', 'owner', 'lost')
+
+    def __init__(self, id: int, queue: str, payload: Dict[str, Any], attempts: int, max_attempts: int,
+                 token: str, owner: str):
+        self.id = id
+        self.queue = queue
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.token = token
+        self.owner = owner
+        self.lost = threading.Event()
+
+
+class JobQueue:
+    def __init__(self, path: str, *, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE_SECONDS,
+                 clock: Callable[[], float] = time.time, journal_mode: Optional[str] = None):
+        self.path = path
+        self.journal_mode = (journal_mode or JOURNAL_MODE).upper()
+        if self.journal_mode not in _JOURNAL_MODES:
+            raise ValueError(f'unsupported journal mode: {self.journal_mode}')
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        # wall clock (not monotonic): leases are compared across processes and hosts
+        self.clock = clock
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; autocommit mode so transactions are explicit
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        db = self._conn()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def enqueue(self, payload: Dict[str, Any], *, queue: str = 'default', priority: int = 0, delay: float = 0.0,
+                max_attempts: Optional[int] = None) -> int:
+        """Add a job; higher `priority` runs first. Returns the job id."""
+        now = self.clock()
+        with self._transaction() as db:
+            cur = db.execute(
+                'INSERT INTO jobs (queue, payload, status, priority, max_attempts, available_at, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (queue, json.dumps(payload), QUEUED, priority, max_attempts or self.max_attempts, now + delay, now, now))
+            return cur.lastrowid
+
+    def _reap(self, db: sqlite3.Connection, now: float) -> int:
+        # expired leases go back to the queue, or to the dead letters when out of attempts
+        db.execute("UPDATE jobs SET status = ?, lease_token = NULL, lease_owner = NULL, updated_at = ?,"
+                   " last_error = 'lease expired'"
+                   " WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                   (DEAD, now, LEASED, now))
+        cur = db.execute('UPDATE jobs SET status = ?, lease_token = NULL, lease_owner = NULL, available_at = ?,'
+                         ' updated_at = ? WHERE status = ? AND lease_expires < ?',
+                         (QUEUED, now, now, LEASED, now))
+        return cur.rowcount
+
+    def reap_expired(self) -> int:
+        """Return jobs whose lease expired to the queue. Returns how many were requeued."""
+        with self._transaction() as db:
+            return self._reap(db, self.clock())
+
+    def claim(self, worker_id: str, *, queue: str = 'default', lease_seconds: Optional[float] = None) -> Optional[Job]:
+        """Lease the next ready job on `queue`, or return None if nothing is ready."""
+        now = self.clock()
+        lease = lease_seconds or self.lease_seconds
+        with self._transaction() as db:
+            self._reap(db, now)
+            row = db.execute('SELECT id, payload, attempts, max_attempts FROM jobs'
+                             ' WHERE queue = ? AND status = ? AND available_at <= ?'
+                             ' ORDER BY priority DESC, available_at, id LIMIT 1',
+                             (queue, QUEUED, now)).fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            db.execute('UPDATE jobs SET status = ?, attempts = attempts + 1, lease_token = ?, lease_owner = ?,'
+                       ' lease_expires = ?, updated_at = ? WHERE id = ?',
+                       (LEASED, token, worker_id, now + lease, now, row['id']))
+        return Job(row['id'], queue, json.loads(row['payload']), row['attempts'] + 1, row['max_attempts'],
+                   token, worker_id)
+
+    def heartbeat(self, job: Job, lease_seconds: Optional[float] = None) -> bool:
+        """Extend the lease. False means the lease was lost (expired and reclaimed) and the work should stop."""
+        now = self.clock()
+        with self._transaction() as db:
+            cur = db.execute('UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_token = ?',
+                             (now + (lease_seconds or self.lease_seconds), now, job.id, job.token))
+            return cur.rowcount == 1
+
+    def complete(self, job: Job, result: Any = None) -> bool:
+        now = self.clock()
+        with self._transaction() as db:
+            cur = db.execute('UPDATE jobs SET status = ?, result = ?, lease_token = NULL, lease_expires = NULL,'
+                             ' updated_at = ? WHERE id = ? AND lease_token = ?',
+                             (DONE, json.dumps(result), now, job.id, job.token))
+            return cur.rowcount == 1
+
+    def fail(self, job: Job, error: str) -> Optional[str]:
+        """Record a failed attempt: requeue with backoff, or dead-letter after max_attempts.
+        Returns the job's new status, or None if the lease was already lost.
+        """
+        now = self.clock()
+        status = DEAD if job.attempts >= job.max_attempts else QUEUED
+        retry_at = now + backoff_seconds(job.attempts, self.backoff_base)
+        with self._transaction() as db:
+            cur = db.execute('UPDATE jobs SET status = ?, last_error = ?, available_at = ?, lease_token = NULL,'
+                             ' lease_owner = NULL, lease_expires = NULL, updated_at = ?'
+                             ' WHERE id = ? AND lease_token = ?',
+                             (status, error[:4000], retry_at, now, job.id, job.token))
+            return status if cur.rowcount == 1 else None
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        out = dict(row)
+        out['payload'] = json.loads(out['payload'])
+        out['result'] = json.loads(out['result']) if out['result'] else None
+        return out
+
+    def dead_letters(self, queue: str = 'default', limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn().execute('SELECT id, payload, attempts, last_error, updated_at FROM jobs'
+                                    ' WHERE queue = ? AND status = ? ORDER BY id LIMIT ?',
+                                    (queue, DEAD, limit)).fetchall()
+        return [dict(r, payload=json.loads(r['payload'])) for r in rows]
+
+    def retry_dead(self, job_id: int) -> bool:
+        """Move a dead-lettered job back to the queue with a fresh attempt budget."""
+        now = self.clock()
+        with self._transaction() as db:
+            cur = db.execute('UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ?'
+                             ' WHERE id = ? AND status = ?', (QUEUED, now, now, job_id, DEAD))
+            return cur.rowcount == 1
+
+    def stats(self, queue: str = 'default') -> Dict[str, int]:
+        rows = self._conn().execute('SELECT status, COUNT(*) AS n FROM jobs WHERE queue = ? GROUP BY status',
+                                    (queue,)).fetchall()
+        out = {QUEUED: 0, LEASED: 0, DONE: 0, DEAD: 0}
+        out.update({r['status']: r['n'] for r in rows})
+        return out
+
+
+def run_bundle(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Default job handler: run the pipeline on one bundle of files.
+    Payload: {'paths': [...], 'out_dir': str, 'filing_status'?: str, 'withholding'?: float,
+    'results_db'?: str, 'tax_year'?: int}; instead of 'paths', {'storage': url, 'keys': [...]} reads the
+    documents from a storage backend (storage.storage_from_url) with concurrent prefetch.
+    Returns a JSON-friendly summary (per-file details stay out of the queue database; with `results_db`
+    they are saved to the results store and the summary carries the `return_id`).
+    """
+    options = {'filing_status': payload.get('filing_status', 'single'),
+               'withholding': float(payload.get('withholding') or 0.0)}
+    if payload.get('storage'):
+        from pipeline import run_pipeline_on_storage
+        from storage import storage_from_url
+        res = run_pipeline_on_storage(storage_from_url(payload['storage']), payload['keys'], payload['out_dir'],
+                                      content_hashes=bool(payload.get('results_db')), **options)
+    else:
+        from pipeline import run_pipeline_on_paths
+        res = run_pipeline_on_paths(payload['paths'], payload['out_dir'], **options)
+    summary = {}
+    if payload.get('results_db'):
+        from resultstore import ResultsStore
+        store = ResultsStore(payload['results_db'])
+        try:
+            summary['return_id'] = store.save_run(res, tax_year=payload.get('tax_year'))
+        finally:
+            store.close()
+    return {
+        **summary,
+        'documents': len(res['per_file']),
+        'validation_issues': sum(len(r.get('validation_issues', [])) for r in res['per_file']),
+        'aggregated_fields': res['aggregated_fields'],
+        'tax_estimate': res['tax_estimate'],
+        'draft_form': res['draft_form'],
+    }
+
+
+class Worker:
+    """Claims jobs from a queue and runs `handler(payload)` on each, heartbeating while the handler runs.
+    With `pass_job=True` the handler is called as `handler(payload, job)` and can stop early once
+    `job.lost` is set; a lost job's result is discarded either way.
+    """
+
+    def __init__(self, queue: JobQueue, handler: Callable[..., Any] = run_bundle, *,
+                 queue_name: str = 'default', worker_id: Optional[str] = None, poll_interval: float = 1.0,
+                 pass_job: bool = False):
+        self.queue = queue
+        self.handler = handler
+        self.pass_job = pass_job
+        self.queue_name = queue_name
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.poll_interval = poll_interval
+
+    def _heartbeat(self, job: Job, stop: threading.Event) -> None:
+        interval = max(0.05, self.queue.lease_seconds / 3)
+        while not stop.wait(interval):
+            if not self.queue.heartbeat(job):
+                metrics.ERRORS.inc(component='job_lease')
+                job.lost.set()
+                return
+
+    def run_once(self) -> Optional[str]:
+        """Process at most one job. Returns its final status ('done', 'queued', 'dead') or None if idle."""
+        job = self.queue.claim(self.worker_id, queue=self.queue_name)
+        if job is None:
+            return None
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, stop), daemon=True)
+        beat.start()
+        try:
+            result = self.handler(job.payload, job) if self.pass_job else self.handler(job.payload)
+        except Exception as e:
+            return self.queue.fail(job, f'{type(e).__name__}: {e}')
+        finally:
+            stop.set()
+            beat.join()
+        if job.lost.is_set():
+            return None
+        return DONE if self.queue.complete(job, result) else None
+
+    def run(self, *, max_jobs: Optional[int] = None, idle_exit: bool = False,
+            stop: Optional[threading.Event] = None) -> int:
+        """Work until stopped (or `max_jobs` processed, or idle with `idle_exit`). Returns jobs processed."""
+        processed = 0
+        stop = stop or threading.Event()
+        while not stop.is_set() and (max_jobs is None or processed < max_jobs):
+            if self.run_once() is None:
+                if idle_exit:
+                    break
+                stop.wait(self.poll_interval)
+                continue
+            processed += 1
+        return processed
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='SQLite-backed job queue for pipeline bundles')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    enq = sub.add_parser('enqueue')
+    enq.add_argument('db')
+    enq.add_argument('out_dir')
+    enq.add_argument('paths', nargs='+')
+    enq.add_argument('--filing-status', default='single')
+    enq.add_argument('--withholding', type=float, default=0.0)
+    enq.add_argument('--priority', type=int, default=0)
+    work = sub.add_parser('work')
+    work.add_argument('db')
+    work.add_argument('--max-jobs', type=int)
+    work.add_argument('--idle-exit', action='store_true')
+    st = sub.add_parser('stats')
+    st.add_argument('db')
+    args = ap.parse_args()
+
+    q = JobQueue(args.db)
+    if args.cmd == 'enqueue':
+        job_id = q.enqueue({'paths': [os.path.abspath(p) for p in args.paths],
+                            'out_dir': os.path.abspath(args.out_dir),
+                            'filing_status': args.filing_status, 'withholding': args.withholding},
+                           priority=args.priority)
+        print(job_id)
+    elif args.cmd == 'work':
+        n = Worker(q).run(max_jobs=args.max_jobs, idle_exit=args.idle_exit)
+        print(f'processed {n} jobs')
+    else:
+        print(json.dumps(q.stats(), indent=2))
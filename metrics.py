@@ -0,0 +1,257 @@
+"""
+Lightweight in-process metrics: counters and latency histograms with labels, rendered in the Prometheus
+text exposition format (served by the backend on `/metrics`) or as a plain-text summary for batch CLI runs.
+No external dependency is required.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ''
+    inner = ','.join('%s="%s"' % (k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for k, v in items)
+    return '{' + inner + '}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def export(self) -> Dict[LabelKey, float]:
+        return self.samples()
+
+    def merge(self, values: Dict[LabelKey, float]) -> None:
+        with self._lock:
+            for key, v in values.items():
+                self._values[key] = self._values.get(key, 0.0) + v
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, v in sorted(self.samples().items()):
+            lines.append(f'{self.name}{_format_labels(key)} {v:g}')
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count, max]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0, 0.0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    row[i] += 1
+                    break
+            n = len(self.buckets)
+            row[n] += value
+            row[n + 1] += 1
+            row[n + 2] = max(row[n + 2], value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def stats(self) -> Dict[LabelKey, Dict[str, float]]:
+        """Per label set: count, sum, mean and max (seconds)."""
+        n = len(self.buckets)
+        out = {}
+        with self._lock:
+            for key, row in self._values.items():
+                count = row[n + 1]
+                out[key] = {'count': count, 'sum': row[n], 'mean': row[n] / count if count else 0.0,
+                            'max': row[n + 2]}
+        return out
+
+    def export(self) -> Dict[LabelKey, List[float]]:
+        with self._lock:
+            return {k: list(v) for k, v in self._values.items()}
+
+    def merge(self, values: Dict[LabelKey, List[float]]) -> None:
+        n = len(self.buckets)
+        with self._lock:
+            for key, other in values.items():
+                row = self._values.get(key)
+                if row is None:
+                    self._values[key] = list(other)
+                    continue
+                for i in range(n + 2):
+                    row[i] += other[i]
+                row[n + 2] = max(row[n + 2], other[n + 2])
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        n = len(self.buckets)
+        with self._lock:
+            rows = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in rows:
+            cumulative = 0
+            for i, upper in enumerate(self.buckets):
+                cumulative += row[i]
+                lines.append(f'{self.name}_bucket{_format_labels(key, (("le", f"{upper:g}"),))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, (("le", "+Inf"),))} {row[n + 1]}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {row[n]:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {row[n + 1]}')
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            m.reset()
+
+    def export(self) -> Dict[str, Any]:
+        """Raw values of every metric, picklable (e.g. to send a worker process's metrics to its parent)."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: m.export() for name, m in metrics.items()}
+
+    def merge(self, exported: Dict[str, Any]) -> None:
+        """Add values exported by another registry; metrics not registered here are ignored."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in exported.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('rosy_stage_duration_seconds', 'Pipeline stage latency in seconds.')
+DOCUMENT_SECONDS = REGISTRY.histogram('rosy_document_duration_seconds',
+                                      'Per-document parse latency (ingest to validation) by doc type.')
+DOCUMENTS = REGISTRY.counter('rosy_documents_total', 'Documents parsed by detected doc type.')
+INGEST_SECONDS = REGISTRY.histogram('rosy_ingest_backend_duration_seconds', 'Text extraction latency by backend.')
+CACHE_REQUESTS = REGISTRY.counter('rosy_cache_requests_total', 'Cache lookups by cache and result (hit/miss).')
+ERRORS = REGISTRY.counter('rosy_errors_total', 'Errors by pipeline stage or component.')
+LAYOUT_OCR = REGISTRY.counter('rosy_layout_ocr_pages_total', 'Image pages by layout OCR outcome (roi or fallback reason).')
+OCR_REREADS = REGISTRY.counter('rosy_ocr_rereads_total', 'Low-confidence OCR lines re-read, by outcome (improved/kept).')
+TIME_BUDGET = REGISTRY.counter('rosy_time_budget_exceeded_total', 'Files cancelled for exceeding a time budget (file/request).')
+WATCH_BUNDLES = REGISTRY.counter('rosy_watch_bundles_total', 'Watch-folder bundles processed by outcome.')
+ADMISSION = REGISTRY.counter('rosy_admission_total', 'Admission decisions by resource, priority class and outcome.')
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram('rosy_admission_wait_seconds', 'Time queued for a resource slot.')
+HTTP_SECONDS = REGISTRY.histogram('rosy_http_request_duration_seconds', 'HTTP request latency by endpoint and status.')
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage; exceptions are counted in rosy_errors_total and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(component=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def format_summary() -> str:
+    """Human-readable summary of stage timings, backends, doc types, caches and errors."""
+    lines = ['Stage timings:']
+    for title, hist, label in (('stage', STAGE_SECONDS, 'stage'), ('doc type', DOCUMENT_SECONDS, 'doc_type'),
+                               ('ingest backend', INGEST_SECONDS, 'backend')):
+        stats = hist.stats()
+        if not stats:
+            continue
+        if title != 'stage':
+            lines.append(f'By {title}:')
+        for key, st in sorted(stats.items(), key=lambda kv: -kv[1]['sum']):
+            name = dict(key).get(label, '')
+            lines.append(f"  {name:<16} n={st['count']:<5} total={st['sum'] * 1000:9.1f}ms "
+                         f"mean={st['mean'] * 1000:8.2f}ms max={st['max'] * 1000:8.2f}ms")
+    caches: Dict[str, Dict[str, float]] = {}
+    for key, v in CACHE_REQUESTS.samples().items():
+        d = dict(key)
+        caches.setdefault(d.get('cache', ''), {})[d.get('result', '')] = v
+    if caches:
+        lines.append('Caches:')
+        for name, res in sorted(caches.items()):
+            hits, misses = res.get('hit', 0), res.get('miss', 0)
+            total = hits + misses
+            lines.append(f'  {name:<16} hits={hits:g} misses={misses:g} hit_rate={hits / total if total else 0:.1%}')
+    errors = ERRORS.samples()
+    if errors:
+        lines.append('Errors:')
+        for key, v in sorted(errors.items()):
+            lines.append(f"  {dict(key).get('component', ''):<16} {v:g}")
+    return '\n'.join(lines)
@@ -0,0 +1,232 @@
+"""
+Word-level OCR with confidence-driven re-reads.
+`read_words` runs one Tesseract pass (tesserocr when installed, otherwise pytesseract's image_to_data) and
+returns every word with its box and confidence (0-100). `adaptive_ocr` takes that pass as-is for clean
+pages; only lines holding a word below MIN_CONFIDENCE are cropped, upscaled and re-read with single-line
+page segmentation modes, and a re-read replaces the line when it is more confident. Hard pages get targeted
+extra work instead of every page paying for a high-resolution multi-pass read.
+
+`field_confidence` maps extracted values back to the words they were read from, so a field is as confident
+as its least confident word.
+
+Configuration (environment): ROSY_OCR_MIN_CONF (default 60), ROSY_OCR_REREAD_LINES (lines re-read per
+page, default 20; 0 disables re-reads).
+"""
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+MIN_CONFIDENCE = float(os.environ.get('ROSY_OCR_MIN_CONF', '60'))
+MAX_REREAD_LINES = int(os.environ.get('ROSY_OCR_REREAD_LINES', '20'))
+# (upscale factor, page segmentation mode) per re-read attempt: single line, then raw line at 2x, then 3x
+REREAD_PASSES = ((2.0, 7), (2.0, 13), (3.0, 7))
+# a re-read crop extends this fraction of the line height around the line's words
+_LINE_PAD = 0.35
+
+Box = Tuple[int, int, int, int]
+_KEY_RE = re.compile(r'[^0-9a-z]')
+
+
+class Word:
+    """One recognized word: text, confidence 0-100, (left, top, right, bottom) box and its line key."""
+
+    __slots__ = ('text', 'conf', 'box', 'line')
+
+    def __init__(self, text: str, conf: float, box: Box, line: Tuple[int, ...]):
+        self.text = text
+        self.conf = conf
+        self.box = box
+        self.line = line
+
+    def __repr__(self):
+        return f'Word({self.text!r}, {self.conf:.0f})'
+
+
+class OcrPage:
+    """The words of one page, in reading order; `text` rebuilds the page the way image_to_string lays it out."""
+
+    __slots__ = ('words', 'rereads')
+
+    def __init__(self, words: List[Word], rereads: int = 0):
+        self.words = words
+        self.rereads = rereads
+
+    @property
+    def text(self) -> str:
+        lines: List[str] = []
+        current: List[str] = []
+        prev = None
+        for w in self.words:
+            if prev is not None and w.line != prev:
+                lines.append(' '.join(current))
+                current = []
+                # a new block (paragraph) is separated by a blank line
+                if w.line[:-1] != prev[:-1]:
+                    lines.append('')
+            current.append(w.text)
+            prev = w.line
+        if current:
+            lines.append(' '.join(current))
+        return '\n'.join(lines)
+
+    @property
+    def confidence(self) -> float:
+        """Mean word confidence (0-1); 0 for a page without words."""
+        return sum(w.conf for w in self.words) / len(self.words) / 100.0 if self.words else 0.0
+
+
+def _pytesseract_words(img, psm: Optional[int]) -> List[Word]:
+    import pytesseract
+    data = pytesseract.image_to_data(img, config=f'--psm {psm}' if psm is not None else '',
+                                     output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        conf = float(data['conf'][i])
+        text = (text or '').strip()
+        # non-word rows (page, block, line) carry conf -1
+        if not text or conf < 0:
+            continue
+        left, top = int(data['left'][i]), int(data['top'][i])
+        words.append(Word(text, conf, (left, top, left + int(data['width'][i]), top + int(data['height'][i])),
+                          (int(data['block_num'][i]), int(data['par_num'][i]), int(data['line_num'][i]))))
+    return words
+
+
+def _tesserocr_words(img, psm: Optional[int]) -> List[Word]:
+    from tesserocr import PSM, RIL, PyTessBaseAPI, iterate_level
+    words = []
+    block = par = line = 0
+    with PyTessBaseAPI(psm=psm if psm is not None else PSM.AUTO) as api:
+        api.SetImage(img)
+        api.Recognize()
+        for r in iterate_level(api.GetIterator(), RIL.WORD):
+            if r.IsAtBeginningOf(RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if r.IsAtBeginningOf(RIL.PARA):
+                par, line = par + 1, 0
+            if r.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            text = (r.GetUTF8Text(RIL.WORD) or '').strip()
+            box = r.BoundingBox(RIL.WORD)
+            if text and box is not None:
+                words.append(Word(text, float(r.Confidence(RIL.WORD)), tuple(box), (block, par, line)))
+    return words
+
+
+def read_words(img, psm: Optional[int] = None) -> List[Word]:
+    """One OCR pass over a PIL image, returning its words with boxes and confidences."""
+    start = time.perf_counter()
+    try:
+        import tesserocr  # noqa: F401
+    except Exception:
+        words = _pytesseract_words(img, psm)
+        metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='tesseract')
+        return words
+    words = _tesserocr_words(img, psm)
+    metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='tesserocr')
+    return words
+
+
+def _lines(words: List[Word]) -> List[List[Word]]:
+    lines: List[List[Word]] = []
+    for w in words:
+        if lines and lines[-1][0].line == w.line:
+            lines[-1].append(w)
+        else:
+            lines.append([w])
+    return lines
+
+
+def _reread(img, line: List[Word], read: Callable) -> Optional[List[Word]]:
+    """Re-read one line from an upscaled crop; the most confident attempt, or None if none beat the original."""
+    from PIL import Image
+    left = min(w.box[0] for w in line)
+    top = min(w.box[1] for w in line)
+    right = max(w.box[2] for w in line)
+    bottom = max(w.box[3] for w in line)
+    pad = max(2, int((bottom - top) * _LINE_PAD))
+    left, top = max(0, left - pad), max(0, top - pad)
+    right, bottom = min(img.width, right + pad), min(img.height, bottom + pad)
+    crop = img.crop((left, top, right, bottom))
+
+    best, best_conf = None, sum(w.conf for w in line) / len(line)
+    for scale, psm in REREAD_PASSES:
+        scaled = crop.resize((max(1, round(crop.width * scale)), max(1, round(crop.height * scale))), Image.LANCZOS)
+        words = read(scaled, psm=psm)
+        if not words:
+            continue
+        conf = sum(w.conf for w in words) / len(words)
+        if conf > best_conf:
+            # back to page coordinates, all on the original line
+            best = [Word(w.text, w.conf, (left + round(w.box[0] / scale), top + round(w.box[1] / scale),
+                                          left + round(w.box[2] / scale), top + round(w.box[3] / scale)),
+                         line[0].line) for w in words]
+            best_conf = conf
+        if best is not None and min(w.conf for w in best) >= MIN_CONFIDENCE:
+            break
+    return best
+
+
+def adaptive_ocr(img, *, psm: Optional[int] = None, read: Optional[Callable] = None) -> OcrPage:
+    """OCR a page image, re-reading only its low-confidence lines (at most MAX_REREAD_LINES, least
+    confident first). `read(image, psm=None)` defaults to read_words.
+    """
+    read = read or read_words
+    words = read(img, psm=psm)
+    lines = _lines(words)
+    weak = sorted((i for i, line in enumerate(lines) if min(w.conf for w in line) < MIN_CONFIDENCE),
+                  key=lambda i: min(w.conf for w in lines[i]))[:MAX_REREAD_LINES]
+    rereads = 0
+    for i in weak:
+        with metrics.stage('ocr_reread'):
+            better = _reread(img, lines[i], read)
+        metrics.OCR_REREADS.inc(outcome='improved' if better else 'kept')
+        rereads += 1
+        if better:
+            lines[i] = better
+    return OcrPage([w for line in lines for w in line], rereads)
+
+
+def _key(text: str) -> str:
+    return _KEY_RE.sub('', str(text).lower())
+
+
+def _locate(target: str, keys: List[str]) -> Optional[Tuple[int, int]]:
+    """(first, last) index of the words whose normalized text spells `target`, in reading order."""
+    for i, key in enumerate(keys):
+        if not key:
+            continue
+        if target in key:
+            return i, i
+        if not target.startswith(key):
+            continue
+        joined, j = key, i
+        while len(joined) < len(target) and j + 1 < len(keys):
+            j += 1
+            joined += keys[j]
+            if not target.startswith(joined):
+                break
+        if joined == target:
+            return i, j
+    return None
+
+
+def field_confidence(fields: Dict[str, Any], words: List[Word]) -> Dict[str, float]:
+    """Confidence (0-1) of each extracted field: the lowest confidence among the words its value was read
+    from. A value that can't be found among the words (reformatted or derived) gets the mean confidence of
+    all the words.
+    """
+    keys = [_key(w.text) for w in words]
+    mean = sum(w.conf for w in words) / len(words) / 100.0 if words else 0.0
+    out = {}
+    for name, value in fields.items():
+        target = _key(value)
+        span = _locate(target, keys) if target else None
+        if span is None:
+            out[name] = round(mean, 3)
+        else:
+            out[name] = round(min(w.conf for w in words[span[0]:span[1] + 1]) / 100.0, 3)
+    return out
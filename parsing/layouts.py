@@ -0,0 +1,93 @@
+"""
+Layout library for known form types: where each extracted field sits on the form.
+Regions are (x0, y0, x1, y1) fractions of the form's bounding box, so they hold at any scan resolution.
+The coordinates follow the standard IRS W-2 (copy B/C/2) and 1099-NEC layouts; scans whose content box
+does not match a layout's aspect ratio are not aligned and fall back to full-page OCR. The classifier only
+says '1099'; the 1099-NEC layout is used only when the page names that variant, since 1099-INT, -DIV, -B
+and -MISC put other boxes where the NEC has box 1.
+"""
+import re
+from typing import Dict, Optional, Tuple
+
+from .parser import _number_re, _ein_re, _ssn_re
+
+Region = Tuple[float, float, float, float]
+
+# value patterns per field kind
+_PATTERNS = {
+    'money': _number_re,
+    'ein': _ein_re,
+    'ssn': _ssn_re,
+}
+
+
+class FieldRegion:
+    def __init__(self, name: str, box: Region, kind: str):
+        self.name = name
+        self.box = box
+        self.kind = kind
+
+    def parse(self, text: str) -> Optional[str]:
+        """Extract this field's value from the OCR text of its region, or None if it doesn't match."""
+        text = (text or '').replace('$', ' ')
+        if self.kind == 'money':
+            # drop box numbers/labels, keep the amount (the last number in the box)
+            found = [m.group(0) for m in _number_re.finditer(text) if re.search(r'[.,]', m.group(0))]
+            return found[-1] if found else None
+        m = _PATTERNS[self.kind].search(text)
+        return m.group(0) if m else None
+
+
+class FormLayout:
+    def __init__(self, doc_type: str, aspect: float, fields: Dict[str, FieldRegion], required: Tuple[str, ...]):
+        self.doc_type = doc_type
+        # width / height of the form's bounding box
+        self.aspect = aspect
+        self.fields = fields
+        self.required = required
+
+    def matches_aspect(self, width: int, height: int, tolerance: float = 0.15) -> bool:
+        if width <= 0 or height <= 0:
+            return False
+        return abs((width / height) / self.aspect - 1.0) <= tolerance
+
+
+def _layout(doc_type: str, aspect: float, required: Tuple[str, ...], **regions) -> FormLayout:
+    fields = {name: FieldRegion(name, box, kind) for name, (box, kind) in regions.items()}
+    return FormLayout(doc_type, aspect, fields, required)
+
+
+LAYOUTS: Dict[str, FormLayout] = {
+    # W-2: 8" x 3.67" form; SSN box top center, EIN under it on the left, boxes 1/2 on the right
+    'W-2': _layout(
+        'W-2', 8.0 / 3.67, ('wages',),
+        employee_ssn=((0.18, 0.00, 0.48, 0.09), 'ssn'),
+        ein=((0.00, 0.09, 0.50, 0.18), 'ein'),
+        wages=((0.50, 0.09, 0.75, 0.18), 'money'),
+        federal_income_tax_withheld=((0.75, 0.09, 1.00, 0.18), 'money'),
+    ),
+    # 1099-NEC: 8" x 3.67" form; payer/recipient TIN boxes left, box 1 to their right
+    '1099-NEC': _layout(
+        '1099', 8.0 / 3.67, ('amount',),
+        payer_ein=((0.00, 0.38, 0.25, 0.48), 'ein'),
+        recipient_ssn=((0.25, 0.38, 0.50, 0.48), 'ssn'),
+        amount=((0.50, 0.38, 0.75, 0.48), 'money'),
+    ),
+}
+
+
+# classified doc type -> (text naming the variant, layout key)
+_VARIANTS = {
+    '1099': ((re.compile(r'1099\s*-?\s*NEC\b|nonemployee\s+compensation', re.IGNORECASE), '1099-NEC'),),
+}
+
+
+def get_layout(doc_type: str, text: str = '') -> Optional[FormLayout]:
+    """Layout for a page classified as `doc_type`; for types with several variants, the variant `text`
+    names, or None when it names none of them."""
+    if doc_type in _VARIANTS:
+        for rx, key in _VARIANTS[doc_type]:
+            if rx.search(text or ''):
+                return LAYOUTS[key]
+        return None
+    return LAYOUTS.get(doc_type)
@@ -0,0 +1,41 @@
+"""
+Money normalization: parse an amount once into integer cents.
+Accepts extracted strings ('$52,000.00', '1,234', '(45.10)'), ints, floats and Decimals. Integer cents add
+up exactly, so totals across many documents never drift the way repeated float sums do.
+"""
+from typing import Any, Optional
+import re
+
+_PLAIN_RE = re.compile(r'-?\d+(?:\.\d\d)?')
+
+
+def parse_cents(value: Any) -> Optional[int]:
+    """Integer cents for an amount, or None if it isn't one."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        value = repr(value)
+    s = str(value).strip().replace(',', '').replace('$', '').replace(' ', '')
+    negative = s.startswith('(') and s.endswith(')')
+    if negative:
+        s = s[1:-1]
+    if _PLAIN_RE.fullmatch(s):
+        # the common dollars.cents shape: integer arithmetic, no Decimal
+        cents = int(s.replace('.', '')) if '.' in s else int(s) * 100
+        return -cents if negative else cents
+    from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+    try:
+        amount = Decimal(s)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    cents = int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return -cents if negative else cents
+
+
+def to_float(cents: int) -> float:
+    """Cents as a float rounded to two decimals, the shape amounts take in JSON results."""
+    return round(cents / 100, 2)
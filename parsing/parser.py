@@ -5,6 +5,8 @@ Supports W-2 and 1099 basic fields for demonstration.
 import re
 from typing import Dict, Any
 
+from .transactions import summary_fields
+
 _number_re = re.compile(r"[-+]?[0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?")
 _ein_re = re.compile(r"\b\d{2}-\d{7}\b")
 _ssn_re = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
@@ -71,6 +73,10 @@ def extract_fields(text: str, doc_type: str) -> Dict[str, Any]:
         if amt:
             fields['amount'] = amt
 
+        # 1099-B: totals of the sale rows (reported, not added to income)
+        if '1099-b' in text.lower():
+            fields.update(summary_fields(text))
+
     else:
         # generic heuristics
         ein = _ein_re.search(text)
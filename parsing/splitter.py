@@ -0,0 +1,93 @@
+"""
+Split multi-form files (bulk W-2 PDFs, consolidated 1099 statements) into logical documents.
+Each page is classified on its own; consecutive pages are grouped into one document until a page
+carries a new form header or a different form type. Pages without a recognizable form (instructions,
+continuation sheets) stay with the document before them.
+"""
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .classifier import detect_document_type
+from .parser import extract_fields
+from .validator import validate_fields
+
+# a form title near the top of a page marks the start of a new document
+_HEADER_RES = [
+    ('W-2', re.compile(r'form\s+w-2\b', re.IGNORECASE)),
+    ('1099', re.compile(r'form\s+1099\b', re.IGNORECASE)),
+]
+_HEADER_WINDOW = 400
+
+
+def page_header_type(text: str) -> Optional[str]:
+    """Doc type whose form title appears at the top of the page, if any."""
+    head = (text or '')[:_HEADER_WINDOW]
+    for doc_type, rx in _HEADER_RES:
+        if rx.search(head):
+            return doc_type
+    return None
+
+
+def classify_pages(pages: List[str]) -> List[Tuple[str, float]]:
+    return [detect_document_type(p) for p in pages]
+
+
+def group_pages(pages: List[str], page_types: Optional[List[Tuple[str, float]]] = None) -> List[Dict[str, Any]]:
+    """Group consecutive pages into logical documents.
+    Returns [{'doc_type', 'start', 'end'}] with 0-based inclusive page indexes.
+    """
+    if page_types is None:
+        page_types = classify_pages(pages)
+    groups: List[Dict[str, Any]] = []
+    for i, (text, (doc_type, _conf)) in enumerate(zip(pages, page_types)):
+        header = page_header_type(text)
+        current = groups[-1] if groups else None
+        if current is not None and header is None and (
+                doc_type == 'unknown' or current['doc_type'] in ('unknown', doc_type)):
+            # continuation page of the current document
+            current['end'] = i
+            if current['doc_type'] == 'unknown':
+                current['doc_type'] = doc_type
+            continue
+        groups.append({'doc_type': header or doc_type, 'start': i, 'end': i})
+    return groups
+
+
+def parse_document_text(text: str) -> Tuple[str, float, Dict[str, Any], List[str]]:
+    """Classify, extract and validate one logical document. Top-level so it can run in worker processes."""
+    doc_type, conf = detect_document_type(text)
+    fields = extract_fields(text, doc_type)
+    issues = validate_fields(fields, doc_type)
+    return doc_type, conf, fields, issues
+
+
+# fields that identify one specific form; copies of a form share them, two different forms do not. The
+# employer/payer EIN is left out: every W-2 one employer issues carries the same EIN
+IDENTIFIER_FIELDS = ('employee_ssn', 'recipient_ssn', 'ssn', 'control_number')
+
+
+def _identifier(fields: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    # an SSN that is masked or missing can't tell two employees' W-2s apart
+    for name in IDENTIFIER_FIELDS:
+        value = str(fields.get(name) or '').strip()
+        if value and 'X' not in value.upper():
+            return name, value
+    return None
+
+
+def merge_copies(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse consecutive documents with the same type and identical extracted fields that include an
+    unmasked identifier (SSN or control number). Employers often print copies B, C and 2 of the same W-2 on
+    separate pages; they must count once. Each merge is noted in the kept document's validation_issues.
+    """
+    merged: List[Dict[str, Any]] = []
+    for d in docs:
+        prev = merged[-1] if merged else None
+        if (prev is not None and d['fields'] and prev['doc_type'] == d['doc_type'] and prev['fields'] == d['fields']
+                and _identifier(d['fields']) is not None):
+            prev['validation_issues'] = list(prev.get('validation_issues') or []) + [
+                f'pages {d["start"] + 1}-{d["end"] + 1} repeat this document and were counted once']
+            prev['end'] = d['end']
+            continue
+        merged.append(d)
+    return merged
@@ -0,0 +1,230 @@
+"""
+Streaming extraction of 1099-B transaction tables (consolidated brokerage statements).
+Pages are consumed one at a time and each sale line is yielded as a typed `Transaction` as soon as it is
+read; only the current page and one pending description line are held, so memory stays constant no
+matter how many rows the statement has. `TransactionTotals` keeps running summary totals in cents.
+
+A sale line carries a description, an optional quantity, the acquired date (or VARIOUS), the sold
+date and 2-4 amounts: proceeds, cost basis, [wash sale adjustment], [gain/loss]. A description printed on
+its own line above the numbers is used for the row that follows when that row has no description. "Short-term"/"Long-term"
+section headings set the term of the rows below them.
+
+Usage:
+  python -m parsing.transactions statement.pdf [--csv out.csv]
+"""
+import datetime
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .money import to_float
+
+_DATE = r'\d{1,2}/\d{1,2}/\d{2,4}'
+_AMOUNT = r'\(?-?\$?[\d,]*\d\.\d{2}\)?'
+_ROW_RE = re.compile(
+    r'^\s*(?P<desc>.*?)\s*'
+    r'(?:(?P<qty>\d[\d,]*(?:\.\d+)?)\s+)?'
+    rf'(?P<acquired>{_DATE}|various)\s+(?P<sold>{_DATE})\s+'
+    rf'(?P<amounts>{_AMOUNT}(?:\s+{_AMOUNT}){{1,3}})\s*$',
+    re.IGNORECASE)
+_TERM_RE = re.compile(r'\b(short|long)[- ]term\b', re.IGNORECASE)
+# a line that could be a description waiting for its numbers: has letters, no dates
+_DESC_RE = re.compile(r'[A-Za-z]')
+
+
+def _parse_date(s: str) -> Optional[datetime.date]:
+    if s.lower() == 'various':
+        return None
+    month, day, year = s.split('/')
+    year_i = int(year)
+    if year_i < 100:
+        year_i += 2000
+    try:
+        return datetime.date(year_i, int(month), int(day))
+    except ValueError:
+        return None
+
+
+class Transaction:
+    """One 1099-B sale; amounts are integer cents."""
+
+    __slots__ = ('description', 'quantity', 'acquired', 'sold', 'proceeds_cents', 'basis_cents',
+                 'adjustment_cents', 'gain_cents', 'term', 'page')
+
+    def __init__(self, description: str, quantity: Optional[str], acquired: Optional[datetime.date],
+                 sold: Optional[datetime.date], proceeds_cents: int, basis_cents: int, adjustment_cents: int,
+                 gain_cents: int, term: Optional[str], page: int):
+        self.description = description
+        self.quantity = quantity
+        self.acquired = acquired
+        self.sold = sold
+        self.proceeds_cents = proceeds_cents
+        self.basis_cents = basis_cents
+        self.adjustment_cents = adjustment_cents
+        self.gain_cents = gain_cents
+        self.term = term
+        self.page = page
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'description': self.description,
+            'quantity': self.quantity,
+            'date_acquired': self.acquired.isoformat() if self.acquired else 'VARIOUS',
+            'date_sold': self.sold.isoformat() if self.sold else None,
+            'proceeds': to_float(self.proceeds_cents),
+            'cost_basis': to_float(self.basis_cents),
+            'wash_sale_adjustment': to_float(self.adjustment_cents),
+            'gain': to_float(self.gain_cents),
+            'term': self.term,
+            'page': self.page,
+        }
+
+
+class TransactionTotals:
+    """Running summary of a statement, updated per transaction."""
+
+    __slots__ = ('count', 'proceeds_cents', 'basis_cents', 'adjustment_cents', 'gain_cents',
+                 'short_term_gain_cents', 'long_term_gain_cents')
+
+    def __init__(self):
+        self.count = 0
+        self.proceeds_cents = 0
+        self.basis_cents = 0
+        self.adjustment_cents = 0
+        self.gain_cents = 0
+        self.short_term_gain_cents = 0
+        self.long_term_gain_cents = 0
+
+    def add(self, tx: Transaction) -> None:
+        self.count += 1
+        self.proceeds_cents += tx.proceeds_cents
+        self.basis_cents += tx.basis_cents
+        self.adjustment_cents += tx.adjustment_cents
+        self.gain_cents += tx.gain_cents
+        if tx.term == 'short':
+            self.short_term_gain_cents += tx.gain_cents
+        elif tx.term == 'long':
+            self.long_term_gain_cents += tx.gain_cents
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'transactions': self.count,
+            'proceeds': to_float(self.proceeds_cents),
+            'cost_basis': to_float(self.basis_cents),
+            'wash_sale_adjustment': to_float(self.adjustment_cents),
+            'gain': to_float(self.gain_cents),
+            'short_term_gain': to_float(self.short_term_gain_cents),
+            'long_term_gain': to_float(self.long_term_gain_cents),
+        }
+
+
+# amounts matched by _AMOUNT always have two decimals, so dropping punctuation leaves the cents
+_CENTS_TABLE = str.maketrans('', '', '$,.()')
+
+
+def _cents(amount: str) -> int:
+    cents = int(amount.translate(_CENTS_TABLE))
+    return -cents if amount[0] == '(' else cents
+
+
+def _split_amounts(amounts: str):
+    values = [_cents(a) for a in amounts.split()]
+    proceeds, basis = values[0], values[1]
+    adjustment = 0
+    if len(values) == 2:
+        gain = proceeds - basis
+    elif len(values) == 3:
+        # third column is the gain when it adds up, otherwise a wash sale adjustment
+        if values[2] == proceeds - basis:
+            gain = values[2]
+        else:
+            adjustment = values[2]
+            gain = proceeds - basis + adjustment
+    else:
+        adjustment, gain = values[2], values[3]
+    return proceeds, basis, adjustment, gain
+
+
+def iter_transactions(pages: Iterable[str], totals: Optional[TransactionTotals] = None) -> Iterator[Transaction]:
+    """Yield each transaction from an iterable of page texts, updating `totals` as rows are read."""
+    term: Optional[str] = None
+    pending = ''
+    for page_no, page in enumerate(pages, start=1):
+        for line in page.splitlines():
+            if '/' not in line:
+                # headings and description-only lines never contain a date
+                m = _TERM_RE.search(line)
+                if m:
+                    term = m.group(1).lower()
+                    pending = ''
+                elif _DESC_RE.search(line) and not line.strip().lower().startswith(('total', 'page')):
+                    pending = line.strip()
+                else:
+                    pending = ''
+                continue
+            m = _ROW_RE.match(line)
+            if m is None:
+                pending = ''
+                continue
+            # a description on its own line belongs to the next row only when that row has none of its own
+            # (otherwise the pending line was a column header or a note)
+            desc = m.group('desc').strip() or pending
+            pending = ''
+            proceeds, basis, adjustment, gain = _split_amounts(m.group('amounts'))
+            tx = Transaction(desc, m.group('qty'), _parse_date(m.group('acquired')), _parse_date(m.group('sold')),
+                             proceeds, basis, adjustment, gain, term, page_no)
+            if totals is not None:
+                totals.add(tx)
+            yield tx
+
+
+def _amount(cents: int) -> str:
+    return f'{to_float(cents):,.2f}'
+
+
+def summary_fields(text: str) -> Dict[str, str]:
+    """Statement totals as extracted fields ('proceeds', 'cost_basis', 'wash_sale_adjustment', 'gain_loss',
+    'transactions'); empty when the text has no sale rows."""
+    totals = summarize_transactions([text])
+    if not totals.count:
+        return {}
+    return {'proceeds': _amount(totals.proceeds_cents), 'cost_basis': _amount(totals.basis_cents),
+            'wash_sale_adjustment': _amount(totals.adjustment_cents), 'gain_loss': _amount(totals.gain_cents),
+            'transactions': str(totals.count)}
+
+
+def summarize_transactions(pages: Iterable[str]) -> TransactionTotals:
+    """Summary totals of a statement without keeping any transaction."""
+    totals = TransactionTotals()
+    for _ in iter_transactions(pages, totals):
+        pass
+    return totals
+
+
+if __name__ == '__main__':
+    import argparse
+    import csv
+    import json
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ingestion import iter_pages
+
+    ap = argparse.ArgumentParser(description='Stream 1099-B transactions from a statement')
+    ap.add_argument('path')
+    ap.add_argument('--csv', help='write every transaction to this CSV file')
+    args = ap.parse_args()
+    totals = TransactionTotals()
+    rows = iter_transactions(iter_pages(args.path), totals)
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = None
+            for tx in rows:
+                d = tx.to_dict()
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(d))
+                    writer.writeheader()
+                writer.writerow(d)
+    else:
+        for _ in rows:
+            pass
+    print(json.dumps(totals.to_dict(), indent=2))
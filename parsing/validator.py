@@ -4,14 +4,12 @@ Returns a list of issues (empty if OK).
 """
 from typing import Dict, Any, List
 
+from .money import parse_cents
+
 
 def _to_float(s: str):
-    if s is None: return None
-    s = s.replace(',', '')
-    try:
-        return float(s)
-    except Exception:
-        return None
+    cents = parse_cents(s)
+    return None if cents is None else cents / 100
 
 
 def validate_fields(fields: Dict[str, Any], doc_type: str) -> List[str]:
@@ -36,7 +34,9 @@ def validate_fields(fields: Dict[str, Any], doc_type: str) -> List[str]:
 
     elif doc_type == '1099':
         if 'amount' not in fields:
-            issues.append('missing amount (Box 1)')
+            # a 1099-B reports proceeds instead
+            if 'proceeds' not in fields:
+                issues.append('missing amount (Box 1)')
         else:
             val = _to_float(fields.get('amount'))
             if val is None:
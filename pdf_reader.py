@@ -2,30 +2,75 @@
 PDF reading helpers: extract text from PDF files.
 Primary approach: PyMuPDF (fitz). Fallback: pdfminer.six if fitz not available.
 """
-from typing import List
+from typing import Iterator, List, Union
 import os
+import time
 
+import metrics
 
-def extract_text_from_pdf(path: str) -> str:
+
+def extract_pages_from_pdf(path: Union[str, bytes]) -> List[str]:
+    """Return the text of each page of a PDF, in order.
+    `path` may also be the PDF's bytes (fetched from storage); they are read in place, not copied to disk.
+    """
+    in_memory = isinstance(path, (bytes, bytearray, memoryview))
+    if not in_memory:
+        path = os.path.abspath(path)
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        # not installed: not an error, just the fallback
+        fitz = None
+    if fitz is not None:
+        try:
+            start = time.perf_counter()
+            with (fitz.open(stream=path, filetype='pdf') if in_memory else fitz.open(path)) as doc:
+                pages = [page.get_text() for page in doc]
+            metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='pymupdf')
+            return pages
+        except Exception:
+            metrics.ERRORS.inc(component='pymupdf')
+    # fallback to pdfminer
+    try:
+        from io import BytesIO, StringIO
+        from pdfminer.high_level import extract_text_to_fp
+    except ImportError:
+        raise RuntimeError('No PDF extraction backend available (install PyMuPDF or pdfminer.six)')
+    try:
+        start = time.perf_counter()
+        output = StringIO()
+        with (BytesIO(path) if in_memory else open(path, 'rb')) as f:
+            extract_text_to_fp(f, output)
+        metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='pdfminer')
+    except Exception as e:
+        metrics.ERRORS.inc(component='pdfminer')
+        raise RuntimeError(f'PDF text extraction failed: {e}')
+    # pdfminer separates pages with form feeds (and ends with one)
+    pages = output.getvalue().split('\f')
+    if len(pages) > 1 and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+
+def iter_pages_from_pdf(path: str) -> Iterator[str]:
+    """Yield the text of each PDF page as it is extracted, holding one page at a time (PyMuPDF);
+    falls back to `extract_pages_from_pdf` without it.
+    """
     path = os.path.abspath(path)
     try:
         import fitz  # PyMuPDF
-        doc = fitz.open(path)
-        texts = []
+    except ImportError:
+        yield from extract_pages_from_pdf(path)
+        return
+    start = time.perf_counter()
+    with fitz.open(path) as doc:
         for page in doc:
-            texts.append(page.get_text())
-        return "\n".join(texts)
-    except Exception:
-        # fallback to pdfminer
-        try:
-            from io import StringIO
-            from pdfminer.high_level import extract_text_to_fp
-            output = StringIO()
-            with open(path, 'rb') as f:
-                extract_text_to_fp(f, output)
-            return output.getvalue()
-        except Exception as e:
-            raise RuntimeError('No PDF extraction backend available (install PyMuPDF or pdfminer.six)')
+            yield page.get_text()
+    metrics.INGEST_SECONDS.observe(time.perf_counter() - start, backend='pymupdf')
+
+
+def extract_text_from_pdf(path: str) -> str:
+    return "\n".join(extract_pages_from_pdf(path))
 
 
 def extract_texts(paths: List[str]) -> str:
@@ -2,103 +2,331 @@
 Orchestration pipeline tying ingestion -> classification -> extraction -> validation -> tax calc -> form generation.
 Provides a function `run_pipeline_on_paths` that accepts file paths (text or images) and an output directory.
 """
+import hashlib
+import io
 import os
-from typing import List
+import threading
+import time
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from parsing import detect_document_type, extract_fields, validate_fields
-from ingestion import ingest_paths
+from parsing.splitter import group_pages, merge_copies, parse_document_text
+from ingestion import IMAGE_EXTENSIONS, ingest_image_pages, ingest_pages, join_pages
+from ocr_words import field_confidence
+from roi_ocr import extract_file_with_layout
 from taxcalc import compute_tax_estimate
 from forms import generate_1040_draft
+import metrics
+import timebudget
+from records import Aggregate, DocumentRecord, contribution_cents
+
+
+# bulk files with at least this many logical documents are extracted in worker processes
+PARALLEL_MIN_DOCUMENTS = int(os.environ.get('ROSY_PARALLEL_MIN_DOCS', '16'))
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _worker_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # multiprocessing is a large import; single-file runs never need it
+            from concurrent.futures import ProcessPoolExecutor
+            workers = int(os.environ.get('ROSY_WORKERS', '0')) or os.cpu_count() or 1
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=timebudget.mp_context())
+        return _POOL
+
+
+def _parse_documents(texts: List[str]) -> List[Tuple[str, float, Dict[str, Any], List[str]]]:
+    """Classify/extract/validate each logical document, in parallel for large bundles."""
+    # inside a time-budget worker a nested pool would be orphaned when the worker is terminated
+    if len(texts) >= PARALLEL_MIN_DOCUMENTS and (os.cpu_count() or 1) > 1 and not timebudget.IN_WORKER:
+        try:
+            chunk = max(1, len(texts) // (4 * (os.cpu_count() or 1)))
+            return list(_worker_pool().map(parse_document_text, texts, chunksize=chunk))
+        except Exception:
+            metrics.ERRORS.inc(component='worker_pool')
+    return [parse_document_text(t) for t in texts]
+
+
+def _parse_one(p: str, data: Optional[bytes] = None) -> Tuple[List[DocumentRecord], str]:
+    """Ingest a single path (or, with `data`, the in-memory bytes of a document named `p`) and parse
+    the logical documents it contains.
+    Returns (per-document records, full ingested text). A file holding several forms (a bulk W-2 PDF,
+    a multi-form statement) is split at page level into one result per document.
+    """
+    start = time.perf_counter()
+    roi = None
+    is_image = os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS
+    # OCR words per page (images only), for per-field confidence
+    words = None
+    if is_image:
+        # known form layouts: OCR only the field regions, falling back to full-page OCR below
+        with metrics.stage('ingest'):
+            roi = extract_file_with_layout(p if data is None else io.BytesIO(data))
+    if roi is not None:
+        pages = [roi.pop('text')]
+    elif is_image:
+        with metrics.stage('ingest'):
+            ocr_pages = ingest_image_pages(p, data)
+        pages = [page.text for page in ocr_pages]
+        words = [page.words for page in ocr_pages]
+    else:
+        # ingest single path to get its text (supports txt/pdf via ingestion)
+        with metrics.stage('ingest'):
+            pages = ingest_pages(p, data)
+    txt = join_pages(p, pages)
+    groups = []
+    if len(pages) > 1:
+        with metrics.stage('split'):
+            groups = group_pages(pages)
+
+    if roi is not None:
+        docs = [roi]
+    elif len(groups) <= 1:
+        with metrics.stage('classify'):
+            doc_type, conf = detect_document_type(txt)
+        with metrics.stage('extract'):
+            fields = extract_fields(txt, doc_type)
+        with metrics.stage('validate'):
+            issues = validate_fields(fields, doc_type)
+        docs = [{'doc_type': doc_type, 'confidence': conf, 'fields': fields, 'validation_issues': issues}]
+    else:
+        texts = ['\n'.join(pages[g['start']:g['end'] + 1]) for g in groups]
+        with metrics.stage('extract_documents'):
+            parsed = _parse_documents(texts)
+        docs = merge_copies([
+            {'doc_type': dt, 'confidence': conf, 'fields': fields, 'validation_issues': issues,
+             'start': g['start'], 'end': g['end']}
+            for g, (dt, conf, fields, issues) in zip(groups, parsed)
+        ])
+
+    elapsed = (time.perf_counter() - start) / len(docs)
+    records = []
+    for i, d in enumerate(docs):
+        metrics.DOCUMENTS.inc(doc_type=d['doc_type'])
+        metrics.DOCUMENT_SECONDS.observe(elapsed, doc_type=d['doc_type'])
+        confidence = d.get('field_confidence')
+        if confidence is None and words is not None:
+            doc_words = [w for page in words[d.get('start', 0):d.get('end', len(words) - 1) + 1] for w in page]
+            confidence = field_confidence(d['fields'], doc_words)
+        elif confidence is None:
+            # text files and text-layer PDFs are read exactly
+            confidence = {k: 1.0 for k in d['fields']}
+        records.append(DocumentRecord(
+            p, d['doc_type'], d['confidence'], d['fields'], d['validation_issues'],
+            field_confidence=confidence,
+            document_index=i if 'start' in d else None,
+            pages=[d['start'] + 1, d['end'] + 1] if 'start' in d else None,
+        ))
+    return records, txt
+
+
+def _timed_out(p: str, reason: str, budget: str) -> Tuple[List[DocumentRecord], str]:
+    metrics.TIME_BUDGET.inc(budget=budget)
+    return [DocumentRecord(p, 'unknown', 0.0, {}, [reason], status='timeout')], ''
+
+
+def _parse_budgeted(items: Iterable[Tuple[str, Optional[bytes]]], file_timeout: Optional[float],
+                    request_timeout: Optional[float]) -> Iterator[Tuple[List[DocumentRecord], str]]:
+    """_parse_one over (path, bytes or None) items under time budgets (seconds; None uses ROSY_FILE_TIMEOUT /
+    ROSY_REQUEST_TIMEOUT, 0 disables). With a budget, each file is parsed in a worker process that is
+    terminated when it overruns; the file then yields a record with status 'timeout' and no fields, and
+    the remaining files still run. Once the request budget is spent the remaining files time out unparsed.
+    """
+    file_timeout = timebudget.FILE_TIMEOUT if file_timeout is None else file_timeout
+    request_timeout = timebudget.REQUEST_TIMEOUT if request_timeout is None else request_timeout
+    if not file_timeout and not request_timeout:
+        for p, data in items:
+            yield _parse_one(p, data)
+        return
+    deadline = time.monotonic() + request_timeout if request_timeout else None
+    for p, data in items:
+        budget, kind = file_timeout or None, 'file'
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield _timed_out(p, 'not parsed: the request time budget was used up', 'request')
+                continue
+            if budget is None or remaining < budget:
+                budget, kind = remaining, 'request'
+        try:
+            yield timebudget.POOL.run(_parse_one, (p, data), timeout=budget)
+        except timebudget.BudgetExceeded:
+            limit = f'{file_timeout:g}s per-file' if kind == 'file' else f'{request_timeout:g}s request'
+            yield _timed_out(p, f'parsing cancelled: exceeded the {limit} time budget', kind)
 
 
 def parse_paths(paths: List[str]) -> List[dict]:
     """Parse each path individually and return a list of per-file parse results.
     Each result contains: path, doc_type, confidence, fields, field_confidence_map, validation_issues.
     """
-    results = []
-    for p in paths:
-        # ingest single path to get its text (supports images/txt/pdf via ingestion)
-        txt = ingest_paths([p])
-        doc_type, conf = detect_document_type(txt)
-        fields = extract_fields(txt, doc_type)
-        issues = validate_fields(fields, doc_type)
-        # assign a simple confidence per field (placeholder for real confidence)
-        field_conf = {k: 0.9 for k in fields.keys()}
-        results.append({
-            'path': p,
-            'doc_type': doc_type,
-            'confidence': conf,
-            'fields': fields,
-            'field_confidence': field_conf,
-            'validation_issues': issues,
-        })
-    return results
-
-
-def run_pipeline_on_paths(paths: List[str], out_dir: str, *, filing_status: str = 'single', withholding: float = 0.0) -> dict:
-    """Full pipeline: parse each file, aggregate incomes and withholdings, compute tax, generate PDF.
-    Returns aggregated result and path to generated draft PDF.
+    return [r.to_dict() for p in paths for r in _parse_one(p)[0]]
+
+
+def aggregate_per_file(per_file: List[Any]) -> Tuple[Dict[str, Any], float]:
+    """Aggregate incomes and withholdings across per-file results (DocumentRecords or their dicts).
+    Returns (aggregated_fields, total_withholding).
     """
-    per_file = parse_paths(paths)
-
-    # legacy: also provide a single-document view by concatenating text (backwards compatibility)
-    combined_text = ingest_paths(paths)
-    legacy_doc_type, legacy_conf = detect_document_type(combined_text)
-    legacy_fields = extract_fields(combined_text, legacy_doc_type)
-    legacy_issues = validate_fields(legacy_fields, legacy_doc_type)
-
-    # aggregate fields across files
-    agg_fields = {}
-    total_wages = 0.0
-    total_withholding = 0.0
+    agg = Aggregate()
     for r in per_file:
-        f = r.get('fields', {})
-        # wages/amount
-        try:
-            if 'wages' in f:
-                total_wages += float(str(f['wages']).replace(',', '').replace('$', ''))
-            if 'amount' in f:
-                total_wages += float(str(f['amount']).replace(',', '').replace('$', ''))
-        except Exception:
-            pass
-        # federal withholding
-        try:
-            w = f.get('federal_income_tax_withheld') or f.get('federal income tax withheld')
-            if w:
-                total_withholding += float(str(w).replace(',', '').replace('$', ''))
-        except Exception:
-            pass
+        if isinstance(r, DocumentRecord):
+            agg.add(r.income_cents, r.withholding_cents)
+        else:
+            agg.add(*contribution_cents(r.get('fields') or {}))
+    return agg.fields(), agg.withholding
 
-    if total_wages:
-        agg_fields['wages'] = round(total_wages, 2)
-    if total_withholding:
-        agg_fields['withholding'] = round(total_withholding, 2)
+
+def _iter_stages(parsed: Iterable[Tuple[List[DocumentRecord], str]], out_dir: str, filing_status: str,
+                 withholding: float, texts: List[str]) -> Iterator[dict]:
+    # shared by the streaming and the batch entry points; `parsed` yields _parse_one results and the
+    # ingested texts are collected into `texts`
+    per_file = []
+    for records, txt in parsed:
+        texts.append(txt)
+        for record in records:
+            per_file.append(record)
+            yield {'event': 'file', 'index': len(per_file) - 1, 'result': record.to_dict()}
+
+    with metrics.stage('aggregate'):
+        agg_fields, total_withholding = aggregate_per_file(per_file)
+    yield {'event': 'aggregate', 'aggregated_fields': agg_fields}
 
     # allow explicit withholding param to override aggregated withholding
     withholding_val = withholding if withholding else total_withholding
 
-    tax = compute_tax_estimate(agg_fields, filing_status=filing_status, withholding=withholding_val)
-    form_path = generate_1040_draft(agg_fields, tax, out_dir)
+    with metrics.stage('tax'):
+        tax = compute_tax_estimate(agg_fields, filing_status=filing_status, withholding=withholding_val)
+    yield {'event': 'tax', 'tax_estimate': tax}
+
+    with metrics.stage('form_render'):
+        form_path = generate_1040_draft(agg_fields, tax, out_dir)
+    yield {'event': 'draft', 'draft_form': form_path}
+
+
+def iter_pipeline_on_paths(paths: List[str], out_dir: str, *, filing_status: str = 'single',
+                           withholding: float = 0.0, file_timeout: Optional[float] = None,
+                           request_timeout: Optional[float] = None) -> Iterator[dict]:
+    """Streaming form of `run_pipeline_on_paths`.
+    Yields {'event': 'file', 'index', 'result'} as soon as each file is parsed, then
+    {'event': 'aggregate', 'aggregated_fields'}, {'event': 'tax', 'tax_estimate'} and {'event': 'draft', 'draft_form'}.
+    """
+    parsed = _parse_budgeted(((p, None) for p in paths), file_timeout, request_timeout)
+    return _iter_stages(parsed, out_dir, filing_status, withholding, [])
+
+
+def _parse_from_storage(storage, keys: Iterable[str], prefetch_depth: int, file_timeout: Optional[float],
+                        request_timeout: Optional[float], content_hashes: bool = False):
+    from storage import prefetch
+    items = prefetch(storage, keys, prefetch_depth)
+    if not content_hashes:
+        return _parse_budgeted(items, file_timeout, request_timeout)
+    return _with_content_hashes(items, file_timeout, request_timeout)
+
+
+def _with_content_hashes(items, file_timeout: Optional[float], request_timeout: Optional[float]):
+    # storage keys aren't local files the results store could hash later: hash the downloaded bytes
+    hashes: Dict[str, str] = {}
+
+    def hashed():
+        for key, data in items:
+            hashes[key] = hashlib.sha256(data).hexdigest()
+            yield key, data
+    for records, txt in _parse_budgeted(hashed(), file_timeout, request_timeout):
+        for record in records:
+            record.content_hash = hashes.get(record.path)
+        yield records, txt
+
+
+def iter_pipeline_on_storage(storage, keys: Iterable[str], out_dir: str, *, filing_status: str = 'single',
+                             withholding: float = 0.0, prefetch: Optional[int] = None,
+                             file_timeout: Optional[float] = None, request_timeout: Optional[float] = None,
+                             content_hashes: bool = False) -> Iterator[dict]:
+    """`iter_pipeline_on_paths` for documents in a storage backend (see storage.py). Up to `prefetch`
+    documents download concurrently while earlier ones are parsed; their bytes are ingested in memory.
+    With `content_hashes`, each result carries the sha256 of its document (for the results store).
+    """
+    from storage import DEFAULT_PREFETCH
+    depth = DEFAULT_PREFETCH if prefetch is None else prefetch
+    parsed = _parse_from_storage(storage, keys, depth, file_timeout, request_timeout, content_hashes)
+    return _iter_stages(parsed, out_dir, filing_status, withholding, [])
+
+
+def run_pipeline_on_storage(storage, keys: Iterable[str], out_dir: str, *, filing_status: str = 'single',
+                            withholding: float = 0.0, prefetch: Optional[int] = None,
+                            file_timeout: Optional[float] = None, request_timeout: Optional[float] = None,
+                            content_hashes: bool = False) -> dict:
+    """`run_pipeline_on_paths` for documents in a storage backend; per-file `path`s are the storage keys.
+    With `content_hashes`, each result carries the sha256 of its document (for the results store).
+    """
+    from storage import DEFAULT_PREFETCH
+    depth = DEFAULT_PREFETCH if prefetch is None else prefetch
+    parsed = _parse_from_storage(storage, keys, depth, file_timeout, request_timeout, content_hashes)
+    return _collect(parsed, out_dir, filing_status, withholding)
 
-    result = {
+
+def run_pipeline_on_paths(paths: List[str], out_dir: str, *, filing_status: str = 'single', withholding: float = 0.0,
+                          file_timeout: Optional[float] = None, request_timeout: Optional[float] = None) -> dict:
+    """Full pipeline: parse each file, aggregate incomes and withholdings, compute tax, generate PDF.
+    Returns aggregated result and path to generated draft PDF.
+    `file_timeout` / `request_timeout` are time budgets in seconds (see `_parse_budgeted`); a file that
+    overruns is reported in `per_file` with status 'timeout' and left out of the aggregate.
+    """
+    parsed = _parse_budgeted(((p, None) for p in paths), file_timeout, request_timeout)
+    return _collect(parsed, out_dir, filing_status, withholding)
+
+
+def _collect(parsed, out_dir: str, filing_status: str, withholding: float) -> dict:
+    texts: List[str] = []
+    result: Dict[str, Any] = {'per_file': []}
+    for event in _iter_stages(parsed, out_dir, filing_status, withholding, texts):
+        kind = event.pop('event')
+        if kind == 'file':
+            result['per_file'].append(event['result'])
+        else:
+            result.update(event)
+
+    # legacy: also provide a single-document view of the concatenated texts (backwards compatibility)
+    with metrics.stage('legacy_combined'):
+        combined_text = "\n".join(texts)
+        legacy_doc_type, legacy_conf = detect_document_type(combined_text)
+        legacy_fields = extract_fields(combined_text, legacy_doc_type)
+        legacy_issues = validate_fields(legacy_fields, legacy_doc_type)
+
+    return {
         'doc_type': legacy_doc_type,
         'confidence': legacy_conf,
         'fields': legacy_fields,
         'validation_issues': legacy_issues,
-        'per_file': per_file,
-        'aggregated_fields': agg_fields,
-        'tax_estimate': tax,
-        'draft_form': form_path,
+        'per_file': result['per_file'],
+        'aggregated_fields': result['aggregated_fields'],
+        'tax_estimate': result['tax_estimate'],
+        'draft_form': result['draft_form'],
     }
-    return result
-
 
 if __name__ == '__main__':
     import sys
-    if len(sys.argv) < 3:
-        print('Usage: python pipeline.py out_dir input1.txt [input2.txt ...]')
+    import profiling
+    args = sys.argv[1:]
+    show_metrics = '--metrics' in args
+    args = [a for a in args if a != '--metrics']
+    results_db = None
+    if '--results-db' in args:
+        i = args.index('--results-db')
+        results_db = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    if len(args) < 2:
+        print('Usage: python pipeline.py [--metrics] [--results-db results.db] out_dir input1.txt [input2.txt ...]')
         sys.exit(2)
-    out = sys.argv[1]
-    paths = sys.argv[2:]
-    res = run_pipeline_on_paths(paths, out)
+    out = args[0]
+    paths = args[1:]
+    # ROSY_PROFILE=1 writes a cProfile stats file for this run (see profiling.py)
+    res = profiling.wrap(run_pipeline_on_paths, label='cli')(paths, out)
+    if results_db:
+        from resultstore import ResultsStore
+        res['return_id'] = ResultsStore(results_db).save_run(res)
     print('Pipeline result:')
     print(res)
+    if show_metrics:
+        print()
+        print(metrics.format_summary())
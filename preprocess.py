@@ -1,9 +1,28 @@
 """
 Basic preprocessing utilities for images (grayscale, resize, simple contrast) when Pillow is available.
 Functions are optional for the pipeline; if Pillow is not installed, functions raise informative errors.
+
+`prepare_for_ocr` is the in-memory stage used by ingestion before OCR: EXIF orientation, grayscale,
+resampling to a target DPI, then (with NumPy) contrast stretching, Otsu binarization and deskew.
 """
+import os
 from typing import Tuple
 
+# resolution Tesseract is tuned for
+DEFAULT_OCR_DPI = int(os.environ.get('ROSY_OCR_DPI', '300'))
+# when an image carries no DPI metadata, assume it shows a letter-size page this many inches wide
+_ASSUMED_PAGE_WIDTH_IN = 8.5
+_ASSUMED_PAGE_HEIGHT_IN = 11.0
+# metadata DPI implying a page larger than this (short x long side, inches; a letter page with some slack)
+# is wrong: cameras write 72 dpi into multi-megapixel photos
+_MAX_PAGE_IN = (_ASSUMED_PAGE_WIDTH_IN * 1.15, _ASSUMED_PAGE_HEIGHT_IN * 1.15)
+_DESKEW_MAX_DEGREES = 5.0
+_DESKEW_STEP_DEGREES = 0.25
+# dark pixels sampled when scoring deskew angles
+_DESKEW_SAMPLE = 40000
+# pixels per np.bincount call: bincount widens uint8 input to int64, so a whole page at once costs 8 bytes/pixel
+_HISTOGRAM_CHUNK = 1 << 20
+
 
 def normalize_image(path: str, out_path: str, max_width: int = 2000) -> Tuple[str, Tuple[int,int]]:
     """Load image, convert to grayscale, resize if wider than max_width, save to out_path and return (out_path, size).
@@ -23,3 +42,134 @@ def normalize_image(path: str, out_path: str, max_width: int = 2000) -> Tuple[st
         img = img.resize((max_width, new_h))
     img.save(out_path)
     return out_path, img.size
+
+
+def source_dpi(img) -> float:
+    """DPI recorded in the image metadata, or an estimate assuming the image spans a letter-size page.
+    Metadata DPI that would make the image larger than a letter page is ignored."""
+    dpi = img.info.get('dpi')
+    short, long = sorted(img.size)
+    try:
+        if dpi and float(dpi[0]) > 1:
+            dpi = float(dpi[0])
+            if short / dpi <= _MAX_PAGE_IN[0] and long / dpi <= _MAX_PAGE_IN[1]:
+                return dpi
+    except (TypeError, ValueError, IndexError):
+        pass
+    return short / _ASSUMED_PAGE_WIDTH_IN
+
+
+def resample_to_dpi(img, target_dpi: int = DEFAULT_OCR_DPI):
+    """Scale a PIL image so it has roughly `target_dpi`. Upscaling is capped at 2x and never makes the image
+    larger than a letter page at `target_dpi`."""
+    from PIL import Image
+    scale = target_dpi / source_dpi(img)
+    if scale > 1:
+        short, long = sorted(img.size)
+        fit = min(_ASSUMED_PAGE_WIDTH_IN * target_dpi / short, _ASSUMED_PAGE_HEIGHT_IN * target_dpi / long)
+        scale = min(scale, 2.0, max(fit, 1.0))
+    if 0.9 <= scale <= 1.1:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    # reducing_gap lets Pillow shrink by an integer factor first, which is much faster on camera images
+    return img.resize(size, Image.BILINEAR if scale < 1 else Image.BICUBIC, reducing_gap=2.0 if scale < 1 else None)
+
+
+def histogram(arr):
+    """256-bin histogram of a uint8 array, counted in slices to keep bincount's int64 copy small."""
+    import numpy as np
+    flat = arr.ravel()
+    hist = np.zeros(256, dtype=np.int64)
+    for i in range(0, flat.size, _HISTOGRAM_CHUNK):
+        hist += np.bincount(flat[i:i + _HISTOGRAM_CHUNK], minlength=256)
+    return hist
+
+
+def stretch_contrast(arr, low_pct: float = 1.0, high_pct: float = 99.0):
+    """Linearly map the [low_pct, high_pct] percentile range of a uint8 array onto 0..255."""
+    import numpy as np
+    hist = histogram(arr)
+    cdf = np.cumsum(hist) / arr.size
+    lo = int(np.searchsorted(cdf, low_pct / 100.0))
+    hi = int(np.searchsorted(cdf, high_pct / 100.0))
+    if hi <= lo:
+        return arr
+    lut = np.clip((np.arange(256, dtype=np.float32) - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+    return lut[arr]
+
+
+def otsu_threshold(arr) -> int:
+    """Otsu's threshold of a uint8 array, computed from its histogram."""
+    import numpy as np
+    hist = histogram(arr).astype(np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = np.divide(cum_mean, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+    mean_fg = np.divide(cum_mean[-1] - cum_mean, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def estimate_skew(binary, max_degrees: float = _DESKEW_MAX_DEGREES, step: float = _DESKEW_STEP_DEGREES) -> float:
+    """Estimate text skew in degrees from a binarized array (text = 0) by maximizing the variance of
+    row projections over candidate angles. All angles are scored in one vectorized pass.
+    """
+    import numpy as np
+    # one flat index array instead of nonzero's separate row and column arrays (same points, same order)
+    dark = np.flatnonzero(binary == 0)
+    if dark.size < 100:
+        return 0.0
+    if dark.size > _DESKEW_SAMPLE:
+        # an evenly strided view; a random choice without replacement would permute every index first
+        dark = dark[::-(-dark.size // _DESKEW_SAMPLE)]
+    ys, xs = np.divmod(dark, binary.shape[1])
+    angles = np.arange(-max_degrees, max_degrees + step / 2, step)
+    slopes = np.tan(np.deg2rad(angles))
+    # row each dark pixel would land on after undoing a rotation by each candidate angle
+    # (computed in place: this is an angles x samples matrix)
+    proj = slopes[:, None] * -xs[None, :]
+    proj += ys[None, :]
+    rows = np.rint(proj, out=proj).astype(np.int32)
+    del proj
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    rows += (np.arange(len(angles), dtype=np.int32) * height)[:, None]
+    counts = np.bincount(rows.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def prepare_for_ocr(img, *, target_dpi: int = DEFAULT_OCR_DPI, binarize: bool = True, deskew: bool = True):
+    """Return a new in-memory PIL image ready for OCR. No files are written.
+    Without NumPy only orientation, grayscale, resampling and Pillow's autocontrast are applied.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except Exception:
+        raise RuntimeError('Pillow required for image preprocessing')
+
+    img = ImageOps.exif_transpose(img)
+    img = img.convert('L')
+    img = resample_to_dpi(img, target_dpi)
+    try:
+        import numpy as np
+    except Exception:
+        return ImageOps.autocontrast(img, cutoff=1)
+
+    arr = stretch_contrast(np.asarray(img))
+    if binarize or deskew:
+        # uint8 operands keep the result uint8; int scalars would build an int64 copy of the page first
+        binary = np.where(arr > otsu_threshold(arr), np.uint8(255), np.uint8(0))
+        if deskew:
+            angle = estimate_skew(binary)
+            if angle:
+                # rotating by the detected skew straightens the text lines
+                rotated = Image.fromarray(binary if binarize else arr).rotate(
+                    angle, resample=Image.BILINEAR, expand=False, fillcolor=255)
+                if binarize:
+                    return rotated.point(lambda v: 255 if v >= 128 else 0)
+                return rotated
+        if binarize:
+            arr = binary
+    return Image.fromarray(arr)
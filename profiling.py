@@ -0,0 +1,132 @@
+"""
+Opt-in CPU profiling for individual requests or CLI runs.
+Profiling is enabled for everything with ROSY_PROFILE=1, or per request with an `X-Rosy-Profile` header whose
+value matches ROSY_PROFILE_TOKEN. The wrapped call runs under cProfile; the stats are written to
+ROSY_PROFILE_DIR as `<request id>.prof` (loadable with pstats/snakeviz) next to a `.json` sidecar with the
+request ID, wall time and a per-stage breakdown. Only the newest ROSY_PROFILE_MAX_FILES profiles are kept.
+
+When profiling is off `wrap` returns the function itself, so there is no overhead.
+"""
+import hmac
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, Any, Optional
+
+PROFILE_HEADER = 'X-Rosy-Profile'
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# pipeline stages reported in the sidecar, matched by (module file, function name) in the profile
+STAGE_FUNCTIONS = {
+    'ingest': ('ingestion.py', 'ingest_pages'),
+    'split': ('splitter.py', 'group_pages'),
+    'classify': ('classifier.py', 'detect_document_type'),
+    'extract': ('parser.py', 'extract_fields'),
+    'validate': ('validator.py', 'validate_fields'),
+    'aggregate': ('pipeline.py', 'aggregate_per_file'),
+    'tax': ('taxcalc.py', 'compute_tax_estimate'),
+    'form_render': ('forms.py', 'generate_1040_draft'),
+}
+
+
+def profile_dir() -> str:
+    return os.environ.get('ROSY_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'rosy_profiles')
+
+
+def _max_files() -> int:
+    try:
+        return max(1, int(os.environ.get('ROSY_PROFILE_MAX_FILES', '50')))
+    except ValueError:
+        return 50
+
+
+def requested(headers=None) -> bool:
+    """True if profiling is on globally or the request carries a valid profiling token."""
+    if os.environ.get('ROSY_PROFILE') == '1':
+        return True
+    if headers is None:
+        return False
+    supplied = headers.get(PROFILE_HEADER)
+    token = os.environ.get('ROSY_PROFILE_TOKEN')
+    return bool(supplied and token and hmac.compare_digest(supplied, token))
+
+
+def _request_id(headers=None) -> str:
+    rid = headers.get(REQUEST_ID_HEADER) if headers is not None else None
+    # request IDs become file names: keep them short and safe
+    if rid:
+        rid = re.sub(r'[^A-Za-z0-9._-]', '_', rid)[:64]
+    return rid or uuid.uuid4().hex
+
+
+def stage_breakdown(stats) -> Dict[str, float]:
+    """Cumulative seconds spent in each known pipeline stage, from a pstats.Stats object."""
+    out: Dict[str, float] = {}
+    for (filename, _line, func), (_cc, _nc, _tt, ct, _callers) in stats.stats.items():
+        for stage, (module, name) in STAGE_FUNCTIONS.items():
+            if func == name and os.path.basename(filename) == module:
+                out[stage] = round(out.get(stage, 0.0) + ct, 6)
+    return out
+
+
+def _prune(directory: str, keep: int) -> None:
+    profiles = sorted((p for p in os.listdir(directory) if p.endswith('.prof')),
+                      key=lambda p: os.path.getmtime(os.path.join(directory, p)))
+    for name in profiles[:-keep] if len(profiles) > keep else []:
+        for path in (name, name[:-5] + '.json'):
+            try:
+                os.remove(os.path.join(directory, path))
+            except OSError:
+                pass
+
+
+def run_profiled(fn: Callable, *args, request_id: Optional[str] = None, label: str = '', **kwargs):
+    """Run fn(*args, **kwargs) under cProfile and write its stats and sidecar. Returns fn's result."""
+    import cProfile
+    import pstats
+
+    request_id = request_id or uuid.uuid4().hex
+    prof = cProfile.Profile()
+    start = time.perf_counter()
+    error: Optional[str] = None
+    try:
+        return prof.runcall(fn, *args, **kwargs)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        try:
+            directory = profile_dir()
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, f'{time.strftime("%Y%m%dT%H%M%S")}_{request_id}')
+            prof.dump_stats(base + '.prof')
+            meta: Dict[str, Any] = {
+                'request_id': request_id,
+                'label': label,
+                'wall_seconds': round(elapsed, 6),
+                'stages': stage_breakdown(pstats.Stats(prof)),
+                'error': error,
+            }
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            _prune(directory, _max_files())
+        except Exception:
+            # profiling must never break the request it observes
+            pass
+
+
+def wrap(fn: Callable, headers=None, *, label: str = '') -> Callable:
+    """Return `fn` unchanged when profiling is off, otherwise a wrapper that profiles the call."""
+    if not requested(headers):
+        return fn
+    request_id = _request_id(headers)
+
+    def _profiled(*args, **kwargs):
+        return run_profiled(fn, *args, request_id=request_id, label=label, **kwargs)
+
+    _profiled.request_id = request_id
+    return _profiled
@@ -0,0 +1,121 @@
+"""
+Typed records for parsed documents and aggregates.
+Each money field is normalized to integer cents once, when the record is built; aggregation, review
+sessions and the tax estimate work from those cents instead of re-parsing strings. `to_dict` produces
+the JSON shape the API has always returned (extracted fields as strings, aggregates as 2-decimal floats).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from parsing.money import parse_cents, to_float
+
+INCOME_FIELDS = ('wages', 'amount')
+# the first of these present on a document is its federal withholding
+WITHHOLDING_FIELDS = ('federal_income_tax_withheld', 'federal income tax withheld', 'withholding')
+
+
+def contribution_cents(fields: Dict[str, Any]) -> Tuple[int, int]:
+    """(income, withholding) in cents that one document's fields add to the aggregate."""
+    income = 0
+    for key in INCOME_FIELDS:
+        cents = parse_cents(fields.get(key))
+        if cents is not None:
+            income += cents
+    withheld = 0
+    for key in WITHHOLDING_FIELDS:
+        if fields.get(key):
+            withheld = parse_cents(fields[key]) or 0
+            break
+    return income, withheld
+
+
+class DocumentRecord:
+    """One parsed logical document."""
+
+    __slots__ = ('path', 'doc_type', 'confidence', 'fields', 'field_confidence', 'validation_issues',
+                 'document_index', 'pages', 'status', 'content_hash', 'income_cents', 'withholding_cents')
+
+    def __init__(self, path: str, doc_type: str, confidence: float, fields: Dict[str, Any],
+                 validation_issues: List[str], field_confidence: Optional[Dict[str, float]] = None,
+                 document_index: Optional[int] = None, pages: Optional[List[int]] = None, status: str = 'ok',
+                 content_hash: Optional[str] = None):
+        self.path = path
+        self.doc_type = doc_type
+        self.confidence = confidence
+        self.fields = fields
+        self.field_confidence = field_confidence if field_confidence is not None else {}
+        self.validation_issues = validation_issues
+        self.document_index = document_index
+        self.pages = pages
+        # 'ok', or 'timeout' for a file cancelled by its time budget (no fields, left out of aggregation)
+        self.status = status
+        # sha256 of the source document's bytes, set for storage documents bound for the results store
+        self.content_hash = content_hash
+        self.income_cents, self.withholding_cents = contribution_cents(fields)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'DocumentRecord':
+        return cls(d.get('path', ''), d.get('doc_type', 'unknown'), d.get('confidence', 0.0),
+                   dict(d.get('fields') or {}), list(d.get('validation_issues') or []),
+                   dict(d.get('field_confidence') or {}), d.get('document_index'), d.get('pages'),
+                   d.get('status', 'ok'), d.get('content_hash'))
+
+    def update_fields(self, changes: Dict[str, Any]) -> None:
+        """Apply edited fields (None removes a field) and re-normalize the amounts."""
+        for k, v in changes.items():
+            if v is None:
+                self.fields.pop(k, None)
+            else:
+                self.fields[k] = v
+        self.income_cents, self.withholding_cents = contribution_cents(self.fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            'path': self.path,
+            'doc_type': self.doc_type,
+            'confidence': self.confidence,
+            'fields': self.fields,
+            'field_confidence': self.field_confidence,
+            'validation_issues': self.validation_issues,
+        }
+        if self.document_index is not None:
+            d['document_index'] = self.document_index
+            d['pages'] = self.pages
+        if self.status != 'ok':
+            d['status'] = self.status
+        if self.content_hash:
+            d['content_hash'] = self.content_hash
+        return d
+
+
+class Aggregate:
+    """Running income and withholding totals in cents."""
+
+    __slots__ = ('wages_cents', 'withholding_cents')
+
+    def __init__(self, wages_cents: int = 0, withholding_cents: int = 0):
+        self.wages_cents = wages_cents
+        self.withholding_cents = withholding_cents
+
+    @classmethod
+    def of(cls, records) -> 'Aggregate':
+        agg = cls()
+        for r in records:
+            agg.add(r.income_cents, r.withholding_cents)
+        return agg
+
+    def add(self, income_cents: int, withholding_cents: int) -> None:
+        self.wages_cents += income_cents
+        self.withholding_cents += withholding_cents
+
+    @property
+    def withholding(self) -> float:
+        return to_float(self.withholding_cents)
+
+    def fields(self) -> Dict[str, Any]:
+        """The `aggregated_fields` JSON shape: only non-zero totals, as floats."""
+        out: Dict[str, Any] = {}
+        if self.wages_cents:
+            out['wages'] = to_float(self.wages_cents)
+        if self.withholding_cents:
+            out['withholding'] = to_float(self.withholding_cents)
+        return out
@@ -0,0 +1,93 @@
+"""
+In-memory LRU cache of rendered draft forms.
+A draft is a pure function of its field values, the template it is filled into and the renderer code, so
+`render_key` hashes exactly those (canonical JSON of the field map, the template's content hash, and
+RENDERER_VERSION). Pressing "Finalize" again with unchanged inputs returns the stored bytes instead of
+re-reading the template and rewriting the PDF. Entries are bounded by count and total bytes; the least
+recently used ones are evicted first.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import metrics
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('ROSY_RENDER_CACHE_ENTRIES', '128'))
+DEFAULT_MAX_BYTES = int(os.environ.get('ROSY_RENDER_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+_TEMPLATE_HASHES: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_TEMPLATE_LOCK = threading.Lock()
+
+
+def template_version(path: str) -> str:
+    """Content hash of a template file, recomputed only when its size or mtime changes."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _TEMPLATE_LOCK:
+        cached = _TEMPLATE_HASHES.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _TEMPLATE_LOCK:
+        _TEMPLATE_HASHES[path] = (stamp, digest)
+    return digest
+
+
+def render_key(field_map: Dict[str, Any], template: str, renderer: str) -> str:
+    """Canonical hash of everything a rendered draft depends on."""
+    canonical = json.dumps(field_map, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256('\0'.join((renderer, template, canonical)).encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Thread-safe LRU of key -> (file name, rendered bytes)."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[str, bytes]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.record_cache('render', entry is not None)
+        return entry
+
+    def put(self, key: str, name: str, data: bytes) -> None:
+        if len(data) > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (name, data)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+RENDER_CACHE = RenderCache()
@@ -0,0 +1,301 @@
+"""
+Persistent results store (SQLite) for parsed documents and computed returns, so repeat reports and
+lookups ("every return with this employer") are queries instead of re-ingesting the source files.
+
+Tables: returns (one per pipeline run), documents, fields, issues. Documents are indexed by doc type,
+tax year, content hash (sha256 of the source file) and by keyed hashes of the EIN and SSN. The hashes
+are HMAC-SHA256 under ROSY_RESULTS_KEY (or a key file created next to the database), so the index can
+be searched by identifier without storing raw SSNs; SSNs in stored field values are masked.
+
+Usage:
+  python resultstore.py results.db --ein 12-3456789 [--tax-year 2024]
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+from security import mask_ssn_in_text
+
+EIN_FIELDS = ('ein', 'payer_ein')
+SSN_FIELDS = ('employee_ssn', 'recipient_ssn', 'ssn')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS returns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    tax_year INTEGER,
+    filing_status TEXT,
+    agi REAL,
+    taxable_income REAL,
+    gross_tax REAL,
+    withholding REAL,
+    tax_due REAL,
+    aggregated_fields TEXT NOT NULL,
+    tax_estimate TEXT NOT NULL,
+    draft_form TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    return_id INTEGER NOT NULL REFERENCES returns(id) ON DELETE CASCADE,
+    path TEXT,
+    content_hash TEXT,
+    doc_type TEXT NOT NULL,
+    confidence REAL,
+    tax_year INTEGER,
+    ein_hash TEXT,
+    ssn_hash TEXT,
+    document_index INTEGER,
+    pages TEXT
+);
+CREATE TABLE IF NOT EXISTS fields (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    confidence REAL
+);
+CREATE TABLE IF NOT EXISTS issues (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    issue TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_doc_type ON documents (doc_type, tax_year);
+CREATE INDEX IF NOT EXISTS documents_ein ON documents (ein_hash, tax_year);
+CREATE INDEX IF NOT EXISTS documents_ssn ON documents (ssn_hash, tax_year);
+CREATE INDEX IF NOT EXISTS documents_content ON documents (content_hash);
+CREATE INDEX IF NOT EXISTS documents_return ON documents (return_id);
+CREATE INDEX IF NOT EXISTS returns_tax_year ON returns (tax_year);
+CREATE INDEX IF NOT EXISTS fields_document ON fields (document_id);
+CREATE INDEX IF NOT EXISTS issues_document ON issues (document_id);
+"""
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> Optional[str]:
+    """sha256 of a file's bytes, or None if it can't be read."""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def _read_key(key_path: str, wait: float = 5.0) -> bytes:
+    # a key file that was just created may not be written yet
+    deadline = time.monotonic() + wait
+    while True:
+        with open(key_path, 'rb') as f:
+            key = f.read()
+        if key or time.monotonic() >= deadline:
+            break
+        time.sleep(0.01)
+    if not key:
+        raise RuntimeError(f'results key file {key_path} is empty')
+    return key
+
+
+def _load_key(db_path: str) -> bytes:
+    env = os.environ.get('ROSY_RESULTS_KEY')
+    if env:
+        return env.encode('utf-8')
+    key_path = db_path + '.key'
+    try:
+        return _read_key(key_path)
+    except FileNotFoundError:
+        pass
+    key = secrets.token_hex(32).encode('ascii')
+    try:
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # another process created the key first; use theirs
+        return _read_key(key_path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+class ResultsStore:
+    def __init__(self, path: str, key: Optional[bytes] = None):
+        self.path = path
+        self.key = key if key is not None else _load_key(path)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        db = self._conn()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def hash_identifier(self, value: Optional[str]) -> Optional[str]:
+        """Keyed hash of an EIN/SSN; formatting (dashes, spaces) doesn't change the hash."""
+        digits = re.sub(r'\D', '', value or '')
+        if not digits:
+            return None
+        return hmac.new(self.key, digits.encode('ascii'), hashlib.sha256).hexdigest()
+
+    def _first_hash(self, fields: Dict[str, Any], names) -> Optional[str]:
+        for name in names:
+            if fields.get(name):
+                return self.hash_identifier(str(fields[name]))
+        return None
+
+    def _insert_run(self, db: sqlite3.Connection, result: Dict[str, Any], tax_year: Optional[int],
+                    hashes: Dict[str, Optional[str]]) -> int:
+        tax = result.get('tax_estimate') or {}
+        cur = db.execute(
+            'INSERT INTO returns (created_at, tax_year, filing_status, agi, taxable_income, gross_tax, withholding,'
+            ' tax_due, aggregated_fields, tax_estimate, draft_form) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (time.time(), tax_year, tax.get('filing_status'), tax.get('agi'), tax.get('taxable_income'),
+             tax.get('gross_tax'), tax.get('withholding'), tax.get('tax_due'),
+             json.dumps(result.get('aggregated_fields') or {}), json.dumps(tax), result.get('draft_form')))
+        return_id = cur.lastrowid
+        field_rows = []
+        issue_rows = []
+        for doc in result.get('per_file') or []:
+            fields = doc.get('fields') or {}
+            path = doc.get('path')
+            content_hash = doc.get('content_hash')
+            if content_hash is None:
+                # local files are hashed here, at save time, so parsing never pays for it; storage documents
+                # carry their hash (content_hashes=True) and any other non-file path stays unhashed
+                if path not in hashes:
+                    hashes[path] = file_hash(path) if path and os.path.isfile(path) else None
+                content_hash = hashes[path]
+            cur = db.execute(
+                'INSERT INTO documents (return_id, path, content_hash, doc_type, confidence, tax_year, ein_hash,'
+                ' ssn_hash, document_index, pages) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (return_id, path, content_hash, doc.get('doc_type', 'unknown'), doc.get('confidence'),
+                 fields.get('tax_year') or tax_year, self._first_hash(fields, EIN_FIELDS),
+                 self._first_hash(fields, SSN_FIELDS), doc.get('document_index'),
+                 json.dumps(doc['pages']) if doc.get('pages') else None))
+            doc_id = cur.lastrowid
+            confidence = doc.get('field_confidence') or {}
+            field_rows.extend((doc_id, name, mask_ssn_in_text(str(value)), confidence.get(name))
+                              for name, value in fields.items())
+            issue_rows.extend((doc_id, issue) for issue in doc.get('validation_issues') or [])
+        db.executemany('INSERT INTO fields (document_id, name, value, confidence) VALUES (?, ?, ?, ?)', field_rows)
+        db.executemany('INSERT INTO issues (document_id, issue) VALUES (?, ?)', issue_rows)
+        return return_id
+
+    def save_run(self, result: Dict[str, Any], *, tax_year: Optional[int] = None) -> int:
+        """Store one `run_pipeline_on_paths` result. Returns the return id."""
+        return self.save_runs([result], tax_year=tax_year)[0]
+
+    def save_runs(self, results: Iterable[Dict[str, Any]], *, tax_year: Optional[int] = None) -> List[int]:
+        """Bulk insert pipeline results in a single transaction. Returns the return ids in order."""
+        hashes: Dict[str, Optional[str]] = {}
+        with self._transaction() as db:
+            return [self._insert_run(db, r, tax_year, hashes) for r in results]
+
+    def _documents(self, where: str, params: List[Any], limit: int) -> List[Dict[str, Any]]:
+        db = self._conn()
+        rows = db.execute(f'SELECT * FROM documents {where} ORDER BY id LIMIT ?', params + [limit]).fetchall()
+        docs = {r['id']: dict(r, fields={}, validation_issues=[]) for r in rows}
+        if not docs:
+            return []
+        marks = ','.join('?' * len(docs))
+        for r in db.execute(f'SELECT document_id, name, value FROM fields WHERE document_id IN ({marks})', list(docs)):
+            docs[r['document_id']]['fields'][r['name']] = r['value']
+        for r in db.execute(f'SELECT document_id, issue FROM issues WHERE document_id IN ({marks})', list(docs)):
+            docs[r['document_id']]['validation_issues'].append(r['issue'])
+        for d in docs.values():
+            d['pages'] = json.loads(d['pages']) if d['pages'] else None
+        return list(docs.values())
+
+    def find_documents(self, *, doc_type: Optional[str] = None, ein: Optional[str] = None,
+                       ssn: Optional[str] = None, tax_year: Optional[int] = None,
+                       content_hash: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Documents matching every given filter, with their fields and validation issues."""
+        clauses, params = [], []
+        for column, value in (('doc_type', doc_type), ('ein_hash', self.hash_identifier(ein) if ein else None),
+                              ('ssn_hash', self.hash_identifier(ssn) if ssn else None),
+                              ('tax_year', tax_year), ('content_hash', content_hash)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return self._documents(where, params, limit)
+
+    def get_return(self, return_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute('SELECT * FROM returns WHERE id = ?', (return_id,)).fetchone()
+        if row is None:
+            return None
+        out = dict(row)
+        out['aggregated_fields'] = json.loads(out['aggregated_fields'])
+        out['tax_estimate'] = json.loads(out['tax_estimate'])
+        out['documents'] = self._documents('WHERE return_id = ?', [return_id], 100000)
+        return out
+
+    def returns_for_identifier(self, *, ein: Optional[str] = None, ssn: Optional[str] = None,
+                               tax_year: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Summary rows of every return that includes a document with the given EIN and/or SSN."""
+        clauses, params = [], []
+        if ein:
+            clauses.append('d.ein_hash = ?')
+            params.append(self.hash_identifier(ein))
+        if ssn:
+            clauses.append('d.ssn_hash = ?')
+            params.append(self.hash_identifier(ssn))
+        if tax_year is not None:
+            clauses.append('r.tax_year = ?')
+            params.append(tax_year)
+        if not clauses:
+            raise ValueError('an EIN or SSN is required')
+        rows = self._conn().execute(
+            'SELECT DISTINCT r.id, r.created_at, r.tax_year, r.filing_status, r.agi, r.withholding, r.tax_due'
+            ' FROM returns r JOIN documents d ON d.return_id = r.id WHERE ' + ' AND '.join(clauses) +
+            ' ORDER BY r.id', params).fetchall()
+        return [dict(r) for r in rows]
+
+    def seen_content(self, content_hash: str) -> bool:
+        """True if a document with this source-file hash was stored before (skip re-ingesting it)."""
+        row = self._conn().execute('SELECT 1 FROM documents WHERE content_hash = ? LIMIT 1',
+                                   (content_hash,)).fetchone()
+        return row is not None
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='Query the results store')
+    ap.add_argument('db')
+    ap.add_argument('--ein')
+    ap.add_argument('--ssn')
+    ap.add_argument('--doc-type')
+    ap.add_argument('--tax-year', type=int)
+    args = ap.parse_args()
+    store = ResultsStore(args.db)
+    if args.ein or args.ssn:
+        rows = store.returns_for_identifier(ein=args.ein, ssn=args.ssn, tax_year=args.tax_year)
+    else:
+        rows = store.find_documents(doc_type=args.doc_type, tax_year=args.tax_year)
+    print(json.dumps(rows, indent=2))
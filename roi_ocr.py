@@ -0,0 +1,136 @@
+"""
+Layout-aware region-of-interest OCR for known form layouts (W-2, 1099-NEC).
+A cheap low-resolution OCR pass identifies the form; the form's content box is then located and only the
+field regions listed in parsing.layouts are OCR'd, one line each, at full resolution. The values come back
+as extracted fields, so the full-page OCR + regex pass is skipped.
+
+`extract_with_layout` returns None whenever the result can't be trusted (no layout for the page type, the
+content box doesn't match the layout, a required field didn't parse or validation failed); callers then
+fall back to full-page OCR. ROSY_LAYOUT_OCR=0 disables the layout path.
+"""
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from ocr_words import adaptive_ocr, field_confidence
+from parsing import detect_document_type, validate_fields
+from parsing.layouts import FormLayout, get_layout
+from preprocess import DEFAULT_OCR_DPI, prepare_for_ocr
+
+LAYOUT_OCR = os.environ.get('ROSY_LAYOUT_OCR', '1') != '0'
+# resolution of the classification pass
+LOW_RES_DPI = 100
+# Tesseract page segmentation mode for a single line of text
+_LINE_PSM = 7
+# a row/column is part of the form when at least this fraction of its pixels is ink (scan specks stay below it)
+_INK_FRACTION = 0.02
+# regions are grown by this fraction of the form size so slight misalignment doesn't clip values
+_REGION_PAD = 0.01
+
+Box = Tuple[int, int, int, int]
+
+
+def content_box(img) -> Optional[Box]:
+    """Bounding box (left, top, right, bottom) of the ink on a binarized page, ignoring isolated specks."""
+    import numpy as np
+    ink = np.asarray(img.convert('L')) < 128
+    rows = np.nonzero(ink.sum(axis=1) >= max(2, ink.shape[1] * _INK_FRACTION))[0]
+    cols = np.nonzero(ink.sum(axis=0) >= max(2, ink.shape[0] * _INK_FRACTION))[0]
+    if rows.size == 0 or cols.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def region_pixels(form_box: Box, region: Tuple[float, float, float, float], size: Tuple[int, int]) -> Box:
+    """Pixel box of a normalized layout region inside `form_box`, padded and clamped to the image."""
+    left, top, right, bottom = form_box
+    w, h = right - left, bottom - top
+    x0, y0, x1, y1 = region
+    return (max(0, int(left + (x0 - _REGION_PAD) * w)), max(0, int(top + (y0 - _REGION_PAD) * h)),
+            min(size[0], int(left + (x1 + _REGION_PAD) * w)), min(size[1], int(top + (y1 + _REGION_PAD) * h)))
+
+
+def _default_ocr(img, psm: Optional[int] = None):
+    """Plain text for the classification pass; words with confidences for field regions, where a
+    low-confidence region is re-read (ocr_words.adaptive_ocr)."""
+    if psm is None:
+        from ingestion import ocr_image
+        return ocr_image(img)
+    return adaptive_ocr(img, psm=psm)
+
+
+def _read_regions(page, form_box: Box, layout: FormLayout, ocr: Callable) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    fields: Dict[str, Any] = {}
+    confidence: Dict[str, float] = {}
+    for name, region in layout.fields.items():
+        # `ocr` returns text, or an OcrPage (words with confidences)
+        out = ocr(page.crop(region_pixels(form_box, region.box, page.size)), psm=_LINE_PSM)
+        value = region.parse(getattr(out, 'text', out))
+        if value:
+            fields[name] = value
+            if hasattr(out, 'words'):
+                confidence.update(field_confidence({name: value}, out.words))
+    return fields, confidence
+
+
+def extract_with_layout(img, ocr: Optional[Callable] = None) -> Optional[Dict[str, Any]]:
+    """OCR only the field regions of a known form on one page image.
+    Returns {'doc_type', 'confidence', 'fields', 'validation_issues', 'text'} (plus 'field_confidence' when
+    `ocr` reports word confidences) or None to request the full-page fallback. `ocr(image, psm=None)` returns
+    the text or an ocr_words.OcrPage; it defaults to plain OCR for classification and adaptive word OCR for
+    the field regions.
+    """
+    ocr = ocr or _default_ocr
+    with metrics.stage('ocr_preprocess'):
+        page = prepare_for_ocr(img)
+    factor = max(1, round(DEFAULT_OCR_DPI / LOW_RES_DPI))
+    low = page.reduce(factor) if factor > 1 else page
+
+    with metrics.stage('layout_classify'):
+        text = ocr(low)
+        text = getattr(text, 'text', text)
+        doc_type, conf = detect_document_type(text)
+    layout = get_layout(doc_type, text)
+    if layout is None:
+        metrics.LAYOUT_OCR.inc(outcome='no_layout')
+        return None
+
+    box = content_box(low)
+    if box is None or not layout.matches_aspect(box[2] - box[0], box[3] - box[1]):
+        metrics.LAYOUT_OCR.inc(outcome='unaligned')
+        return None
+    form_box = tuple(min(v * factor, limit) for v, limit in zip(box, page.size * 2))
+
+    with metrics.stage('layout_roi'):
+        fields, confidence = _read_regions(page, form_box, layout, ocr)
+    issues = validate_fields(fields, doc_type)
+    if issues or any(name not in fields for name in layout.required):
+        metrics.LAYOUT_OCR.inc(outcome='unparsed')
+        return None
+    metrics.LAYOUT_OCR.inc(outcome='roi')
+    out = {'doc_type': doc_type, 'confidence': conf, 'fields': fields, 'validation_issues': issues, 'text': text}
+    if confidence:
+        out['field_confidence'] = confidence
+    return out
+
+
+def extract_file_with_layout(path, ocr: Optional[Callable] = None) -> Optional[Dict[str, Any]]:
+    """Layout OCR for a single-page image file (path or binary file object); None for multi-frame files
+    or when OCR is unavailable.
+    """
+    if not LAYOUT_OCR:
+        return None
+    try:
+        from PIL import Image
+        import numpy  # noqa: F401  content_box needs it
+    except Exception:
+        return None
+    try:
+        with Image.open(path) as img:
+            if getattr(img, 'n_frames', 1) > 1:
+                return None
+            return extract_with_layout(img, ocr)
+    except Exception:
+        # missing Tesseract, unreadable image: the full-page path reports the error
+        metrics.LAYOUT_OCR.inc(outcome='error')
+        return None
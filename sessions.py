@@ -0,0 +1,115 @@
+"""
+Server-side review sessions: keep each upload's parsed per-file state so the frontend can send only
+the fields a user edited. Aggregates and the tax estimate are updated incrementally from per-file
+contributions (integer cents) instead of being recomputed from the full result on every finalize.
+"""
+import secrets
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+import metrics
+from records import Aggregate, DocumentRecord
+from taxcalc import compute_tax_estimate
+
+DEFAULT_TTL_SECONDS = 30 * 60
+MAX_SESSIONS = 1000
+
+
+class ReviewSession:
+    """Parsed state of one upload plus running totals for the aggregate."""
+
+    def __init__(self, per_file: List[dict], filing_status: str = 'single', withholding: float = 0.0):
+        # records copy the fields, so edits never touch the caller's per_file
+        self.records = [DocumentRecord.from_dict(r) for r in per_file]
+        self.filing_status = filing_status
+        # explicit withholding entered on the upload form overrides the aggregated value
+        self.withholding_override = withholding
+        self.totals = Aggregate.of(self.records)
+        self._tax: Optional[Dict[str, Any]] = None
+        # serializes concurrent edits to the same session
+        self.lock = threading.Lock()
+
+    @property
+    def per_file(self) -> List[dict]:
+        return [r.to_dict() for r in self.records]
+
+    def update_fields(self, index: int, changes: Dict[str, Any]) -> None:
+        """Apply edited fields to one file. A value of None removes the field."""
+        if index < 0 or index >= len(self.records):
+            raise IndexError(f'no file at index {index}')
+        record = self.records[index]
+        old = (record.income_cents, record.withholding_cents)
+        record.update_fields(changes)
+        if (record.income_cents, record.withholding_cents) != old:
+            self.totals.add(record.income_cents - old[0], record.withholding_cents - old[1])
+            self._tax = None
+
+    def set_filing_status(self, filing_status: str) -> None:
+        if filing_status != self.filing_status:
+            self.filing_status = filing_status
+            self._tax = None
+
+    def aggregated_fields(self) -> Dict[str, Any]:
+        return self.totals.fields()
+
+    def withholding(self) -> float:
+        return self.withholding_override if self.withholding_override else self.totals.withholding
+
+    def tax_estimate(self) -> Dict[str, Any]:
+        """Tax estimate for the current totals; only recomputed after a change that affects it."""
+        metrics.record_cache('session_tax', self._tax is not None)
+        if self._tax is None:
+            self._tax = compute_tax_estimate(self.aggregated_fields(), filing_status=self.filing_status,
+                                             withholding=self.withholding())
+        return self._tax
+
+
+class SessionStore:
+    """Thread-safe in-memory session store with TTL eviction and a cap on live sessions."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, ReviewSession] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float) -> None:
+        for sid in [sid for sid, exp in self._expires.items() if exp <= now]:
+            self._sessions.pop(sid, None)
+            self._expires.pop(sid, None)
+
+    def create(self, per_file: List[dict], filing_status: str = 'single', withholding: float = 0.0) -> str:
+        session = ReviewSession(per_file, filing_status, withholding)
+        sid = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            while len(self._sessions) >= self.max_sessions:
+                # drop the session closest to expiry
+                oldest = min(self._expires, key=self._expires.get)
+                self._sessions.pop(oldest, None)
+                self._expires.pop(oldest, None)
+            self._sessions[sid] = session
+            self._expires[sid] = now + self.ttl_seconds
+        return sid
+
+    def get(self, sid: str) -> Optional[ReviewSession]:
+        """Return the live session for `sid` (refreshing its TTL) or None if unknown/expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(sid)
+            if session is not None:
+                self._expires[sid] = now + self.ttl_seconds
+            return session
+
+    def discard(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+            self._expires.pop(sid, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
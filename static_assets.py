@@ -0,0 +1,88 @@
+"""
+In-memory cache for the frontend's static assets.
+Files are read once, precompressed (gzip, and brotli when the `brotli` package is installed) and given a
+strong ETag, so repeat requests are answered from memory. With `reload=True` (dev mode) each lookup checks
+the file's mtime/size and reloads it when it changed on disk.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from typing import Dict, Optional
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+
+class StaticAsset:
+    """One asset held in memory in every encoding we can serve."""
+
+    def __init__(self, path: str, content_type: str):
+        self.path = path
+        self.content_type = content_type
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        st = os.stat(path)
+        self.signature = (st.st_mtime_ns, st.st_size)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        # encoding -> bytes; identity is always available
+        self.encodings: Dict[str, bytes] = {'identity': self.body}
+        gz = gzip.compress(self.body, compresslevel=9, mtime=0)
+        if len(gz) < len(self.body):
+            self.encodings['gzip'] = gz
+        if brotli is not None:
+            br = brotli.compress(self.body, quality=11)
+            if len(br) < len(self.body):
+                self.encodings['br'] = br
+
+    def etag_for(self, encoding: str) -> str:
+        # strong ETags must differ between representations
+        return self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+
+
+class StaticAssetCache:
+    """Maps request names (e.g. 'app.js') to cached assets under `root`."""
+
+    def __init__(self, root: str, files: Dict[str, str], reload: bool = False):
+        self.root = root
+        self.files = files
+        self.reload = reload
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+        for name in files:
+            self._load(name)
+
+    def _load(self, name: str) -> Optional[StaticAsset]:
+        path = os.path.join(self.root, name)
+        try:
+            asset = StaticAsset(path, self.files[name])
+        except OSError:
+            return None
+        with self._lock:
+            self._assets[name] = asset
+        return asset
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        if name not in self.files:
+            return None
+        asset = self._assets.get(name)
+        if asset is None:
+            return self._load(name)
+        if self.reload:
+            try:
+                st = os.stat(asset.path)
+            except OSError:
+                return None
+            if (st.st_mtime_ns, st.st_size) != asset.signature:
+                return self._load(name)
+        return asset
+
+
+def choose_encoding(asset: StaticAsset, accept_encodings) -> str:
+    """Pick the best available encoding given werkzeug's parsed Accept-Encoding header."""
+    for enc in ('br', 'gzip'):
+        if enc in asset.encodings and accept_encodings[enc]:
+            return enc
+    return 'identity'
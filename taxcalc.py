@@ -5,6 +5,8 @@ from typing import Dict, Any, List
 import json
 import os
 
+from parsing.money import parse_cents
+
 # default standard deductions (small demo values)
 STANDARD_DEDUCTIONS = {
     'single': 13850.0,
@@ -63,15 +65,13 @@ def compute_tax_estimate(extracted_fields: Dict[str, Any], *, filing_status: str
     Returns dict with AGI, deduction, taxable income, gross tax, withholding, and final tax due (positive means tax due, negative means refund).
     """
     # collect numeric-like fields
-    incomes = []
+    income_cents = 0
     for key in ('wages', 'amount'):
-        if key in extracted_fields:
-            try:
-                incomes.append(float(str(extracted_fields[key]).replace(',', '').replace('$', '')))
-            except Exception:
-                pass
+        cents = parse_cents(extracted_fields.get(key))
+        if cents is not None:
+            income_cents += cents
 
-    agi = sum(incomes)
+    agi = income_cents / 100
     deductions = STANDARD_DEDUCTIONS.get(filing_status, STANDARD_DEDUCTIONS['single'])
     taxable = max(0.0, agi - deductions)
 
@@ -0,0 +1,79 @@
+import io
+import os
+import threading
+import time
+
+import backend
+from admission import BULK, INTERACTIVE, AdmissionController, AdmissionRejected, Resource
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+
+
+def _rejected(resource, priority, timeout=None):
+    try:
+        resource.acquire(priority, timeout=timeout).release()
+    except AdmissionRejected as e:
+        return e
+    return None
+
+
+def test_bulk_work_never_takes_the_interactive_reserve():
+    res = Resource('ocr', 2, queue_timeout=0.05)
+    bulk = res.acquire(BULK)
+    e = _rejected(res, BULK)
+    assert e is not None and e.reason == 'timeout' and e.retry_after >= 1
+    interactive = res.acquire(INTERACTIVE)
+    assert res.stats()['active'] == {INTERACTIVE: 1, BULK: 1}
+    bulk.release()
+    bulk.release()  # idempotent
+    interactive.release()
+    assert res.stats()['active'] == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_interactive_waiters_go_first_and_queues_are_bounded():
+    res = Resource('render', 1, max_queue=1, queue_timeout=5)
+    held = res.acquire(BULK)
+    order = []
+
+    def wait(priority):
+        res.acquire(priority).release()
+        order.append(priority)
+
+    threads = [threading.Thread(target=wait, args=(BULK,))]
+    threads[0].start()
+    while res.stats()['queued'][BULK] == 0:
+        time.sleep(0.001)
+    threads.append(threading.Thread(target=wait, args=(INTERACTIVE,)))
+    threads[1].start()
+    while res.stats()['queued'][INTERACTIVE] == 0:
+        time.sleep(0.001)
+    # one bulk request is already waiting
+    assert _rejected(res, BULK).reason == 'queue_full'
+    held.release()
+    for t in threads:
+        t.join()
+    assert order == [INTERACTIVE, BULK]
+
+
+def test_backend_answers_429_with_retry_after_when_busy(monkeypatch):
+    controller = AdmissionController({name: Resource(name, 1, max_queue=0, queue_timeout=0)
+                                      for name in ('ocr', 'parse', 'render')})
+    monkeypatch.setattr(backend, 'ADMISSION', controller)
+    client = backend.app.test_client()
+    with open(SAMPLE, 'rb') as f:
+        content = f.read()
+
+    slot = controller.acquire('parse')
+    resp = client.post('/upload', data={'files': (io.BytesIO(content), 'w2.txt')}, content_type='multipart/form-data')
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) >= 1 and resp.get_json()['resource'] == 'parse'
+    slot.release()
+
+    resp = client.post('/upload', data={'files': (io.BytesIO(content), 'w2.txt')}, content_type='multipart/form-data')
+    assert resp.status_code == 200
+    resp = client.post('/upload?stream=1', data={'files': (io.BytesIO(content), 'w2.txt')},
+                       content_type='multipart/form-data')
+    resp.get_data()
+    resp.close()
+    stats = client.get('/admission/stats').get_json()
+    assert stats['parse']['active'] == {INTERACTIVE: 0, BULK: 0}
@@ -0,0 +1,58 @@
+import os
+
+import fitz
+from pdfrw import PdfArray, PdfDict, PdfName, PdfReader, PdfString
+
+from appearances import font_metrics, text_appearance
+from forms import create_exact_field_map, fill_fillable_1040
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(ROOT, 'templates', '1040_fillable.pdf')
+FIELDS = {'first_name': 'John', 'last_name': "O'Brien (Jr.)", 'ssn': '123-45-6789', 'wages': 75000,
+          'withholding': 8500}
+TAX = {'agi': 75000, 'taxable_income': 61150, 'gross_tax': 9739, 'withholding': 8500, 'tax_due': 1239}
+
+
+def test_filled_fields_carry_their_own_appearances(tmp_path):
+    out = fill_fillable_1040(TEMPLATE, create_exact_field_map(FIELDS, TAX), str(tmp_path / 'filled.pdf'))
+    pdf = PdfReader(out)
+    assert pdf.Root.AcroForm.NeedAppearances is None
+    names = {a.T.to_unicode(): a for a in pdf.pages[0].Annots}
+    assert names['YourLastName'].V.to_unicode() == "O'Brien (Jr.)"
+    with fitz.open(out) as doc:
+        values = {w.field_name: w.field_value for w in doc[0].widgets()}
+    assert values['YourLastName'] == "O'Brien (Jr.)" and values['Wages'] == '75,000.00'
+
+
+def test_flattened_output_has_no_form(tmp_path):
+    out = fill_fillable_1040(TEMPLATE, create_exact_field_map(FIELDS, TAX), str(tmp_path / 'flat.pdf'),
+                             flatten=True)
+    pdf = PdfReader(out)
+    assert pdf.Root.AcroForm is None and not pdf.pages[0].Annots
+    with fitz.open(out) as doc:
+        text = doc[0].get_text()
+    assert "O'Brien (Jr.)" in text and '75,000.00' in text and '123-45-6789' in text
+
+
+def test_unencodable_values_fall_back_to_need_appearances(tmp_path):
+    out = fill_fillable_1040(TEMPLATE, {'YourFirstName': '李'}, str(tmp_path / 'cjk.pdf'))
+    assert PdfReader(out).Root.AcroForm.NeedAppearances == 'true'
+
+
+def _widget(da: str, width: float, q: int = 0) -> PdfDict:
+    return PdfDict(Subtype=PdfName.Widget, FT=PdfName.Tx, Rect=PdfArray([0, 0, width, 20]),
+                   DA=PdfString.encode(da), Q=q)
+
+
+def test_auto_size_shrinks_long_values_and_quadding_aligns():
+    helv = PdfDict(Type=PdfName.Font, Subtype=PdfName.Type1, BaseFont=PdfName.Helvetica)
+    acroform = PdfDict(DR=PdfDict(Font=PdfDict(Helv=helv)))
+    short, exact = text_appearance(_widget('/Helv 0 Tf 0 g', 200), '12', acroform, 'test')
+    long, _ = text_appearance(_widget('/Helv 0 Tf 0 g', 60), 'a much longer value than fits', acroform, 'test')
+    assert exact and '/Helv 12 Tf' in short.stream
+    size = float(long.stream.split('/Helv ')[1].split()[0])
+    assert 4 <= size < 12
+    right, _ = text_appearance(_widget('/Helv 10 Tf 0 g', 100, q=2), '1.00', acroform, 'test')
+    # right aligned: x = 100 - 2 padding - width('1.00' at 10pt = 19.46)
+    assert '78.54 ' in right.stream
+    assert font_metrics('test', 'Helv', helv) is font_metrics('test', 'Helv', None)
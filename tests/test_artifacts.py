@@ -0,0 +1,63 @@
+import os
+from artifacts import ArtifactStore
+
+
+def _workspace_with_file(store, size):
+    ws = store.create_workspace('rosy_test_')
+    path = os.path.join(ws.path, 'draft.pdf')
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    aid = store.register(path, workspace=ws)
+    return ws, aid
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=250)
+    ws1, a1 = _workspace_with_file(store, 100)
+    store.release(ws1)
+    ws2, a2 = _workspace_with_file(store, 100)
+    store.release(ws2)
+    # touch the first so the second becomes least recently used
+    assert store.get(a1) is not None
+    ws3, a3 = _workspace_with_file(store, 100)
+    store.release(ws3)
+
+    assert store.get(a2) is None
+    assert not os.path.exists(ws2.path)
+    assert store.get(a1) is not None and store.get(a3) is not None
+    stats = store.stats()
+    assert stats['bytes'] == 200
+    assert stats['evicted_total'] == 1
+
+
+def test_ttl_expiry_skips_pinned_workspaces(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=0)
+    done, done_id = _workspace_with_file(store, 10)
+    store.release(done)
+    busy, busy_id = _workspace_with_file(store, 10)
+    store.sweep()
+    assert store.get(done_id) is None
+    assert store.get(busy_id) is not None
+    assert store.stats()['expired_total'] == 1
+
+
+def test_sweep_keeps_live_workspaces_of_other_processes(tmp_path):
+    import artifacts
+    store = ArtifactStore(str(tmp_path), ttl_seconds=0)
+    # another store's workspace, still in use by a live process (this one)
+    other = ArtifactStore(str(tmp_path), ttl_seconds=0)
+    live, _ = _workspace_with_file(other, 10)
+    # a workspace of a process that has exited, and a directory no store created
+    dead = os.path.join(str(tmp_path), 'rosy_upload_dead')
+    os.makedirs(dead)
+    with open(os.path.join(dead, artifacts.OWNER_FILE), 'w') as f:
+        f.write(f'{artifacts._HOST} 999999999')
+    foreign = os.path.join(str(tmp_path), 'not_a_workspace')
+    os.makedirs(foreign)
+    old = os.path.getmtime(dead) - 10
+    for path in (live.path, dead, foreign):
+        os.utime(path, (old, old))
+
+    assert store.sweep() == 1
+    assert not os.path.exists(dead)
+    assert os.path.exists(live.path) and os.path.exists(foreign)
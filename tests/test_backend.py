@@ -1,4 +1,5 @@
 import io
+import json
 import os
 from backend import app
 
@@ -15,3 +16,59 @@ def test_upload_text_file(tmp_path):
     j = resp.get_json()
     assert 'doc_type' in j
     assert j['doc_type'] == 'W-2'
+
+
+def test_download_by_artifact_id_supports_ranges():
+    client = app.test_client()
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        data = {'files': (io.BytesIO(f.read()), 'sample_w2.txt')}
+        resp = client.post('/upload', data=data, content_type='multipart/form-data')
+    j = resp.get_json()
+    assert 'draft_form' not in j
+    url = j['download_url']
+
+    full = client.get(url)
+    assert full.status_code == 200
+    part = client.get(url, headers={'Range': 'bytes=0-9'})
+    assert part.status_code == 206
+    assert part.data == full.data[:10]
+    cached = client.get(url, headers={'If-None-Match': full.headers['ETag']})
+    assert cached.status_code == 304
+
+    assert client.get('/download/unknown').status_code == 404
+
+
+def test_upload_streams_ndjson_events():
+    client = app.test_client()
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        content = f.read()
+    data = {'files': [(io.BytesIO(content), 'a.txt'), (io.BytesIO(content), 'b.txt')]}
+    resp = client.post('/upload?stream=1', data=data, content_type='multipart/form-data')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [e['event'] for e in events] == ['file', 'file', 'aggregate', 'tax', 'draft', 'done']
+    assert events[0]['result']['doc_type'] == 'W-2'
+    assert events[0]['result']['fields']['employee_ssn'].startswith('XXX-XX-')
+    assert events[2]['aggregated_fields']['wages'] == 100000.0
+    assert events[4]['download_url'].startswith('/download/')
+    assert events[5]['session_id']
+
+
+def test_stream_closed_before_first_chunk_releases_workspace():
+    from werkzeug.test import EnvironBuilder
+    from backend import ARTIFACTS
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        content = f.read()
+    environ = EnvironBuilder(method='POST', path='/upload?stream=1',
+                             data={'files': [(io.BytesIO(content), 'a.txt')]}).get_environ()
+    pinned = ARTIFACTS.stats()['pinned_workspaces']
+    body = app.wsgi_app(environ, lambda status, headers, exc_info=None: None)
+    assert ARTIFACTS.stats()['pinned_workspaces'] == pinned + 1
+    # the client goes away before the server pulls the first chunk
+    body.close()
+    assert ARTIFACTS.stats()['pinned_workspaces'] == pinned
+    assert not any(name.endswith('.txt') for ws in ARTIFACTS._workspaces.values() for name in os.listdir(ws.path))
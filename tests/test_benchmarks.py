@@ -0,0 +1,31 @@
+from benchmarks.corpus import generate_documents, generate_corpus
+from benchmarks.stages import compare, run_benchmarks
+from parsing import detect_document_type, extract_fields
+
+
+def test_corpus_is_deterministic_and_parseable(tmp_path):
+    docs = generate_documents(4, seed=7, pages=2)
+    assert docs == generate_documents(4, seed=7, pages=2)
+    assert docs != generate_documents(4, seed=8, pages=2)
+    for doc in docs:
+        text = doc['pages'][0]
+        doc_type, _ = detect_document_type(text)
+        assert doc_type == doc['kind']
+        assert extract_fields(text, doc_type)
+    corpus = generate_corpus(str(tmp_path), docs=2, kinds=('txt',))
+    assert len(corpus['txt']) == 2
+
+
+def test_compare_flags_regressions_only_beyond_threshold():
+    baseline = {'extract_fields': 0.010, 'ingest_paths[txt]': 0.020, 'tiny': 0.00001}
+    results = {'extract_fields': 0.012, 'ingest_paths[txt]': 0.030, 'tiny': 0.00003, 'new_stage': 1.0}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('ingest_paths[txt]')
+
+
+def test_run_benchmarks_covers_every_stage(tmp_path):
+    results = run_benchmarks(docs=2, repeat=1, kinds=('txt',), work_dir=str(tmp_path))
+    for stage in ('ingest_paths[txt]', 'detect_document_type', 'extract_fields', 'validate_fields',
+                  'compute_tax_estimate', 'generate_1040_draft', 'run_pipeline_on_paths[txt]'):
+        assert stage in results
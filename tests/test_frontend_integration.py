@@ -24,3 +24,18 @@ def test_upload_via_frontend_client(tmp_path):
     j = resp.get_json()
     assert 'doc_type' in j
     assert j['doc_type'] == 'W-2'
+
+
+def test_static_assets_etag_and_compression():
+    client = app.test_client()
+    resp = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert resp.status_code == 200
+    assert resp.headers['Content-Encoding'] in ('gzip', 'br')
+    etag = resp.headers['ETag']
+    resp = client.get('/app.js', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+    # identity representation has its own ETag
+    resp = client.get('/app.js', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert b'upload-form' in resp.data
@@ -0,0 +1,18 @@
+import subprocess
+import sys
+
+from benchmarks.imports import ENTRY_MODULES, ROOT, import_profile
+
+
+def test_entry_points_do_not_import_heavy_libraries():
+    for module in ENTRY_MODULES:
+        seconds, heavy = import_profile(module)
+        assert seconds > 0, module
+        assert heavy == [], f'{module} imports {heavy} at module level'
+
+
+def test_batch_entry_point_skips_multiprocessing_and_http():
+    probe = ('import sys, pipeline, storage; '
+             'print(sorted(m for m in ("multiprocessing", "http.client", "ssl", "decimal") if m in sys.modules))')
+    out = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import threading
+
+from jobqueue import DEAD, DONE, QUEUED, JobQueue, Worker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lease_expiry_returns_job_to_queue(tmp_path):
+    clock = Clock()
+    q = JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=30, clock=clock)
+    job_id = q.enqueue({'n': 1})
+    crashed = q.claim('worker-a')
+    assert crashed.id == job_id
+    assert q.claim('worker-b') is None
+    # worker-a dies without heartbeating; after the lease runs out another worker gets the job
+    clock.now += 31
+    job = q.claim('worker-b')
+    assert job.id == job_id and job.attempts == 2
+    # the crashed worker's late ack is rejected
+    assert not q.complete(crashed, {'stale': True})
+    assert q.complete(job, {'ok': True})
+    assert q.get(job_id)['status'] == DONE
+    assert q.get(job_id)['result'] == {'ok': True}
+
+
+def test_failures_back_off_then_dead_letter(tmp_path):
+    clock = Clock()
+    q = JobQueue(str(tmp_path / 'jobs.db'), max_attempts=2, backoff_base=10, clock=clock)
+    job_id = q.enqueue({'n': 1})
+    assert q.fail(q.claim('w'), 'boom') == QUEUED
+    # not ready until the backoff has passed
+    assert q.claim('w') is None
+    clock.now += 10
+    assert q.fail(q.claim('w'), 'boom again') == DEAD
+    assert [d['id'] for d in q.dead_letters()] == [job_id]
+    assert q.stats()[DEAD] == 1
+    assert q.retry_dead(job_id)
+    assert q.claim('w').attempts == 1
+
+
+def test_worker_tells_handler_when_lease_is_lost(tmp_path):
+    clock = Clock()
+    # a database shared between hosts uses a rollback journal instead of WAL
+    q = JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=0.3, clock=clock, journal_mode='DELETE')
+    assert q._conn().execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    job_id = q.enqueue({'n': 1})
+    told = []
+
+    def handler(payload, job):
+        # the lease runs out and another worker reclaims the job while this one is still busy
+        clock.now += 1
+        assert q.claim('worker-b').id == job_id
+        told.append(job.lost.wait(5))
+        return 'stale'
+
+    assert Worker(q, handler, worker_id='worker-a', pass_job=True).run_once() is None
+    assert told == [True]
+    assert q.get(job_id)['lease_owner'] == 'worker-b'
+
+
+def test_workers_drain_queue_concurrently(tmp_path):
+    q = JobQueue(str(tmp_path / 'jobs.db'))
+    for n in range(40):
+        q.enqueue({'n': n})
+    seen = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        with lock:
+            seen.append(payload['n'])
+        return payload['n']
+
+    threads = [threading.Thread(target=Worker(JobQueue(q.path), handler).run, kwargs={'idle_exit': True})
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(seen) == list(range(40))
+    assert q.stats()[DONE] == 40
+
+
+def test_worker_process_runs_pipeline_bundle(tmp_path):
+    db = str(tmp_path / 'jobs.db')
+    sample = os.path.join(ROOT, 'samples', 'sample_w2.txt')
+    subprocess.run([sys.executable, 'jobqueue.py', 'enqueue', db, str(tmp_path / 'out'), sample],
+                   cwd=ROOT, check=True, capture_output=True)
+    out = subprocess.run([sys.executable, 'jobqueue.py', 'work', db, '--idle-exit'],
+                         cwd=ROOT, check=True, capture_output=True, text=True)
+    assert 'processed 1 jobs' in out.stdout
+    result = JobQueue(db).get(1)['result']
+    assert result['documents'] == 1
+    assert result['aggregated_fields']['wages'] > 0
@@ -0,0 +1,19 @@
+from benchmarks.corpus import generate_corpus
+from benchmarks.loadtest import InProcessClient, percentile, run_load, stage_totals
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0 and percentile(samples, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0 and percentile([], 50) is None
+
+
+def test_in_process_run_reports_latency_and_stages(tmp_path):
+    corpus = generate_corpus(str(tmp_path), docs=2, kinds=('txt',))['txt']
+    report = run_load(InProcessClient(), corpus, iterations=4, concurrency=2, files_per_upload=1)
+    assert report['completed'] == 4 and report['failures'] == 0
+    upload = report['endpoints']['upload']
+    assert upload['status_codes'] == {'200': 4} and upload['error_rate'] == 0.0
+    assert upload['latency_ms']['p50'] <= upload['latency_ms']['p99']
+    assert report['stages'] and all(s['count'] > 0 for s in report['stages'].values())
+    assert stage_totals('rosy_stage_duration_seconds_sum{stage="x"} 1.5') == {'x': {'sum': 1.5, 'count': 0.0}}
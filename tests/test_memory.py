@@ -0,0 +1,20 @@
+import time
+
+from benchmarks.memory import BUDGETS, MB, check_budgets, measure, run_memory
+
+
+def test_measure_reports_transient_peak_and_its_site():
+    def spike():
+        big = bytearray(4 * MB)
+        time.sleep(0.05)
+        return len(big)
+    result = measure(spike)
+    assert result['peak_bytes'] >= 4 * MB and result['retained_bytes'] < MB
+    failures = check_budgets({'spike': result}, {'spike': MB})
+    assert len(failures) == 1 and 'test_memory.py' in failures[0]
+
+
+def test_every_stage_stays_within_its_memory_budget(tmp_path):
+    results = run_memory(top=5, work_dir=str(tmp_path))
+    assert set(BUDGETS) - set(results) <= {'ocr_preprocess[scan]'}
+    assert check_budgets(results) == []
@@ -0,0 +1,41 @@
+import os
+import pytest
+import metrics
+from backend import app
+
+
+def test_stage_timer_counts_errors():
+    with metrics.stage('unit_test_stage'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.stage('unit_test_stage'):
+            raise ValueError('boom')
+    stats = metrics.STAGE_SECONDS.stats()[(('stage', 'unit_test_stage'),)]
+    assert stats['count'] == 2
+    assert metrics.ERRORS.value(component='unit_test_stage') == 1
+    assert 'unit_test_stage' in metrics.format_summary()
+
+
+def test_metrics_endpoint_reports_pipeline_stages(tmp_path):
+    client = app.test_client()
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        resp = client.post('/upload', data={'files': (f, 'sample_w2.txt')}, content_type='multipart/form-data')
+    assert resp.status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'rosy_stage_duration_seconds_count{stage="extract"}' in text
+    assert 'rosy_documents_total{doc_type="W-2"}' in text
+    assert 'rosy_ingest_backend_duration_seconds_bucket{backend="text",le="+Inf"}' in text
+    assert 'rosy_http_request_duration_seconds' in text
+
+
+def test_missing_pymupdf_is_not_counted_as_an_error(tmp_path, monkeypatch):
+    import sys
+    from benchmarks.corpus import write_text_pdf
+    from pdf_reader import extract_pages_from_pdf
+    path = write_text_pdf(str(tmp_path / 'w2.pdf'), ['Form W-2 Wage and Tax Statement'])
+    # a None entry makes `import fitz` raise ImportError
+    monkeypatch.setitem(sys.modules, 'fitz', None)
+    before = metrics.ERRORS.value(component='pymupdf')
+    assert 'W-2' in extract_pages_from_pdf(path)[0]
+    assert metrics.ERRORS.value(component='pymupdf') == before
@@ -0,0 +1,72 @@
+from PIL import Image
+
+import ocr_words
+import pipeline
+import roi_ocr
+from ocr_words import Word, adaptive_ocr, field_confidence
+
+W2_LINES = ['Form W-2 Wage and Tax Statement', 'Employer Identification Number (EIN): 12-3456789',
+            'Employee SSN: 123-45-6789', 'Box 1: Wages, tips, other compensation $52,000.00',
+            'Box 2: Federal income tax withheld $6,100.00']
+
+
+def _words(lines, conf=95.0, weak=None):
+    """Words laid out 40px per line; words of the `weak` line number get confidence 30."""
+    out = []
+    for n, line in enumerate(lines):
+        for i, text in enumerate(line.split()):
+            out.append(Word(text, 30.0 if n == weak else conf, (10 + 60 * i, 10 + 40 * n, 60 + 60 * i, 40 + 40 * n),
+                            (1, 1, n + 1)))
+    return out
+
+
+class FakeReader:
+    """First call: the page (line `weak` poorly read); later calls: a clean re-read of that line."""
+
+    def __init__(self, lines, weak=None):
+        self.lines = lines
+        self.weak = weak
+        self.calls = []
+
+    def __call__(self, img, psm=None):
+        self.calls.append((img.size, psm))
+        if len(self.calls) == 1:
+            return _words(self.lines, weak=self.weak)
+        return [Word(w.text, 88.0, w.box, (1, 1, 1)) for w in _words([self.lines[self.weak]])]
+
+
+def test_clean_pages_take_one_pass_and_weak_lines_are_reread_upscaled():
+    img = Image.new('L', (600, 240), 255)
+    clean = FakeReader(W2_LINES)
+    page = adaptive_ocr(img, read=clean)
+    assert len(clean.calls) == 1 and page.rereads == 0
+    assert page.text.splitlines() == W2_LINES
+
+    reader = FakeReader(W2_LINES, weak=3)
+    page = adaptive_ocr(img, read=reader)
+    assert page.rereads == 1 and len(reader.calls) == 2
+    (w, h), psm = reader.calls[1]
+    # only the weak line, at twice the resolution, as a single text line
+    assert psm == 7 and h < 2 * 60 and w > 2 * 300
+    assert page.text.splitlines() == W2_LINES
+    assert min(x.conf for x in page.words) == 88.0
+
+
+def test_field_confidence_comes_from_the_words_of_each_value():
+    words = _words(W2_LINES, weak=3)
+    conf = field_confidence({'wages': '52,000.00', 'ein': '12-3456789', 'employer': 'Wage and Tax',
+                             'derived': '99.99'}, words)
+    assert conf['wages'] == 0.3 and conf['ein'] == 0.95 and conf['employer'] == 0.95
+    # not among the words: the page's mean confidence
+    assert 0.3 < conf['derived'] < 0.95
+
+
+def test_pipeline_reports_ocr_confidence_for_image_fields(tmp_path, monkeypatch):
+    path = tmp_path / 'w2.png'
+    Image.new('L', (600, 240), 255).save(path)
+    monkeypatch.setattr(roi_ocr, 'LAYOUT_OCR', False)
+    monkeypatch.setattr(ocr_words, 'read_words', FakeReader(W2_LINES, weak=1))
+    records, text = pipeline._parse_one(str(path))
+    assert records[0].doc_type == 'W-2' and records[0].fields['wages'] == '52,000.00'
+    assert records[0].field_confidence['wages'] == 0.95
+    assert records[0].field_confidence['ein'] == 0.88
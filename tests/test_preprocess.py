@@ -0,0 +1,42 @@
+import random
+import numpy as np
+from benchmarks.corpus import render_scan, w2_text
+from PIL import Image
+from preprocess import estimate_skew, otsu_threshold, prepare_for_ocr, resample_to_dpi, source_dpi
+
+
+def test_otsu_threshold_separates_two_levels():
+    arr = np.array([30] * 100 + [220] * 100, dtype=np.uint8)
+    assert 30 <= otsu_threshold(arr) < 220
+
+
+def test_prepare_for_ocr_resamples_binarizes_and_deskews():
+    text = w2_text(random.Random(1))
+    img = render_scan(text, dpi=400, seed=1, skew_degrees=3.0)
+    out = prepare_for_ocr(img, target_dpi=200)
+    # letter width at 200 dpi
+    assert abs(out.width - 1700) <= 2
+    arr = np.asarray(out)
+    assert set(np.unique(arr)) <= {0, 255}
+    # after deskew the residual skew is close to zero
+    assert abs(estimate_skew(arr)) <= 0.5
+
+
+def test_estimate_skew_detects_rotation():
+    img = render_scan(w2_text(random.Random(2)), dpi=150, seed=2, skew_degrees=-2.0)
+    arr = np.where(np.asarray(img) > 128, 255, 0).astype(np.uint8)
+    assert abs(estimate_skew(arr) - 2.0) <= 0.5
+
+
+def test_camera_photo_with_72_dpi_metadata_is_not_upscaled():
+    # a 4000x3000 phone photo tagged 72 dpi would be a 42x56 inch page
+    img = Image.new('L', (4000, 3000), 255)
+    img.info['dpi'] = (72, 72)
+    assert 300 < source_dpi(img) < 400
+    out = resample_to_dpi(img, 300)
+    assert out.width <= 4000 and out.height <= 3000
+    # honest metadata is still used
+    scan = Image.new('L', (1275, 1650), 255)
+    scan.info['dpi'] = (150, 150)
+    assert source_dpi(scan) == 150
+    assert resample_to_dpi(scan, 300).size == (2550, 3300)
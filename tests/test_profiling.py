@@ -0,0 +1,35 @@
+import io
+import json
+import os
+from backend import app
+
+
+def test_profile_written_only_with_valid_token(tmp_path, monkeypatch):
+    monkeypatch.setenv('ROSY_PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('ROSY_PROFILE_TOKEN', 'secret')
+    monkeypatch.setenv('ROSY_PROFILE_MAX_FILES', '1')
+    monkeypatch.delenv('ROSY_PROFILE', raising=False)
+    client = app.test_client()
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        content = f.read()
+
+    def upload(headers):
+        data = {'files': (io.BytesIO(content), 'sample_w2.txt')}
+        return client.post('/upload', data=data, content_type='multipart/form-data', headers=headers)
+
+    resp = upload({'X-Rosy-Profile': 'wrong'})
+    assert 'X-Profile-Id' not in resp.headers
+    assert os.listdir(tmp_path) == []
+
+    for rid in ('first', 'second'):
+        resp = upload({'X-Rosy-Profile': 'secret', 'X-Request-Id': rid})
+        assert resp.status_code == 200
+        assert resp.headers['X-Profile-Id'] == rid
+    # bounded directory keeps only the newest profile and its sidecar
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    assert files[0].endswith('_second.json') and files[1].endswith('_second.prof')
+    meta = json.loads((tmp_path / files[0]).read_text())
+    assert meta['request_id'] == 'second'
+    assert 'extract' in meta['stages'] and 'ingest' in meta['stages']
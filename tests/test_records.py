@@ -0,0 +1,32 @@
+from parsing.money import parse_cents
+from pipeline import aggregate_per_file
+from records import Aggregate, DocumentRecord
+
+
+def test_parse_cents_normalizes_amount_formats():
+    assert parse_cents('$52,000.00') == 5200000
+    assert parse_cents(' 1,234 ') == 123400
+    assert parse_cents('(45.10)') == -4510
+    assert parse_cents(0.1) == 10
+    assert parse_cents(7) == 700
+    assert parse_cents('12.345') == 1235
+    assert parse_cents('n/a') is None
+    assert parse_cents(None) is None
+
+
+def test_record_serializes_to_result_shape():
+    fields = {'wages': '$1,000.10', 'federal_income_tax_withheld': '100.01', 'ein': '12-3456789'}
+    r = DocumentRecord('a.txt', 'W-2', 0.8, fields, [], {'wages': 0.9})
+    assert (r.income_cents, r.withholding_cents) == (100010, 10001)
+    assert r.to_dict() == {'path': 'a.txt', 'doc_type': 'W-2', 'confidence': 0.8, 'fields': fields,
+                           'field_confidence': {'wages': 0.9}, 'validation_issues': []}
+    assert not hasattr(r, '__dict__')
+    assert DocumentRecord.from_dict(r.to_dict()).to_dict() == r.to_dict()
+
+
+def test_aggregate_has_no_float_drift():
+    per_file = [{'fields': {'amount': '0.10'}} for _ in range(1000)]
+    agg_fields, withheld = aggregate_per_file(per_file)
+    assert agg_fields == {'wages': 100.0}
+    assert withheld == 0.0
+    assert Aggregate(1, 0).fields() == {'wages': 0.01}
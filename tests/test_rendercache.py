@@ -0,0 +1,49 @@
+import os
+import shutil
+
+import metrics
+from forms import generate_1040_draft
+from rendercache import RENDER_CACHE, RenderCache, render_key, template_version
+
+FIELDS = {'first_name': 'John', 'last_name': 'Doe', 'ssn': '123-45-6789', 'ein': '12-3456789',
+          'wages': 75000, 'withholding': 8500}
+TAX = {'agi': 75000, 'taxable_income': 61150, 'gross_tax': 9739, 'withholding': 8500, 'tax_due': 1239}
+
+
+def test_unchanged_drafts_are_served_from_cache(tmp_path):
+    RENDER_CACHE.clear()
+    metrics.REGISTRY.reset()
+    first = generate_1040_draft(FIELDS, TAX, str(tmp_path / 'a'))
+    second = generate_1040_draft(dict(FIELDS), dict(TAX), str(tmp_path / 'b'))
+    assert first.endswith('draft_1040_filled.pdf') and os.path.basename(second) == os.path.basename(first)
+    with open(first, 'rb') as f1, open(second, 'rb') as f2:
+        assert f1.read() == f2.read()
+    assert metrics.CACHE_REQUESTS.value(cache='render', result='hit') == 1
+
+    generate_1040_draft({**FIELDS, 'wages': 76000}, TAX, str(tmp_path / 'c'))
+    assert metrics.CACHE_REQUESTS.value(cache='render', result='miss') == 2
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = RenderCache(max_entries=2, max_bytes=10)
+    cache.put('a', 'a.pdf', b'1234')
+    cache.put('b', 'b.pdf', b'1234')
+    assert cache.get('a') == ('a.pdf', b'1234')  # 'b' is now least recently used
+    cache.put('c', 'c.pdf', b'12')
+    assert cache.get('b') is None and cache.get('a') and cache.get('c')
+    cache.put('d', 'd.pdf', b'123456789')
+    assert cache.stats()['entries'] == 1 and cache.get('d')
+    cache.put('huge', 'h.pdf', b'x' * 11)
+    assert cache.get('huge') is None and cache.stats()['evictions'] == 3
+
+
+def test_key_covers_field_map_template_and_renderer(tmp_path):
+    template = tmp_path / 't.pdf'
+    template.write_bytes(b'%PDF-1 one')
+    v1 = template_version(str(template))
+    assert render_key({'a': '1', 'b': '2'}, v1, '1') == render_key({'b': '2', 'a': '1'}, v1, '1')
+    assert render_key({'a': '1'}, v1, '1') != render_key({'a': '1'}, v1, '2')
+    shutil.copy(str(template), str(tmp_path / 'copy.pdf'))
+    template.write_bytes(b'%PDF-1 two, longer')
+    assert template_version(str(template)) != v1
+    assert template_version(str(tmp_path / 'copy.pdf')) == v1
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import resultstore
+from pipeline import run_pipeline_on_paths, run_pipeline_on_storage
+from resultstore import ResultsStore, file_hash
+
+W2 = ('Form W-2 Wage and Tax Statement\nEmployer Identification Number (EIN): {ein}\n'
+      'Employee SSN: {ssn}\nBox 1: Wages, tips, other compensation ${wages}\n')
+
+
+def _write(tmp_path, name, **values):
+    path = tmp_path / name
+    path.write_text(W2.format(**values), encoding='utf-8')
+    return str(path)
+
+
+def test_store_and_query_runs(tmp_path):
+    a = _write(tmp_path, 'a.txt', ein='12-3456789', ssn='123-45-6789', wages='50,000.00')
+    b = _write(tmp_path, 'b.txt', ein='98-7654321', ssn='123-45-6789', wages='10,000.00')
+    out = str(tmp_path / 'out')
+    runs = [run_pipeline_on_paths([a], out), run_pipeline_on_paths([a, b], out)]
+
+    store = ResultsStore(str(tmp_path / 'results.db'), key=b'test-key')
+    first, second = store.save_runs(runs, tax_year=2024)
+
+    docs = store.find_documents(ein='12 3456789', tax_year=2024)
+    assert len(docs) == 2
+    assert docs[0]['fields']['wages'] == '50,000.00'
+    # SSNs are masked in stored values and only indexed by keyed hash
+    assert docs[0]['fields']['employee_ssn'] == 'XXX-XX-6789'
+    assert docs[0]['ssn_hash'] != '123456789' and len(docs[0]['ssn_hash']) == 64
+
+    assert [r['id'] for r in store.returns_for_identifier(ein='98-7654321')] == [second]
+    assert [r['id'] for r in store.returns_for_identifier(ssn='123-45-6789')] == [first, second]
+    assert store.seen_content(file_hash(a))
+    assert len(store.find_documents(doc_type='W-2')) == 3
+
+    ret = store.get_return(second)
+    assert ret['aggregated_fields'] == {'wages': 60000.0}
+    assert ret['tax_estimate']['agi'] == 60000.0
+    assert sorted(os.path.basename(d['path']) for d in ret['documents']) == ['a.txt', 'b.txt']
+
+
+def test_identifier_hash_depends_on_key(tmp_path):
+    one = ResultsStore(str(tmp_path / 'one.db'))
+    two = ResultsStore(str(tmp_path / 'two.db'))
+    assert os.path.exists(str(tmp_path / 'one.db') + '.key')
+    assert one.hash_identifier('12-3456789') == one.hash_identifier('123456789')
+    assert one.hash_identifier('12-3456789') != two.hash_identifier('12-3456789')
+
+
+def test_key_file_race_uses_the_winners_key(tmp_path, monkeypatch):
+    db = str(tmp_path / 'r.db')
+    read_key = resultstore._read_key
+    calls = []
+
+    def racing_read(path):
+        calls.append(path)
+        if len(calls) == 1:
+            # another process creates the key between our read and our create
+            with open(path, 'wb') as f:
+                f.write(b'winner')
+            raise FileNotFoundError(path)
+        return read_key(path)
+
+    monkeypatch.setattr(resultstore, '_read_key', racing_read)
+    assert resultstore._load_key(db) == b'winner'
+
+
+def test_storage_documents_are_stored_with_their_content_hash(tmp_path):
+    from storage import LocalStorage
+    root = tmp_path / 'bucket'
+    root.mkdir()
+    data = W2.format(ein='12-3456789', ssn='123-45-6789', wages='50,000.00').encode('utf-8')
+    (root / 'w2.txt').write_bytes(data)
+    res = run_pipeline_on_storage(LocalStorage(str(root)), ['w2.txt'], str(tmp_path / 'out'), content_hashes=True)
+
+    store = ResultsStore(str(tmp_path / 'results.db'), key=b'test-key')
+    store.save_run(res)
+    # the per-file path is a storage key, not a local file: the hash comes from the bytes the pipeline read
+    assert store.find_documents()[0]['content_hash'] == hashlib.sha256(data).hexdigest()
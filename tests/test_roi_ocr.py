@@ -0,0 +1,65 @@
+from PIL import Image, ImageDraw
+
+import roi_ocr
+from benchmarks.corpus import render_form_scan
+from parsing.layouts import LAYOUTS
+
+W2_FIELDS = {'employee_ssn': '123-45-6789', 'ein': '12-3456789', 'wages': '52,000.00',
+             'federal_income_tax_withheld': '6,100.00'}
+
+
+class FakeOCR:
+    """Returns canned text: the form title for the full-page pass, then one answer per region."""
+
+    def __init__(self, title, regions):
+        self.title = title
+        self.regions = list(regions)
+        self.crops = []
+
+    def __call__(self, img, psm=None):
+        if psm is None:
+            return self.title
+        self.crops.append(img.size)
+        return self.regions.pop(0)
+
+
+def test_layout_ocr_reads_only_field_regions():
+    img = render_form_scan('W-2', W2_FIELDS, dpi=150)
+    ocr = FakeOCR('Form W-2 Wage and Tax Statement',
+                  ['a Employee SSN 123-45-6789', 'b EIN 12-3456789', '1 Wages $52,000.00', '2 Federal 6,100.00'])
+    out = roi_ocr.extract_with_layout(img, ocr)
+    assert out['doc_type'] == 'W-2'
+    assert out['fields'] == W2_FIELDS
+    assert out['validation_issues'] == []
+    # four region crops at OCR resolution; the wages box is a quarter of an 8" form at 300 dpi, plus padding
+    assert len(ocr.crops) == len(LAYOUTS['W-2'].fields)
+    wages_w, wages_h = ocr.crops[2]
+    assert abs(wages_w - (0.25 + 2 * roi_ocr._REGION_PAD) * 8 * 300) < 40
+    assert wages_h < 300
+
+
+def test_layout_ocr_falls_back_when_unaligned_or_unparsed():
+    # a page whose content box isn't a W-2 frame
+    img = Image.new('L', (1275, 1650), 255)
+    ImageDraw.Draw(img).rectangle((200, 200, 600, 1400), outline=0, width=3)
+    assert roi_ocr.extract_with_layout(img, FakeOCR('Form W-2', [])) is None
+
+    # aligned, but box 1 doesn't hold a readable amount
+    img = render_form_scan('W-2', W2_FIELDS, dpi=150)
+    ocr = FakeOCR('Form W-2', ['123-45-6789', '12-3456789', 'Wages', '6,100.00'])
+    assert roi_ocr.extract_with_layout(img, ocr) is None
+
+    # unknown page type never reaches region OCR
+    assert roi_ocr.extract_with_layout(img, FakeOCR('Schedule K-1', [])) is None
+
+
+def test_1099_layout_is_used_only_for_the_nec_variant():
+    nec = {'payer_ein': '12-3456789', 'recipient_ssn': '123-45-6789', 'amount': '8,500.00'}
+    img = render_form_scan('1099', nec, dpi=150)
+    ocr = FakeOCR('Form 1099-NEC Nonemployee Compensation', ['12-3456789', '123-45-6789', '1 $8,500.00'])
+    assert roi_ocr.extract_with_layout(img, ocr)['fields'] == nec
+
+    # a 1099-INT has interest income where the NEC has box 1: full-page extraction instead
+    ocr = FakeOCR('Form 1099-INT Interest Income', ['12-3456789', '123-45-6789', '1 $8,500.00'])
+    assert roi_ocr.extract_with_layout(img, ocr) is None
+    assert ocr.crops == []
@@ -0,0 +1,47 @@
+import io
+import os
+from backend import app
+from sessions import ReviewSession, SessionStore
+
+
+def test_session_incremental_update():
+    per_file = [
+        {'path': 'a.txt', 'fields': {'wages': '50,000.00', 'federal_income_tax_withheld': '5,000.00'}},
+        {'path': 'b.txt', 'fields': {'amount': '$1,000.00'}},
+    ]
+    s = ReviewSession(per_file)
+    assert s.aggregated_fields() == {'wages': 51000.0, 'withholding': 5000.0}
+    first = s.tax_estimate()
+    # editing a non-income field keeps the cached tax estimate
+    s.update_fields(0, {'ein': '12-3456789'})
+    assert s.tax_estimate() is first
+    s.update_fields(1, {'amount': '2,000.00'})
+    assert s.aggregated_fields()['wages'] == 52000.0
+    assert s.tax_estimate()['agi'] == 52000.0
+    # the caller's per_file is not mutated
+    assert per_file[1]['fields']['amount'] == '$1,000.00'
+
+
+def test_session_store_ttl():
+    store = SessionStore(ttl_seconds=0)
+    sid = store.create([])
+    assert store.get(sid) is None
+
+
+def test_patch_and_finalize_by_session():
+    client = app.test_client()
+    sample = os.path.join(os.path.dirname(__file__), '..', 'samples', 'sample_w2.txt')
+    with open(sample, 'rb') as f:
+        data = {'files': (io.BytesIO(f.read()), 'sample_w2.txt')}
+        resp = client.post('/upload', data=data, content_type='multipart/form-data')
+    sid = resp.get_json()['session_id']
+
+    resp = client.patch(f'/sessions/{sid}', json={'edits': [{'index': 0, 'fields': {'wages': '60,000.00'}}]})
+    assert resp.status_code == 200
+    assert resp.get_json()['aggregated_fields']['wages'] == 60000.0
+
+    resp = client.post('/finalize', json={'session_id': sid})
+    assert resp.status_code == 200
+
+    resp = client.post('/finalize', json={'session_id': 'missing'})
+    assert resp.status_code == 404
@@ -0,0 +1,48 @@
+import pipeline
+from benchmarks.corpus import generate_corpus, generate_documents
+from parsing.splitter import group_pages, merge_copies
+
+
+def test_group_pages_by_header_and_type():
+    pages = [
+        'Form W-2\nBox 1: Wages $10,000.00',
+        'Notice to employee: instructions only',
+        'Form W-2\nBox 1: Wages $20,000.00',
+        'Form 1099-NEC\nPayer and recipient\nBox 1: Nonemployee compensation $500.00',
+    ]
+    groups = group_pages(pages)
+    assert [(g['doc_type'], g['start'], g['end']) for g in groups] == [('W-2', 0, 1), ('W-2', 2, 2), ('1099', 3, 3)]
+
+
+def test_merge_copies_collapses_identical_consecutive_forms():
+    copy = {'wages': '1.00', 'employee_ssn': '123-45-6789', 'ein': '12-3456789'}
+    docs = [
+        {'doc_type': 'W-2', 'fields': dict(copy), 'validation_issues': [], 'start': 0, 'end': 0},
+        {'doc_type': 'W-2', 'fields': dict(copy), 'validation_issues': [], 'start': 1, 'end': 1},
+        {'doc_type': 'W-2', 'fields': dict(copy, wages='2.00'), 'validation_issues': [], 'start': 2, 'end': 2},
+    ]
+    merged = merge_copies(docs)
+    assert [(d['start'], d['end']) for d in merged] == [(0, 1), (2, 2)]
+    assert merged[0]['validation_issues'] == ['pages 2-2 repeat this document and were counted once']
+
+
+def test_merge_copies_keeps_lookalike_forms_without_an_identifier():
+    # two employees' W-2s from one employer with the same wages, SSNs masked: the shared EIN proves nothing
+    fields = {'wages': '1.00', 'employee_ssn': 'XXX-XX-6789', 'ein': '12-3456789'}
+    docs = [{'doc_type': 'W-2', 'fields': dict(fields), 'validation_issues': [], 'start': i, 'end': i}
+            for i in range(2)]
+    assert len(merge_copies(docs)) == 2
+
+
+def test_bulk_pdf_is_split_and_aggregated_per_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'PARALLEL_MIN_DOCUMENTS', 2)
+    corpus = generate_corpus(str(tmp_path / 'in'), docs=1, pages=6, kinds=('pdf',))
+    res = pipeline.run_pipeline_on_paths(corpus['pdf'], str(tmp_path / 'out'))
+    assert len(res['per_file']) == 6
+    assert [r['pages'] for r in res['per_file']] == [[i, i] for i in range(1, 7)]
+
+    expected = 0.0
+    for text in generate_documents(1, pages=6)[0]['pages']:
+        line = [l for l in text.splitlines() if l.startswith('Box 1:')][0]
+        expected += float(line.split('$')[1].replace(',', ''))
+    assert res['aggregated_fields']['wages'] == round(expected, 2)
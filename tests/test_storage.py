@@ -0,0 +1,139 @@
+import datetime
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+from pipeline import run_pipeline_on_storage
+from storage import LocalStorage, S3Storage, prefetch, sigv4_headers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACCESS, SECRET = 'test-access', 'test-secret'
+
+
+class FakeS3(BaseHTTPRequestHandler):
+    """In-memory S3 stand-in: path-style GET/PUT objects, ListObjectsV2 (2 keys per page), SigV4 checked."""
+    objects = {}
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _authorized(self, body=b''):
+        url = f'http://{self.headers["Host"]}{self.path}'
+        now = datetime.datetime.strptime(self.headers['x-amz-date'], '%Y%m%dT%H%M%SZ')
+        expected = sigv4_headers(self.command, url, access_key=ACCESS, secret_key=SECRET, region='us-east-1',
+                                 payload_hash=self.headers['x-amz-content-sha256'], now=now)
+        if self.headers.get('Authorization') != expected['Authorization']:
+            self.send_response(403)
+            self.end_headers()
+            return False
+        return True
+
+    def _reply(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self._authorized(body):
+            self.objects[urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)] = body
+            self._reply(b'')
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        if query.get('list-type') == '2':
+            bucket = parts.path.rstrip('/')
+            keys = sorted(k[len(bucket) + 1:] for k in self.objects
+                          if k.startswith(bucket + '/' + query.get('prefix', '')))
+            start = int(query.get('continuation-token', 0))
+            page = keys[start:start + 2]
+            more = start + 2 < len(keys)
+            xml = ('<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                   + ''.join(f'<Contents><Key>{escape(k)}</Key></Contents>' for k in page)
+                   + f'<IsTruncated>{"true" if more else "false"}</IsTruncated>'
+                   + (f'<NextContinuationToken>{start + 2}</NextContinuationToken>' if more else '')
+                   + '</ListBucketResult>')
+            return self._reply(xml.encode('utf-8'))
+        time.sleep(self.delay)
+        body = self.objects.get(urllib.parse.unquote(parts.path))
+        self._reply(body if body is not None else b'', 200 if body is not None else 404)
+
+
+def _serve():
+    FakeS3.objects = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeS3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    s3 = S3Storage('docs', endpoint=f'http://127.0.0.1:{server.server_address[1]}', prefix='client-1',
+                   access_key=ACCESS, secret_key=SECRET)
+    return server, s3
+
+
+def test_s3_storage_round_trip_and_pipeline(tmp_path):
+    server, s3 = _serve()
+    try:
+        with open(os.path.join(ROOT, 'samples', 'sample_w2.txt'), 'rb') as f:
+            w2 = f.read()
+        for i in range(3):
+            s3.put_bytes(f'2024/w2 {i}.txt', w2)
+        keys = s3.list('2024/')
+        assert keys == ['2024/w2 0.txt', '2024/w2 1.txt', '2024/w2 2.txt']
+        assert s3.get_bytes(keys[0]) == w2
+        assert FakeS3.objects['/docs/client-1/2024/w2 0.txt'] == w2
+
+        res = run_pipeline_on_storage(s3, keys, str(tmp_path / 'out'))
+        assert [r['path'] for r in res['per_file']] == keys
+        assert {r['doc_type'] for r in res['per_file']} == {'W-2'}
+        assert res['aggregated_fields']['wages'] > 0
+    finally:
+        server.shutdown()
+
+
+def test_s3_rejects_bad_signature():
+    server, s3 = _serve()
+    try:
+        s3.secret_key = 'wrong'
+        try:
+            s3.get_bytes('missing.txt')
+            assert False, 'expected a StorageError'
+        except RuntimeError as e:
+            assert '403' in str(e)
+    finally:
+        server.shutdown()
+
+
+def test_prefetch_overlaps_downloads_in_order(tmp_path):
+    server, s3 = _serve()
+    try:
+        keys = [f'doc{i}.txt' for i in range(8)]
+        for k in keys:
+            s3.put_bytes(k, k.encode('utf-8'))
+        FakeS3.delay = 0.1
+        start = time.perf_counter()
+        got = [(k, d) for k, d in prefetch(s3, keys, max_in_flight=4)]
+        elapsed = time.perf_counter() - start
+        assert got == [(k, k.encode('utf-8')) for k in keys]
+        # 8 downloads of 0.1s each, 4 at a time
+        assert elapsed < 0.6
+    finally:
+        FakeS3.delay = 0.0
+        server.shutdown()
+
+
+def test_local_storage_stays_inside_root(tmp_path):
+    store = LocalStorage(str(tmp_path))
+    store.put_bytes('a/b.txt', b'x')
+    assert store.list() == ['a/b.txt']
+    assert store.get_bytes('a/b.txt') == b'x'
+    try:
+        store.get_bytes('../outside.txt')
+        assert False, 'expected a StorageError'
+    except RuntimeError:
+        pass
@@ -0,0 +1,73 @@
+import os
+import shutil
+import time
+
+import pytest
+
+import pipeline
+import timebudget
+
+HERE = os.path.dirname(__file__)
+SAMPLE_W2 = os.path.join(HERE, '..', 'samples', 'sample_w2.txt')
+
+
+class _SlowPool:
+    """Stands in for timebudget.POOL: files named slow*.txt overrun whatever budget they are given."""
+
+    def __init__(self):
+        self.calls = []
+
+    def run(self, fn, args=(), timeout=None):
+        self.calls.append(os.path.basename(args[0]))
+        if os.path.basename(args[0]).startswith('slow'):
+            time.sleep(timeout)
+            raise timebudget.BudgetExceeded(timeout)
+        return fn(*args)
+
+
+def _bundle(tmp_path, names):
+    paths = []
+    for name in names:
+        p = tmp_path / name
+        shutil.copy(SAMPLE_W2, p)
+        paths.append(str(p))
+    return paths
+
+
+def test_pool_terminates_overrunning_call():
+    pool = timebudget.WorkerPool(max_idle=1)
+    try:
+        with pytest.raises(timebudget.BudgetExceeded):
+            pool.run(time.sleep, (30,), timeout=0.5)
+        # the pool recovers with a fresh worker, in another process
+        assert pool.run(os.getpid, timeout=30) != os.getpid()
+    finally:
+        pool.close()
+
+
+def test_overrunning_file_times_out_and_is_not_aggregated(tmp_path, monkeypatch):
+    monkeypatch.setattr(timebudget, 'POOL', _SlowPool())
+    paths = _bundle(tmp_path, ['w2.txt', 'slow.txt'])
+    out = str(tmp_path / 'out')
+
+    res = pipeline.run_pipeline_on_paths(paths, out, file_timeout=0.1)
+    ok, slow = res['per_file']
+    assert ok.get('status', 'ok') == 'ok' and ok['fields']
+    assert slow['status'] == 'timeout'
+    assert slow['fields'] == {}
+    assert 'per-file time budget' in slow['validation_issues'][0]
+
+    alone = pipeline.run_pipeline_on_paths(paths[:1], out)
+    assert res['aggregated_fields'] == alone['aggregated_fields']
+
+
+def test_request_budget_skips_remaining_files(tmp_path, monkeypatch):
+    pool = _SlowPool()
+    monkeypatch.setattr(timebudget, 'POOL', pool)
+    paths = _bundle(tmp_path, ['slow.txt', 'w2_a.txt', 'w2_b.txt'])
+
+    res = pipeline.run_pipeline_on_paths(paths, str(tmp_path / 'out'), file_timeout=0, request_timeout=0.2)
+    assert [r['status'] for r in res['per_file']] == ['timeout'] * 3
+    assert 'not parsed' in res['per_file'][2]['validation_issues'][0]
+    # the files after the slow one were never sent to a worker
+    assert pool.calls == ['slow.txt']
@@ -0,0 +1,66 @@
+import datetime
+
+from benchmarks.corpus import b_1099_pages, write_1099b_text
+from ingestion import ingest_pages, iter_pages
+from parsing.transactions import TransactionTotals, iter_transactions, summarize_transactions
+
+PAGE = """Form 1099-B Proceeds From Broker and Barter Exchange Transactions
+Short-term transactions for covered tax lots
+APPLE INC                  10.000 01/15/2023 06/20/2024      1,750.00      1,200.00       0.00        550.00
+S&P 500 ETF TRUST
+    3.000    VARIOUS 02/01/24      1,000.00      1,100.50     (100.50)
+Long-term transactions for covered tax lots
+MICROSOFT CORP             5.000 03/01/2020 04/01/2024      2,000.00        500.00        25.00
+Totals  4,750.00  2,800.50
+"""
+
+
+def test_rows_are_typed_and_totalled():
+    totals = TransactionTotals()
+    rows = list(iter_transactions([PAGE], totals))
+    assert [r.description for r in rows] == ['APPLE INC', 'S&P 500 ETF TRUST', 'MICROSOFT CORP']
+    assert rows[0].acquired == datetime.date(2023, 1, 15) and rows[0].quantity == '10.000'
+    assert rows[1].acquired is None and rows[1].sold == datetime.date(2024, 2, 1)
+    assert rows[1].gain_cents == -10050
+    # a third amount that isn't proceeds - basis is a wash sale adjustment
+    assert (rows[2].adjustment_cents, rows[2].gain_cents) == (2500, 152500)
+    assert [r.term for r in rows] == ['short', 'short', 'long']
+    assert totals.to_dict() == {'transactions': 3, 'proceeds': 4750.0, 'cost_basis': 2800.5,
+                                'wash_sale_adjustment': 25.0, 'gain': 1974.5,
+                                'short_term_gain': 449.5, 'long_term_gain': 1525.0}
+
+
+def test_pages_are_consumed_lazily():
+    pulled = []
+
+    def pages():
+        for i, page in enumerate(b_1099_pages(500, seed=3, rows_per_page=40)):
+            pulled.append(i)
+            yield page
+
+    rows = iter_transactions(pages())
+    next(rows)
+    assert pulled == [0]
+    assert summarize_transactions(b_1099_pages(500, seed=3, rows_per_page=40)).count == 500
+
+
+def test_iter_pages_streams_text_statements(tmp_path):
+    path = write_1099b_text(str(tmp_path / 'b.txt'), 300, seed=1, rows_per_page=25)
+    # a tiny chunk size splits pages across reads
+    assert list(iter_pages(path, chunk_size=100)) == ingest_pages(path)
+    assert summarize_transactions(iter_pages(path)).count == 300
+
+
+def test_header_line_is_not_glued_onto_a_described_row():
+    page = ('Short-term transactions for covered tax lots\n'
+            'Description  Quantity  Date acquired  Date sold  Proceeds  Cost basis\n'
+            'APPLE INC  10.000 01/15/2023 06/20/2024  1,750.00  1,200.00\n')
+    assert [r.description for r in iter_transactions([page])] == ['APPLE INC']
+
+
+def test_extract_fields_reports_1099b_totals():
+    from parsing import extract_fields, validate_fields
+    fields = extract_fields(PAGE, '1099')
+    assert (fields['proceeds'], fields['cost_basis'], fields['gain_loss']) == ('4,750.00', '2,800.50', '1,974.50')
+    assert fields['transactions'] == '3'
+    assert validate_fields(fields, '1099') == []
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+
+import metrics
+from watcher import FolderWatcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+W2 = os.path.join(ROOT, 'samples', 'sample_w2.txt')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _watcher(inbox, calls, clock, handler=None):
+    def record(paths, out_dir):
+        calls.append(sorted(os.path.relpath(p, inbox) for p in paths))
+    return FolderWatcher(str(inbox), handler=handler or record, settle_seconds=5, use_inotify=False, clock=clock)
+
+
+def test_settled_folders_run_once_and_survive_restart(tmp_path):
+    inbox = tmp_path / 'inbox'
+    for who in ('alice', 'bob'):
+        (inbox / who).mkdir(parents=True)
+        (inbox / who / 'w2.txt').write_text('page one')
+    (inbox / 'loose.txt').write_text('no taxpayer folder')
+    calls, clock = [], Clock()
+    w = _watcher(inbox, calls, clock)
+    assert w.poll() == []  # just arrived: may still be written
+
+    clock.now += 3
+    (inbox / 'alice' / 'w2.txt').write_text('page one, page two')
+    clock.now += 3
+    assert w.poll() == ['bob']
+    clock.now += 5
+    assert w.poll() == ['alice'] and calls == [['bob/w2.txt'], ['alice/w2.txt']]
+    assert w.poll() == []
+
+    # a new document reruns only its folder, with the whole bundle
+    (inbox / 'bob' / '1099.txt').write_text('interest')
+    w.poll()
+    clock.now += 6
+    assert w.poll() == ['bob'] and calls[-1] == ['bob/1099.txt', 'bob/w2.txt']
+
+    # a restart reads the checkpoint and finds nothing new
+    calls.clear()
+    restarted = _watcher(inbox, calls, clock)
+    restarted.poll()
+    clock.now += 6
+    assert restarted.poll() == [] and calls == []
+
+
+def test_results_are_written_next_to_inputs(tmp_path):
+    inbox = tmp_path / 'inbox'
+    (inbox / 'carol').mkdir(parents=True)
+    shutil.copy(W2, inbox / 'carol' / 'w2.txt')
+    w = FolderWatcher(str(inbox), settle_seconds=0, poll_interval=0.01, use_inotify=False)
+    assert w.run(once=True) == 1
+    with open(inbox / 'carol' / '_rosy' / 'result.json', encoding='utf-8') as f:
+        result = json.load(f)
+    assert result['per_file'][0]['doc_type'] == 'W-2'
+    assert 'XXX-XX-' in json.dumps(result)
+    # outputs in _rosy/ are not inputs
+    assert FolderWatcher(str(inbox), settle_seconds=0, use_inotify=False).run(once=True) == 0
+
+
+def test_failed_bundle_is_not_retried_until_it_changes(tmp_path):
+    inbox = tmp_path / 'inbox'
+    (inbox / 'dave').mkdir(parents=True)
+    (inbox / 'dave' / 'scan.txt').write_text('x')
+    attempts, clock = [], Clock()
+
+    def broken(paths, out_dir):
+        attempts.append(paths)
+        raise ValueError('unreadable')
+
+    w = _watcher(inbox, [], clock, handler=broken)
+    w.poll()
+    clock.now += 6
+    errors = metrics.ERRORS.value(component='watch_bundle')
+    assert w.poll() == ['dave']
+    # counted once, by the stage timer
+    assert metrics.ERRORS.value(component='watch_bundle') == errors + 1
+    assert w.checkpoint.folders['dave']['status'] == 'error'
+    assert (inbox / 'dave' / '_rosy' / 'error.txt').read_text().startswith('ValueError')
+    clock.now += 6
+    assert w.poll() == [] and len(attempts) == 1
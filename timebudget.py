@@ -0,0 +1,158 @@
+"""
+Time budgets for parsing: with a per-file or per-request budget set, each file is parsed in a worker process
+that is terminated when it overruns, so one pathological document (a huge photo, a PDF that sends pdfminer
+down a slow path) can't stall the rest of its bundle.
+
+Workers are long-lived and reused; only a worker that overran is killed and replaced. They are started with
+the forkserver method where available (never forked from a threaded server), and the metrics recorded while
+a worker parses are sent back and merged into this process's registry. Workers are daemonic, so they never
+outlive (or hold up the exit of) the process that started them, and they extract a file's documents serially
+(IN_WORKER) rather than starting a process pool of their own that a terminated worker would orphan.
+
+Configuration (environment): ROSY_FILE_TIMEOUT (seconds per file) and ROSY_REQUEST_TIMEOUT (seconds per
+bundle); 0, the default, runs files in-process without a budget. The backend enables both by default.
+"""
+import os
+import threading
+from typing import Any, Callable, List, Optional, Sequence
+
+import metrics
+
+FILE_TIMEOUT = float(os.environ.get('ROSY_FILE_TIMEOUT', '0'))
+REQUEST_TIMEOUT = float(os.environ.get('ROSY_REQUEST_TIMEOUT', '0'))
+# idle workers kept for reuse
+MAX_IDLE_WORKERS = os.cpu_count() or 1
+# seconds a terminated worker gets to exit before it is killed
+_TERMINATE_GRACE = 1.0
+# set in worker processes
+IN_WORKER = False
+
+
+class BudgetExceeded(Exception):
+    """The call did not finish within its time budget; its worker was terminated."""
+
+    def __init__(self, seconds: float):
+        super().__init__(f'exceeded the {seconds:g}s time budget')
+        self.seconds = seconds
+
+
+def _worker_main(conn) -> None:
+    # child process: run (fn, args) tasks until the pipe closes; each reply carries the task's metrics
+    global IN_WORKER
+    IN_WORKER = True
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args = task
+        metrics.REGISTRY.reset()
+        try:
+            reply = ('ok', fn(*args))
+        except Exception as e:
+            reply = ('error', e)
+        try:
+            conn.send(reply + (metrics.REGISTRY.export(),))
+        except Exception:
+            # unpicklable result or exception
+            conn.send(('error', RuntimeError(str(reply[1])), metrics.REGISTRY.export()))
+
+
+def mp_context():
+    """The multiprocessing context for worker processes: forkserver where available, else spawn. Never
+    fork, which would copy a threaded server's locks mid-use."""
+    # imported on first use: batch entry points without budgets never load multiprocessing
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    if 'forkserver' in methods:
+        # workers forked from the server start with the pipeline already imported
+        ctx.set_forkserver_preload(['pipeline'])
+    return ctx
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), name='rosy-budget-worker', daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join(_TERMINATE_GRACE)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(_TERMINATE_GRACE)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class WorkerPool:
+    """Reusable worker processes that run one call each at a time, under a timeout."""
+
+    def __init__(self, max_idle: int = MAX_IDLE_WORKERS):
+        self.max_idle = max_idle
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._ctx = None
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._ctx is None:
+                self._ctx = mp_context()
+                from multiprocessing.util import Finalize
+                # stop idle workers at exit, before multiprocessing terminates its remaining children
+                Finalize(None, self.close, exitpriority=10)
+            ctx = self._ctx
+        return _Worker(ctx)
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(worker)
+                return
+        worker.close()
+
+    def run(self, fn: Callable, args: Sequence[Any] = (), timeout: Optional[float] = None) -> Any:
+        """`fn(*args)` in a worker process. Raises BudgetExceeded (after terminating the worker) when it takes
+        longer than `timeout` seconds, or re-raises the call's exception. `fn` must be importable by name.
+        """
+        worker = self._acquire()
+        try:
+            worker.conn.send((fn, tuple(args)))
+            if not worker.conn.poll(timeout):
+                worker.kill()
+                raise BudgetExceeded(timeout)
+            status, value, snapshot = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.kill()
+            raise RuntimeError('worker process died')
+        self._release(worker)
+        metrics.REGISTRY.merge(snapshot)
+        if status == 'error':
+            raise value
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+
+POOL = WorkerPool()
@@ -6,8 +6,26 @@ Strategy:
 Public function: map_fields(parsed: Dict[str, Any], template_field_names: List[str]) -> Dict[str, Any]
 Returns a mapping from template field name -> value (best-match) and a score for each mapping.
 """
+import threading
 from typing import Dict, Any, List, Tuple
 
+# the embedding model is loaded on first use and shared by later calls; False means it is unavailable
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+
+def _embedding_model():
+    """The sentence-transformers model (and its `util` module), or None if it can't be loaded."""
+    global _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            try:
+                from sentence_transformers import SentenceTransformer, util
+                _MODEL = (SentenceTransformer('all-MiniLM-L6-v2'), util)
+            except Exception:
+                _MODEL = False
+        return _MODEL or None
+
 
 def _normalize_label(s: str) -> str:
     return ''.join(c.lower() for c in s if c.isalnum())
@@ -35,8 +53,10 @@ def map_fields(parsed: Dict[str, Any], template_field_names: List[str]) -> Dict[
     """
     # try sentence-transformers if available
     try:
-        from sentence_transformers import SentenceTransformer, util
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        loaded = _embedding_model()
+        if loaded is None:
+            raise ImportError('sentence-transformers unavailable')
+        model, util = loaded
         parsed_labels = list(parsed.keys())
         # build candidate labels from template fields
         template_labels = template_field_names
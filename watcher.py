@@ -0,0 +1,299 @@
+"""
+Watch-folder ingestion: scanning stations drop documents into `<root>/<taxpayer>/...` and every taxpayer
+folder is run through the pipeline as one bundle once its files stop changing.
+
+- New or changed files are noticed through inotify (the optional `watchdog` package) or, without it, by
+  polling the tree every `poll_interval` seconds.
+- A file counts as written once its size and mtime have been unchanged for `settle_seconds`. A folder is
+  processed when all of its documents have settled, so a scan arriving page by page becomes one run.
+  Files directly under `root` belong to no taxpayer and are ignored.
+- Only folders whose documents changed since their last run are processed. Results (draft and
+  result.json, SSNs masked) go to `<taxpayer>/_rosy/` next to the inputs.
+- The checkpoint (JSON, replaced atomically) records the size/mtime of every processed file, so a restart
+  picks up only what arrived or changed while the watcher was down.
+
+Usage:
+  python watcher.py inbox [--checkpoint inbox/.rosy_checkpoint.json] [--settle 5] [--poll 2]
+                          [--filing-status single] [--results-db results.db] [--once]
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from ingestion import IMAGE_EXTENSIONS
+
+OUTPUT_DIR = '_rosy'
+CHECKPOINT_NAME = '.rosy_checkpoint.json'
+WATCH_EXTENSIONS = {'.txt', '.pdf', *IMAGE_EXTENSIONS}
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_SECONDS = 2.0
+# with inotify events a full rescan is only a safety net for missed events
+RESCAN_SECONDS = 60.0
+
+Signature = Tuple[int, int]
+
+
+def _signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _is_document(name: str) -> bool:
+    return not name.startswith('.') and os.path.splitext(name)[1].lower() in WATCH_EXTENSIONS
+
+
+class Checkpoint:
+    """Persistent record of processed files: {folder: {'files': {relpath: [size, mtime_ns]}, ...}}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.folders: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.folders = json.load(f).get('folders', {})
+        except FileNotFoundError:
+            pass
+
+    def files(self, folder: str) -> Dict[str, Signature]:
+        return {k: tuple(v) for k, v in self.folders.get(folder, {}).get('files', {}).items()}
+
+    def record(self, folder: str, files: Dict[str, Signature], status: str, **extra) -> None:
+        self.folders[folder] = {'files': {k: list(v) for k, v in sorted(files.items())}, 'status': status,
+                                'processed_at': time.time(), **extra}
+        self.save()
+
+    def forget(self, folder: str) -> None:
+        if self.folders.pop(folder, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'folders': self.folders}, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def run_folder(paths: List[str], out_dir: str, *, filing_status: str = 'single', withholding: float = 0.0,
+               results_db: Optional[str] = None) -> Dict[str, Any]:
+    """Default bundle handler: run the pipeline and write result.json (SSNs masked) into `out_dir`."""
+    from pipeline import run_pipeline_on_paths
+    from security import mask_pii_in_result
+    res = run_pipeline_on_paths(paths, out_dir, filing_status=filing_status, withholding=withholding)
+    if results_db:
+        from resultstore import ResultsStore
+        store = ResultsStore(results_db)
+        try:
+            res['return_id'] = store.save_run(res)
+        finally:
+            store.close()
+    with open(os.path.join(out_dir, 'result.json'), 'w', encoding='utf-8') as f:
+        json.dump(mask_pii_in_result(res), f, indent=2, default=str)
+    return res
+
+
+class FolderWatcher:
+    """Detects settled changes under `root` and runs `handler(paths, out_dir)` once per affected folder."""
+
+    def __init__(self, root: str, *, checkpoint: Optional[str] = None,
+                 handler: Callable[..., Any] = run_folder, settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+                 poll_interval: float = DEFAULT_POLL_SECONDS, use_inotify: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.root = os.path.abspath(root)
+        self.checkpoint = Checkpoint(checkpoint or os.path.join(self.root, CHECKPOINT_NAME))
+        self.handler = handler
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.clock = clock
+        # path -> (signature, time it was first seen with that signature)
+        self._seen: Dict[str, Tuple[Signature, float]] = {}
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._observer = self._start_inotify() if use_inotify else None
+        self._last_full_scan = None
+
+    # -- change detection -------------------------------------------------------------------------------
+
+    def _start_inotify(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+                    folder = watcher._folder_of(path) if path else None
+                    if folder:
+                        with watcher._dirty_lock:
+                            watcher._dirty.add(folder)
+                        watcher._wake.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.root, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    @property
+    def inotify(self) -> bool:
+        return self._observer is not None
+
+    def _folder_of(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        parts = rel.split(os.sep)
+        if rel.startswith('..') or len(parts) < 2 or parts[0].startswith('.') or OUTPUT_DIR in parts:
+            return None
+        return parts[0]
+
+    def folders(self) -> List[str]:
+        try:
+            return sorted(e.name for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith('.'))
+        except FileNotFoundError:
+            return []
+
+    def scan_folder(self, folder: str) -> Dict[str, Signature]:
+        """Current signature of every document in a taxpayer folder, by path relative to the folder."""
+        base = os.path.join(self.root, folder)
+        found: Dict[str, Signature] = {}
+        for dirpath, dirs, files in os.walk(base):
+            dirs[:] = [d for d in dirs if d != OUTPUT_DIR and not d.startswith('.')]
+            for name in files:
+                if _is_document(name):
+                    path = os.path.join(dirpath, name)
+                    sig = _signature(path)
+                    if sig is not None:
+                        found[os.path.relpath(path, base).replace(os.sep, '/')] = sig
+        return found
+
+    def _settled(self, folder: str, files: Dict[str, Signature], now: float) -> bool:
+        settled = True
+        for rel, sig in files.items():
+            key = f'{folder}/{rel}'
+            seen = self._seen.get(key)
+            if seen is None or seen[0] != sig:
+                self._seen[key] = (sig, now)
+                settled = False
+            elif now - seen[1] < self.settle_seconds:
+                settled = False
+        return settled
+
+    # -- processing -------------------------------------------------------------------------------------
+
+    def _candidates(self, now: float) -> List[str]:
+        full = (not self.inotify or self._last_full_scan is None
+                or now - self._last_full_scan >= RESCAN_SECONDS)
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        if full:
+            self._last_full_scan = now
+            return sorted(set(self.folders()) | set(self.checkpoint.folders) | dirty)
+        return sorted(dirty)
+
+    def poll(self) -> List[str]:
+        """One detection pass: process every folder whose changes have settled. Returns those folders."""
+        now = self.clock()
+        processed = []
+        for folder in self._candidates(now):
+            files = self.scan_folder(folder)
+            if files == self.checkpoint.files(folder):
+                continue
+            if not files:
+                # everything was removed: nothing left to file
+                self.checkpoint.forget(folder)
+                continue
+            if not self._settled(folder, files, now):
+                # still being written; look again on the next pass
+                with self._dirty_lock:
+                    self._dirty.add(folder)
+                continue
+            self.process(folder, files)
+            processed.append(folder)
+        return processed
+
+    def process(self, folder: str, files: Dict[str, Signature]) -> None:
+        base = os.path.join(self.root, folder)
+        out_dir = os.path.join(base, OUTPUT_DIR)
+        os.makedirs(out_dir, exist_ok=True)
+        paths = [os.path.join(base, rel) for rel in sorted(files)]
+        try:
+            with metrics.stage('watch_bundle'):
+                self.handler(paths, out_dir)
+        except Exception as e:
+            # recorded like a success so the same files aren't retried forever; a change re-triggers the folder
+            error = f'{type(e).__name__}: {e}'
+            with open(os.path.join(out_dir, 'error.txt'), 'w', encoding='utf-8') as f:
+                f.write(error + '\n')
+            metrics.WATCH_BUNDLES.inc(outcome='error')
+            self.checkpoint.record(folder, files, 'error', error=error)
+        else:
+            metrics.WATCH_BUNDLES.inc(outcome='done')
+            self.checkpoint.record(folder, files, 'done')
+        for rel in files:
+            self._seen.pop(f'{folder}/{rel}', None)
+
+    def run(self, stop: Optional[threading.Event] = None, *, once: bool = False) -> int:
+        """Watch until `stop` is set. With `once`, return after everything present has settled and run."""
+        stop = stop or threading.Event()
+        total = 0
+        try:
+            while not stop.is_set():
+                total += len(self.poll())
+                with self._dirty_lock:
+                    pending = bool(self._dirty)
+                if once and not pending:
+                    break
+                # events wake the loop early; settling files are re-checked every poll interval
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            self.close()
+        return total
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='Watch a folder and run each taxpayer subfolder through the pipeline')
+    ap.add_argument('root')
+    ap.add_argument('--checkpoint', help=f'default: <root>/{CHECKPOINT_NAME}')
+    ap.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                    help='seconds a file must stay unchanged before it is processed')
+    ap.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS)
+    ap.add_argument('--filing-status', default='single')
+    ap.add_argument('--withholding', type=float, default=0.0)
+    ap.add_argument('--results-db', help='also save every run to this results store')
+    ap.add_argument('--no-inotify', action='store_true', help='always poll, even if watchdog is installed')
+    ap.add_argument('--once', action='store_true', help='process what is there, then exit')
+    args = ap.parse_args()
+
+    def handler(paths, out_dir):
+        res = run_folder(paths, out_dir, filing_status=args.filing_status, withholding=args.withholding,
+                         results_db=args.results_db)
+        print(f'{os.path.relpath(out_dir, args.root)}: {len(res["per_file"])} documents, '
+              f'tax {res["tax_estimate"].get("gross_tax")}', flush=True)
+
+    w = FolderWatcher(args.root, checkpoint=args.checkpoint, handler=handler, settle_seconds=args.settle,
+                      poll_interval=args.poll, use_inotify=not args.no_inotify)
+    print(f'watching {w.root} ({"inotify" if w.inotify else "polling"})', flush=True)
+    try:
+        n = w.run(once=args.once)
+    except KeyboardInterrupt:
+        n = None
+    if n is not None:
+        print(f'processed {n} bundles')